@@ -13,17 +13,107 @@ Original file is located at
 
 """## **⚙️ Random Forest Interface Function**"""
 
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-import pandas as pd
-import matplotlib.pyplot as plt
 import time
-from googlesearch import search
-import requests
-from bs4 import BeautifulSoup
 import random
 import re
+import os
+import io
+import hashlib
+import importlib
+import json
+import csv
+import itertools
+import numpy as np
+
+# Seconds spent importing each lazily loaded module, in load order
+IMPORT_TIMES = {}
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is first used, then
+    imports it and records the time taken in IMPORT_TIMES. Heavy libraries
+    (pandas, matplotlib, OpenCV, the search stack) are bound this way so
+    importing GlucoScholar costs only what a session actually uses.
+    scikit-learn is imported inside the randomForest methods that need it.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)
+            IMPORT_TIMES.setdefault(self._name, time.perf_counter() - start)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+pd = LazyModule('pandas')
+plt = LazyModule('matplotlib.pyplot')
+joblib = LazyModule('joblib')
+requests = LazyModule('requests')
+bs4 = LazyModule('bs4')
+googlesearch = LazyModule('googlesearch')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCAL_DATASET_PATH = os.path.join(BASE_DIR, "data", "images", "dataset", "diabetes_prediction_dataset.csv")
+MODEL_ARTIFACT_PATH = os.path.join(BASE_DIR, "data", "models", "randomForest.joblib")
+# Hyperparameters chosen with randomForest.applyHyperparameters
+MODEL_PARAMS_PATH = os.path.join(BASE_DIR, "data", "models", "hyperparameters.json")
+# Bump whenever the layout of the saved artifact changes so stale files get retrained
+MODEL_ARTIFACT_VERSION = 3
+# Probability calibration fitted on the held-out split at training time:
+# 'isotonic', 'sigmoid' (Platt scaling) or None for the raw forest votes
+MODEL_CALIBRATION = 'isotonic'
+# Calibrated probability at or above which a patient is labelled Diabetic.
+# Every prediction label is derived from the calibrated probability, so the
+# label, the risk score and the tier never disagree.
+DIABETIC_THRESHOLD = 0.5
+# Risk tiers for calibrated probabilities: tier lower bounds and labels.
+# 'Very High' starts at DIABETIC_THRESHOLD: it is exactly the Diabetic rows.
+RISK_TIER_BOUNDS = [0.05, 0.2, DIABETIC_THRESHOLD]
+RISK_TIER_LABELS = ['Low', 'Moderate', 'High', 'Very High']
+FEATURE_COLUMNS = [
+    'gender', 'age', 'hypertension', 'heart_disease',
+    'smoking_history', 'bmi', 'HbA1c_level', 'blood_glucose_level'
+]
+# Explicit read dtypes so chunks are parsed without type inference
+# (numeric columns stay float64 so values written back out keep their precision)
+FEATURE_DTYPES = {
+    'gender': str, 'age': np.float64, 'hypertension': np.float64, 'heart_disease': np.float64,
+    'smoking_history': str, 'bmi': np.float64, 'HbA1c_level': np.float64, 'blood_glucose_level': np.float64
+}
+# 0/1 columns; read as float64 so missing values parse, written back as integers
+BINARY_COLUMNS = ['hypertension', 'heart_disease']
+# Accepted input values, shared by the Prediction tab checks, the lab report
+# parser, the prediction service and DatasetValidator. Numeric rules give an
+# inclusive [min, max] range (min_exclusive for age) or the allowed values;
+# every column is required.
+VALIDATION_RULES = {
+    'gender': {'label': 'Gender'},
+    'age': {'label': 'Age', 'min': 0, 'max': 120, 'min_exclusive': True, 'unit': ' years'},
+    'hypertension': {'label': 'Hypertension', 'allowed': (0, 1)},
+    'heart_disease': {'label': 'Heart disease', 'allowed': (0, 1)},
+    'smoking_history': {'label': 'Smoking history'},
+    'bmi': {'label': 'BMI', 'min': 10, 'max': 50},
+    'HbA1c_level': {'label': 'HbA1c', 'min': 3, 'max': 20, 'unit': '%'},
+    'blood_glucose_level': {'label': 'Glucose', 'min': 70, 'max': 300, 'unit': ' mg/dL'},
+}
+# Rows sent to the forest per predict call in bulk scoring
+BULK_CHUNK_SIZE = 50000
+# Default search space for randomForest.hyperparameterSearch
+HYPERPARAMETER_GRID = {
+    'n_estimators': [25, 50, 100, 200],
+    'max_depth': [None, 8, 12, 16, 24],
+    'min_samples_leaf': [1, 2, 5, 10],
+}
 
 class randomForest:
     """ Columns
@@ -36,55 +126,624 @@ class randomForest:
       HbA1c_level
       blood_glucose_level
       diabetes
+
+    The fitted model and encoders are cached in a versioned artifact at
+    `artifact_path` and reused on later runs as long as the training data
+    and hyperparameters are unchanged.
+
+    Training uses `n_jobs` cores (-1 for all). `model_params` overrides the
+    RandomForestClassifier defaults; when omitted, the parameters saved by
+    `applyHyperparameters` are used if present.
+
+    `inference_backend` selects how `predict`/`predict_proba` score rows:
+    'sklearn' calls the forest directly, 'flat' uses the FlatForest arrays
+    (fastest for single patients and small batches). Bulk scoring always
+    uses the forest.
+
+    `calibration` ('isotonic', 'sigmoid' or None) maps the forest's vote
+    share to a calibrated probability of diabetes, fitted once on the
+    held-out split after training and saved with the artifact. Every
+    probability the class returns is calibrated; predicted labels are
+    still the forest's own decision.
     """
-    def __init__(self, test_size=0.2, random_state=42):
+    def __init__(self, test_size=0.2, random_state=42, artifact_path=MODEL_ARTIFACT_PATH, retrain=False,
+                 model_params=None, n_jobs=-1, inference_backend='sklearn', require_artifact=False,
+                 calibration=MODEL_CALIBRATION):
         self.csv_link = "https://gist.githubusercontent.com/sharna33/218183b8151378720081809c92b92235/raw/f949bf5752e27a99a44f34b685568801e57dbfe0/diabetes_prediction_dataset.csv"
+        # Prefer the bundled copy of the dataset so startup works offline
+        self.csv_path = LOCAL_DATASET_PATH if os.path.exists(LOCAL_DATASET_PATH) else None
         self.result_column_name = "diabetes"
+        self.feature_columns = list(FEATURE_COLUMNS)
         self.random_state = random_state
-        self.model = RandomForestClassifier(random_state=self.random_state)
+        self.n_jobs = n_jobs
+        from sklearn.ensemble import RandomForestClassifier
+        if model_params is None:
+            model_params = self.saved_hyperparameters()
+        self.model = RandomForestClassifier(random_state=self.random_state, n_jobs=self.n_jobs, **model_params)
         self.X = None
         self.y = None
+        self.X_train = self.X_test = self.y_train = self.y_test = None
+        self._cv_folds = {}
         self.test_size = test_size
-        self.gender_encoder = LabelEncoder()
-        self.smoking_history_encoder = LabelEncoder()
+        self.gender_encoder = CategoryEncoder()
+        self.smoking_history_encoder = CategoryEncoder()
+        self.artifact_path = artifact_path
+        self.data_hash = None
+        self.data_stat = None
+        # Held-out accuracy and test row count of the last training run
+        self.evaluation = None
+        if inference_backend not in ('sklearn', 'flat'):
+            raise ValueError(f"Unknown inference backend: {inference_backend}")
+        self.inference_backend = inference_backend
+        self._flat_forest = None
+        if calibration not in ('isotonic', 'sigmoid', None):
+            raise ValueError(f"Unknown calibration method: {calibration}")
+        self.calibration = calibration
+        self.calibrator = None
+
+        if require_artifact:
+            if not self.load_artifact(validate=False):
+                raise FileNotFoundError(f"No usable model artifact at {artifact_path}; train the model first")
+        elif retrain or not self.load_artifact():
+            self.train()
+            self.save_artifact()
 
-        # Use self.csv_link to access the instance variable
-        df = pd.read_csv(self.csv_link)
+    @classmethod
+    def from_artifact(cls, artifact_path=MODEL_ARTIFACT_PATH, n_jobs=1, inference_backend='sklearn'):
+        """
+        Restores the saved model as-is: no training data is read or hashed
+        and nothing is retrained, so worker processes can load it cheaply.
+        The tree arrays are memory-mapped, so processes loading the same
+        artifact share its pages. Raises FileNotFoundError if there is no
+        artifact of the current version.
+        """
+        return cls(artifact_path=artifact_path, n_jobs=n_jobs, inference_backend=inference_backend,
+                   require_artifact=True)
+
+    def data_source(self):
+        return self.csv_path or self.csv_link
+
+    def artifact_source(self):
+        """
+        The training data as recorded in the artifact: the link, or the local
+        CSV relative to BASE_DIR so that moving or re-cloning the repository
+        keeps the artifact valid.
+        """
+        if not self.csv_path:
+            return self.csv_link
+        try:
+            return os.path.relpath(self.csv_path, BASE_DIR).replace(os.sep, '/')
+        except ValueError:
+            # Different drive on Windows
+            return os.path.abspath(self.csv_path)
+
+    def dataset_stat(self):
+        """(size, mtime_ns) of the local training CSV, or None for the link."""
+        if not self.csv_path:
+            return None
+        stat = os.stat(self.csv_path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def hyperparameters(self):
+        """
+        Returns the settings that determine the fitted model. A change in any
+        of them invalidates the saved artifact.
+        """
+        params = self.model.get_params()
+        for key in ('n_jobs', 'verbose', 'warm_start'):
+            params.pop(key, None)
+        params['test_size'] = self.test_size
+        params['calibration'] = self.calibration
+        return params
+
+    def dataset_hash(self):
+        """
+        Returns the SHA-256 of the local training CSV, or None when training
+        from the remote link (the gist link is pinned to a commit, so the link
+        itself identifies the data).
+        """
+        if not self.csv_path:
+            return None
+        digest = hashlib.sha256()
+        with open(self.csv_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load_training_data(self):
+        """Reads the training CSV, fits the encoders and caches the encoded arrays."""
+        df = pd.read_csv(self.data_source())
+        self.data_stat = self.dataset_stat()
+        self.data_hash = self.dataset_hash()
 
         df['gender'] = self.gender_encoder.fit_transform(df['gender'])
         df['smoking_history'] = self.smoking_history_encoder.fit_transform(df['smoking_history'])
 
-        self.X = df.drop(self.result_column_name, axis=1)
-        self.y = df[self.result_column_name]
+        # Fit on a plain float32 matrix (the dtype the trees use internally) so
+        # bulk scoring can pass contiguous arrays without conversion
+        self.X = df[self.feature_columns].to_numpy(dtype=np.float32)
+        self.y = df[self.result_column_name].to_numpy()
+        self.X_train = self.X_test = self.y_train = self.y_test = None
+        self._cv_folds = {}
+
+    def prepare_split(self):
+        """
+        Returns the cached (X_train, X_test, y_train, y_test) split, computing
+        it on first use so repeated fits reuse the same encoded arrays.
+        """
+        if self.X is None:
+            self.load_training_data()
+        if self.X_train is None:
+            from sklearn.model_selection import train_test_split
+            self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
+                self.X, self.y, test_size=self.test_size, random_state=self.random_state)
+        return self.X_train, self.X_test, self.y_train, self.y_test
+
+    def cv_folds(self, cv):
+        """Returns the cached stratified `cv`-fold indices over the training split."""
+        if cv not in self._cv_folds:
+            from sklearn.model_selection import StratifiedKFold
+            X_train, _, y_train, _ = self.prepare_split()
+            splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=self.random_state)
+            self._cv_folds[cv] = list(splitter.split(X_train, y_train))
+        return self._cv_folds[cv]
 
-        X_train, X_test, y_train, y_test = train_test_split(self.X, self.y, test_size=self.test_size, random_state=self.random_state)
+    def train(self):
+        self.load_training_data()
+        X_train, X_test, y_train, y_test = self.prepare_split()
         self.model.fit(X_train, y_train)
+        self._flat_forest = None
+        self.calibrator = self.fitCalibration() if self.calibration else None
+        # Kept in the artifact so a loaded model can report it without
+        # reading the training data again
+        self.evaluation = {'accuracy': float((self.predict(X_test) == y_test).mean()),
+                           'test_rows': len(y_test)}
+
+    def fitCalibration(self, method=None):
+        """
+        Fits a ProbabilityCalibrator to the trained forest's probabilities
+        on the held-out split, which the forest never saw.
+        """
+        X_train, X_test, y_train, y_test = self.prepare_split()
+        raw = self.model.predict_proba(X_test)[:, 1]
+        return ProbabilityCalibrator(method or self.calibration).fit(raw, y_test)
+
+    def saved_hyperparameters(self):
+        if not os.path.exists(MODEL_PARAMS_PATH):
+            return {}
+        try:
+            with open(MODEL_PARAMS_PATH) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read saved hyperparameters: {e}")
+            return {}
+
+    def _measure_latency(self, model, X_test, repeats=200):
+        """
+        Median and 99th percentile single-row predict latency in milliseconds,
+        measured with one job as a per-request server would run it.
+        """
+        n_jobs = model.n_jobs
+        model.set_params(n_jobs=1)
+        timings = []
+        try:
+            for i in range(repeats):
+                row = X_test[i % len(X_test)][np.newaxis, :]
+                start = time.perf_counter()
+                model.predict(row)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            model.set_params(n_jobs=n_jobs)
+        return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+    def hyperparameterSearch(self, param_grid=None, time_budget=300, cv=None, latency_repeats=200):
+        """
+        Randomized search over `param_grid` that stops starting new trials
+        once `time_budget` seconds have elapsed. Every trial is fitted on all
+        cores and reuses the cached split (and CV folds if `cv` is set).
+
+        Args:
+            param_grid (dict, optional): Lists of values per parameter.
+                Defaults to HYPERPARAMETER_GRID.
+            time_budget (float, optional): Seconds to spend on the search.
+            cv (int, optional): Score by mean accuracy over `cv` cached folds
+                of the training split instead of the held-out test split.
+            latency_repeats (int, optional): Single-row predictions timed per trial.
+
+        Returns:
+            list: One dict per trial with params, accuracy, fit time, p50/p99
+            single-row latency and batch throughput, best accuracy first.
+        """
+        from sklearn.ensemble import RandomForestClassifier
+        param_grid = param_grid or HYPERPARAMETER_GRID
+        names = list(param_grid)
+        candidates = [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+        random.Random(self.random_state).shuffle(candidates)
+
+        X_train, X_test, y_train, y_test = self.prepare_split()
+        folds = self.cv_folds(cv) if cv else None
+        base_params = self.model.get_params()
+
+        results = []
+        search_start = time.perf_counter()
+        for params in candidates:
+            if time.perf_counter() - search_start >= time_budget:
+                break
+            model = RandomForestClassifier(**{**base_params, **params, 'n_jobs': self.n_jobs})
+
+            fit_start = time.perf_counter()
+            if folds:
+                scores = []
+                for train_idx, valid_idx in folds:
+                    model.fit(X_train[train_idx], y_train[train_idx])
+                    scores.append(model.score(X_train[valid_idx], y_train[valid_idx]))
+                accuracy = float(np.mean(scores))
+            model.fit(X_train, y_train)
+            fit_seconds = time.perf_counter() - fit_start
+            if not folds:
+                accuracy = float(model.score(X_test, y_test))
+
+            p50, p99 = self._measure_latency(model, X_test, latency_repeats)
+            batch_start = time.perf_counter()
+            model.predict(X_test)
+            throughput = len(X_test) / (time.perf_counter() - batch_start)
+
+            results.append({
+                'params': params,
+                'accuracy': accuracy,
+                'fit_seconds': fit_seconds,
+                'latency_p50_ms': p50,
+                'latency_p99_ms': p99,
+                'rows_per_second': throughput,
+            })
+
+        results.sort(key=lambda r: (-r['accuracy'], r['latency_p50_ms']))
+        return results
+
+    @staticmethod
+    def tradeoffTable(results):
+        """Formats hyperparameterSearch results as an accuracy vs latency table."""
+        header = f"{'params':<58} {'accuracy':>8} {'fit s':>7} {'p50 ms':>7} {'p99 ms':>7} {'rows/s':>10}"
+        lines = [header, "-" * len(header)]
+        for r in results:
+            params = ", ".join(f"{k}={v}" for k, v in r['params'].items())
+            lines.append(f"{params:<58} {r['accuracy']:>8.4f} {r['fit_seconds']:>7.2f} "
+                         f"{r['latency_p50_ms']:>7.2f} {r['latency_p99_ms']:>7.2f} {r['rows_per_second']:>10.0f}")
+        return "\n".join(lines)
+
+    def applyHyperparameters(self, params):
+        """
+        Retrains with `params`, saves the artifact and remembers the choice so
+        later instances start from the same model.
+        """
+        self.model.set_params(**params)
+        self.train()
+        self.save_artifact()
+        try:
+            os.makedirs(os.path.dirname(MODEL_PARAMS_PATH), exist_ok=True)
+            with open(MODEL_PARAMS_PATH, 'w') as f:
+                json.dump(params, f, indent=2)
+        except OSError as e:
+            print(f"Could not save hyperparameters: {e}")
+
+    def save_artifact(self):
+        """
+        Writes the fitted model, encoder classes, column order, held-out
+        accuracy and the training data hash and (size, mtime) to
+        `artifact_path`. The file is written uncompressed so that the tree
+        arrays can be memory-mapped on load.
+        """
+        if not self.artifact_path:
+            return
+        artifact = {
+            'version': MODEL_ARTIFACT_VERSION,
+            'source': self.artifact_source(),
+            'data_hash': self.data_hash,
+            'data_stat': self.data_stat,
+            'hyperparameters': self.hyperparameters(),
+            'feature_columns': self.feature_columns,
+            'gender_classes': self.gender_encoder.classes_,
+            'smoking_history_classes': self.smoking_history_encoder.classes_,
+            'model': self.model,
+            'calibrator': self.calibrator,
+            'evaluation': self.evaluation,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.artifact_path), exist_ok=True)
+            tmp_path = self.artifact_path + ".tmp"
+            joblib.dump(artifact, tmp_path)
+            os.replace(tmp_path, self.artifact_path)
+        except OSError as e:
+            print(f"Could not save model artifact: {e}")
+
+    def load_artifact(self, validate=True):
+        """
+        Loads the saved artifact if it matches the current dataset and
+        hyperparameters. With validate=False only the artifact version is
+        checked.
+
+        Returns:
+            bool: True if the model was restored, False if it must be retrained.
+        """
+        if not self.artifact_path or not os.path.exists(self.artifact_path):
+            return False
+        try:
+            artifact = joblib.load(self.artifact_path, mmap_mode='r')
+        except Exception as e:
+            print(f"Could not load model artifact: {e}")
+            return False
+
+        if artifact.get('version') != MODEL_ARTIFACT_VERSION:
+            return False
+        if validate:
+            if artifact.get('hyperparameters') != self.hyperparameters():
+                return False
+            if artifact.get('source') != self.artifact_source():
+                return False
+            # Same size and mtime as when trained: the file is unchanged, so
+            # skip hashing it. Otherwise (copied, re-cloned or edited) the
+            # content hash decides.
+            if self.csv_path and artifact.get('data_stat') != self.dataset_stat():
+                if artifact.get('data_hash') != self.dataset_hash():
+                    return False
+
+        self.model = artifact['model']
+        self.model.set_params(n_jobs=self.n_jobs)
+        self._flat_forest = None
+        self.feature_columns = list(artifact['feature_columns'])
+        self.gender_encoder.classes_ = np.asarray(artifact['gender_classes'])
+        self.smoking_history_encoder.classes_ = np.asarray(artifact['smoking_history_classes'])
+        self.data_hash = artifact['data_hash']
+        self.data_stat = artifact.get('data_stat')
+        self.evaluation = artifact.get('evaluation')
+        self.calibrator = artifact['calibrator']
+        return True
+
+    @property
+    def flat_forest(self):
+        """The FlatForest export of the current model, built on first use."""
+        if self._flat_forest is None:
+            self._flat_forest = FlatForest(self.model)
+        return self._flat_forest
+
+    def _scorer(self):
+        return self.flat_forest if self.inference_backend == 'flat' else self.model
 
     def predict(self, new_patient):
-        prediction = self.model.predict(new_patient)
-        return prediction
+        return self.label(self.predict_proba(new_patient))
 
-    def bulkPrediction(self, csv_link, limit=0):
-        df = pd.read_csv(csv_link)
+    def predict_proba(self, new_patient, calibrated=True):
+        probabilities = self._scorer().predict_proba(self._as_matrix(new_patient))[:, 1]
+        return self.calibrate(probabilities) if calibrated else probabilities
 
-        # Apply Label Encoding to 'gender' and 'smoking_history' columns
-        df['gender'] = self.gender_encoder.transform(df['gender'])
-        df['smoking_history'] = self.smoking_history_encoder.transform(df['smoking_history'])
+    def calibrate(self, probabilities):
+        """Maps raw forest probabilities through the fitted calibrator, if any."""
+        if self.calibrator is None:
+            return probabilities
+        return self.calibrator.transform(probabilities)
 
-        if limit != 0:
-            df = df.head(limit)
+    def label(self, probabilities):
+        """Class labels for calibrated probabilities: 1 (Diabetic) at DIABETIC_THRESHOLD or above."""
+        return self.model.classes_.take((np.asarray(probabilities) >= DIABETIC_THRESHOLD).astype(np.intp))
 
-        # Drop the 'diabetes' column before prediction
-        df = df.drop(self.result_column_name, axis=1)
+    def scoreBatch(self, X):
+        """
+        Predictions and diabetes probabilities for a small encoded batch
+        (e.g. a merged set of service requests) from one pass of the
+        configured backend.
+
+        Returns:
+            (np.ndarray, np.ndarray): Labels (see `label`) and per-row
+            calibrated probabilities.
+        """
+        probabilities = self.calibrate(self._scorer().predict_proba(self._as_matrix(X))[:, 1])
+        return self.label(probabilities), probabilities
+
+    def _as_matrix(self, rows):
+        # Encoded DataFrames are reordered to the training column order
+        if isinstance(rows, pd.DataFrame):
+            rows = rows[self.feature_columns]
+        return np.ascontiguousarray(rows, dtype=np.float32)
+
+    @property
+    def category_encoders(self):
+        """The CategoryEncoder of each categorical feature column."""
+        return {'gender': self.gender_encoder, 'smoking_history': self.smoking_history_encoder}
+
+    def encode_features(self, df, handle_unknown='error', remap_counts=None):
+        """
+        Encodes a raw frame (string categories) into the float32 feature
+        matrix the model was trained on.
 
-        predictions = []
-        for index in df.index:
-            row_data = df.loc[[index]].values.tolist()
-            prediction = self.predict(row_data)
-            predictions.extend(prediction)
+        Args:
+            df (pd.DataFrame): Frame containing at least the feature columns.
+            handle_unknown (str): See `CategoryEncoder.encode`.
+            remap_counts (dict, optional): Accumulates, per categorical
+                column, the values that were normalized or unknown (see
+                `new_remap_counts`).
+
+        Returns:
+            np.ndarray: C-contiguous float32 array of shape (rows, features).
+        """
+        encoders = self.category_encoders
+        X = np.empty((len(df), len(self.feature_columns)), dtype=np.float32)
+        for i, column in enumerate(self.feature_columns):
+            if column in encoders:
+                X[:, i], report = encoders[column].encode(df[column], handle_unknown)
+                if remap_counts is not None:
+                    counts = remap_counts[column]
+                    counts['normalized'] += report['normalized']
+                    counts['unknown'] += report['unknown']
+                    counts['unknown_labels'].extend(label for label in report['unknown_labels']
+                                                    if label not in counts['unknown_labels'])
+            else:
+                X[:, i] = df[column].to_numpy(dtype=np.float32)
+        return X
+
+    def new_remap_counts(self):
+        """Empty per-column counts for `encode_features(remap_counts=...)`."""
+        return {column: {'normalized': 0, 'unknown': 0, 'unknown_labels': []}
+                for column in self.category_encoders}
+
+    def predictMatrix(self, X, chunk_size=BULK_CHUNK_SIZE, return_proba=False):
+        """
+        Scores an encoded feature matrix in contiguous blocks of `chunk_size`
+        rows, one forest call per block.
 
+        Returns:
+            np.ndarray, or (np.ndarray, np.ndarray) with the per-row
+            calibrated probability of diabetes when `return_proba` is True.
+            Labels are derived from the calibrated probability (see `label`).
+        """
+        predictions = np.empty(len(X), dtype=np.int64)
+        probabilities = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            block = np.ascontiguousarray(X[start:start + chunk_size], dtype=np.float32)
+            proba = self.calibrate(self.model.predict_proba(block)[:, 1])
+            predictions[start:start + len(block)] = self.label(proba)
+            probabilities[start:start + len(block)] = proba
+
+        if return_proba:
+            return predictions, probabilities
         return predictions
 
+    def bulkPrediction(self, csv_link, limit=0, chunk_size=BULK_CHUNK_SIZE, return_proba=False,
+                       handle_unknown='default'):
+        """
+        Scores every row of a CSV file.
+
+        Args:
+            csv_link (str): Path or URL of the CSV file.
+            limit (int, optional): Only score the first `limit` rows. 0 scores all.
+            chunk_size (int, optional): Rows per forest call.
+            return_proba (bool, optional): Also return per-row probabilities.
+            handle_unknown (str, optional): See `CategoryEncoder.encode`;
+                unseen categories use the first known class by default.
+
+        Returns:
+            np.ndarray of predictions, or (predictions, probabilities).
+        """
+        # Read in chunks so only the output arrays grow with the file size
+        reader = pd.read_csv(csv_link, usecols=self.feature_columns, dtype=FEATURE_DTYPES,
+                             nrows=limit if limit != 0 else None, chunksize=chunk_size)
+        results = [self.predictMatrix(self.encode_features(chunk, handle_unknown), chunk_size=chunk_size,
+                                      return_proba=return_proba)
+                   for chunk in reader]
+        if not results:
+            empty = np.empty(0, dtype=np.int64)
+            return (empty, np.empty(0)) if return_proba else empty
+        if return_proba:
+            return (np.concatenate([r[0] for r in results]),
+                    np.concatenate([r[1] for r in results]))
+        return np.concatenate(results)
+
+    def streamPrediction(self, csv_path, output_path=None, chunk_size=BULK_CHUNK_SIZE,
+                         handle_unknown='error', progress_callback=None, cancel_event=None,
+                         chunk_callback=None, byte_range=None, validate=False, quarantine_path=None):
+        """
+        Scores a CSV file chunk by chunk so memory use is bounded by
+        `chunk_size` regardless of the file size.
+
+        Args:
+            csv_path (str): Path or URL of the CSV file.
+            output_path (str, optional): If set, the feature columns plus
+                `prediction`, `probability` and `risk_tier` are appended to this file as
+                each chunk is scored. Paths ending in `.parquet` are written
+                as Parquet (requires pyarrow), anything else as CSV.
+            chunk_size (int, optional): Rows read and scored per chunk.
+            handle_unknown (str, optional): See `encode_features`.
+            progress_callback (callable, optional): Called with the running
+                summary dict after each chunk.
+            cancel_event (threading.Event, optional): Stops after the current
+                chunk once set.
+            chunk_callback (callable, optional): Called with the raw chunk,
+                its predictions and probabilities after each chunk, e.g.
+                `BulkPredictionWriter.write` to persist the results.
+            byte_range (tuple, optional): (start, end) byte offsets of the
+                data lines to score, as returned by `csv_byte_ranges`, so
+                several processes can each score a shard of a local file.
+            validate (bool, optional): Check every row against
+                VALIDATION_RULES with DatasetValidator and skip the invalid
+                ones instead of scoring them.
+            quarantine_path (str, optional): Also write the skipped rows and
+                their problems to this CSV file (implies `validate`). Only
+                created if some row is invalid.
+
+        Returns:
+            dict: Row, diabetic and non-diabetic counts, rows per risk tier,
+            per-column counts of remapped category values (see
+            `new_remap_counts`), the validation report (None unless
+            validating), the output and quarantine paths and whether the run
+            was cancelled. 'rows' counts scored rows only.
+        """
+        header = pd.read_csv(csv_path, nrows=0).columns
+        missing_cols = [col for col in self.feature_columns if col not in header]
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
+
+        summary = {'rows': 0, 'diabetic': 0, 'non_diabetic': 0,
+                   'risk_tiers': dict.fromkeys(RISK_TIER_LABELS, 0),
+                   'remapped': self.new_remap_counts(),
+                   'validation': None, 'output_path': output_path,
+                   'quarantine_path': None, 'cancelled': False}
+        validator = DatasetValidator(columns=self.feature_columns) if validate or quarantine_path else None
+        # Validation reads numeric columns untyped so non-numeric values can be counted
+        dtypes = validator.read_dtypes if validator else FEATURE_DTYPES
+        if validator:
+            summary['validation'] = validator.new_report()
+        writer = _PredictionWriter(output_path) if output_path else None
+        quarantine = _PredictionWriter(quarantine_path) if quarantine_path else None
+        source = csv_path
+        try:
+            if byte_range:
+                source = io.BufferedReader(_CSVByteRange(csv_path, *byte_range), buffer_size=1 << 20)
+                reader = pd.read_csv(source, names=list(header), header=None, usecols=self.feature_columns,
+                                     dtype=dtypes, chunksize=chunk_size, low_memory=not validator)
+            else:
+                reader = pd.read_csv(csv_path, usecols=self.feature_columns, dtype=dtypes,
+                                     chunksize=chunk_size, low_memory=not validator)
+            for chunk in reader:
+                if cancel_event is not None and cancel_event.is_set():
+                    summary['cancelled'] = True
+                    break
+
+                if validator:
+                    chunk, valid, rejected = validator.check(chunk, summary['validation'])
+                    if len(rejected):
+                        if quarantine:
+                            quarantine.write(rejected)
+                            summary['quarantine_path'] = quarantine_path
+                        chunk = chunk.loc[valid]
+
+                X = self.encode_features(chunk, handle_unknown=handle_unknown, remap_counts=summary['remapped'])
+                predictions, probabilities = self.predictMatrix(X, chunk_size=chunk_size, return_proba=True)
+
+                diabetic = int(np.count_nonzero(predictions == 1))
+                summary['rows'] += len(predictions)
+                summary['diabetic'] += diabetic
+                summary['non_diabetic'] += len(predictions) - diabetic
+                tiers = risk_tier_codes(probabilities)
+                for label, count in zip(RISK_TIER_LABELS, np.bincount(tiers, minlength=len(RISK_TIER_LABELS))):
+                    summary['risk_tiers'][label] += int(count)
+
+                if writer:
+                    writer.write(_binary_as_int(chunk[self.feature_columns]).assign(
+                        prediction=predictions, probability=probabilities,
+                        risk_tier=np.take(RISK_TIER_LABELS, tiers)))
+                if chunk_callback:
+                    chunk_callback(chunk, predictions, probabilities)
+                if progress_callback:
+                    progress_callback({**summary, 'risk_tiers': dict(summary['risk_tiers'])})
+        finally:
+            if writer:
+                writer.close()
+            if quarantine:
+                quarantine.close()
+            if source is not csv_path:
+                source.close()
+
+        return summary
+
     def getEncoding(self):
         # Get mappings for gender
         gender_mapping = {index: label for index, label in enumerate(self.gender_encoder.classes_)}
@@ -95,13 +754,643 @@ class randomForest:
         print("Smoking History Mapping:", smoking_history_mapping)
         return
 
+def csv_byte_ranges(csv_path, parts):
+    """
+    Splits the data lines of a local CSV file into up to `parts` byte
+    ranges of similar size, each starting at the beginning of a line, for
+    `randomForest.streamPrediction(byte_range=...)`. Assumes no quoted
+    field contains a newline.
+
+    Returns:
+        list: (start, end) byte offsets, in file order.
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        header_end = len(f.readline())
+        bounds = [header_end]
+        for part in range(1, parts):
+            target = header_end + (size - header_end) * part // parts
+            if target <= bounds[-1]:
+                continue
+            # Move to the start of the first line beginning at or after target
+            f.seek(target - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+class _CSVByteRange(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file."""
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        count = self._file.readinto(memoryview(buffer)[:min(len(buffer), self._remaining)])
+        self._remaining -= count
+        return count
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+class CategoryEncoder:
+    """
+    Maps category labels to integer codes; a drop-in for LabelEncoder
+    (`fit`, `transform`, `classes_`) that is shared by training, bulk
+    scoring, the Prediction tab and the prediction service.
+
+    Labels are matched exactly first, then ignoring case and surrounding
+    whitespace ('female ' -> 'Female'). `encode` factorizes the column in
+    one hash pass and resolves only its distinct values against the
+    precomputed lookup, so a chunk of millions of rows costs one lookup per
+    distinct label.
+    """
+    def __init__(self, classes=None):
+        self.classes_ = classes
+
+    @property
+    def classes_(self):
+        return self._classes
+
+    @classes_.setter
+    def classes_(self, classes):
+        # Setting the classes (e.g. from a saved artifact) rebuilds the lookups
+        self._classes = None if classes is None else np.asarray(classes)
+        self._exact, self._folded = {}, {}
+        for code, label in enumerate(self._classes if classes is not None else []):
+            self._exact.setdefault(label, code)
+            self._folded.setdefault(self._fold(label), code)
+
+    @staticmethod
+    def _fold(label):
+        return str(label).strip().casefold()
+
+    def fit(self, values):
+        self.classes_ = np.unique(np.asarray(values))
+        return self
+
+    def fit_transform(self, values):
+        return self.fit(values).transform(values)
+
+    def code(self, label):
+        """The code of `label` (exact or case-insensitive match), or None."""
+        code = self._exact.get(label)
+        if code is None and isinstance(label, str):
+            code = self._folded.get(self._fold(label))
+        return code
+
+    def match(self, label):
+        """The known class for `label` (exact or case-insensitive), or None."""
+        code = self.code(label)
+        return None if code is None else self._classes[code]
+
+    def transform(self, values, handle_unknown='error'):
+        return self.encode(values, handle_unknown)[0]
+
+    def encode(self, values, handle_unknown='error'):
+        """
+        Encodes a column of labels.
+
+        Args:
+            values (array-like): Raw labels.
+            handle_unknown (str): 'error' to raise ValueError on labels that
+                match no class (including missing values), 'default' to map
+                them to the first class.
+
+        Returns:
+            (np.ndarray, dict): Integer codes, and counts of the values that
+            were 'normalized' (matched only ignoring case/whitespace) or
+            'unknown', with the distinct 'unknown_labels'.
+        """
+        if handle_unknown not in ('error', 'default'):
+            raise ValueError(f"Unknown handle_unknown option: {handle_unknown}")
+        if not isinstance(values, (pd.Series, pd.Index, np.ndarray)):
+            values = np.asarray(values, dtype=object)
+        codes, uniques = pd.factorize(values)
+        # One slot per distinct label, plus a last one that the -1 code of
+        # missing values indexes
+        lookup = np.full(len(uniques) + 1, -1, dtype=np.int64)
+        normalized = []
+        for i, label in enumerate(uniques):
+            code = self._exact.get(label)
+            if code is None and isinstance(label, str):
+                code = self._folded.get(self._fold(label))
+                if code is not None:
+                    normalized.append(i)
+            if code is not None:
+                lookup[i] = code
+
+        report = {'normalized': 0, 'unknown': 0, 'unknown_labels': []}
+        unknown = np.flatnonzero(lookup[:-1] < 0)
+        missing = int(np.count_nonzero(codes < 0))
+        if normalized or len(unknown):
+            counts = np.bincount(codes[codes >= 0] if missing else codes, minlength=len(uniques))
+            report['normalized'] = int(counts[normalized].sum())
+            report['unknown'] = int(counts[unknown].sum())
+            report['unknown_labels'] = [uniques[i] for i in unknown]
+        if missing:
+            report['unknown'] += missing
+            report['unknown_labels'].append(None)
+        if report['unknown']:
+            if handle_unknown == 'error':
+                raise ValueError(f"Previously unseen labels: {report['unknown_labels']}")
+            lookup[lookup < 0] = 0
+        return lookup.take(codes), report
+
+def validation_error(field, value, rules=VALIDATION_RULES):
+    """
+    Checks one input value against its rule.
+
+    Returns:
+        str: What is wrong (e.g. "BMI must be 10-50"), or None if it is valid.
+    """
+    rule = rules[field]
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return f"{rule['label']} is required"
+    if 'min' not in rule and 'allowed' not in rule:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return "Numbers only"
+    if 'allowed' in rule:
+        if number not in rule['allowed']:
+            return "Enter: " + " or ".join(str(allowed) for allowed in rule['allowed'])
+        return None
+    too_low = number <= rule['min'] if rule.get('min_exclusive') else number < rule['min']
+    if too_low or number > rule['max'] or number != number:
+        return f"{rule['label']} must be {rule['min']:g}-{rule['max']:g}{rule.get('unit', '')}"
+    return None
+
+class DatasetValidator:
+    """
+    Applies VALIDATION_RULES to whole frames with NumPy masks, one pass per
+    column and no per-row Python, so large files are checked chunk by
+    chunk at parse speed.
+
+    Each column reports its 'missing', 'non_numeric' and 'out_of_range'
+    counts (allowed-value rules count as range checks). Numeric columns
+    may arrive as strings when a chunk contains non-numeric tokens; they
+    are coerced and the tokens counted, so read the numeric columns
+    without a fixed dtype (see `read_dtypes`, and pass low_memory=False so
+    each chunk gets one type per column) when validating.
+
+    Args:
+        rules (dict, optional): Rules per column, in VALIDATION_RULES format.
+        columns (list, optional): Columns to check. Defaults to FEATURE_COLUMNS.
+    """
+    PROBLEMS = ('missing', 'non_numeric', 'out_of_range')
+
+    def __init__(self, rules=VALIDATION_RULES, columns=None):
+        self.rules = rules
+        self.columns = list(columns or FEATURE_COLUMNS)
+
+    @property
+    def read_dtypes(self):
+        """read_csv dtypes for validation: text columns only."""
+        return {column: str for column in self.columns
+                if 'min' not in self.rules[column] and 'allowed' not in self.rules[column]}
+
+    def new_report(self):
+        report = {'rows': 0, 'invalid_rows': 0}
+        report['columns'] = {column: dict.fromkeys(self.PROBLEMS, 0) for column in self.columns}
+        return report
+
+    @staticmethod
+    def _to_numbers(values):
+        # Parse each distinct string once; a column mixing numbers and text
+        # usually repeats a small set of values
+        codes, uniques = pd.factorize(values)
+        parsed = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        return np.append(parsed, np.nan).take(codes)  # code -1 (missing) takes the trailing NaN
+
+    def check(self, frame, report=None):
+        """
+        Validates one frame.
+
+        Args:
+            frame (pd.DataFrame): Raw rows; checked numeric columns are
+                replaced by their float64 values.
+            report (dict, optional): Counts to add to, from `new_report`.
+
+        Returns:
+            (pd.DataFrame, np.ndarray, pd.DataFrame): The frame with numeric
+            columns coerced, a boolean mask of valid rows, and the invalid
+            rows with their original values plus a `problems` column (empty
+            when every row is valid).
+        """
+        invalid = np.zeros(len(frame), dtype=bool)
+        problems, coerced = [], {}
+        for column in self.columns:
+            rule = self.rules[column]
+            values = frame[column]
+            missing = values.isna().to_numpy()
+            non_numeric = out_of_range = None
+            if 'min' in rule or 'allowed' in rule:
+                if values.dtype.kind in 'biuf':
+                    numbers = values.to_numpy(dtype=np.float64)
+                else:
+                    numbers = self._to_numbers(values)
+                    non_numeric = np.isnan(numbers) & ~missing
+                present = ~np.isnan(numbers)
+                if 'allowed' in rule:
+                    out_of_range = present & ~np.isin(numbers, rule['allowed'])
+                else:
+                    too_low = numbers <= rule['min'] if rule.get('min_exclusive') else numbers < rule['min']
+                    out_of_range = too_low | (numbers > rule['max'])
+                coerced[column] = numbers
+            else:
+                # Blank text counts as missing
+                blank = [label for label in pd.unique(values) if isinstance(label, str) and not label.strip()]
+                if blank:
+                    missing = missing | values.isin(blank).to_numpy()
+
+            for problem, mask in zip(self.PROBLEMS, (missing, non_numeric, out_of_range)):
+                if mask is None:
+                    continue
+                count = int(np.count_nonzero(mask))
+                if count:
+                    invalid |= mask
+                    problems.append((f"{column} {problem.replace('_', ' ')}", mask))
+                if report is not None:
+                    report['columns'][column][problem] += count
+
+        if problems:
+            rejected = frame.loc[invalid].copy()
+            reasons = pd.Series('', index=rejected.index)
+            for name, mask in problems:
+                reasons = reasons.where(~mask[invalid], reasons + name + '; ')
+            rejected['problems'] = reasons.str.rstrip('; ')
+        else:
+            rejected = frame.iloc[:0].assign(problems=pd.Series(dtype=str))
+        if coerced:
+            frame = frame.assign(**coerced)
+        if report is not None:
+            report['rows'] += len(frame)
+            report['invalid_rows'] += int(np.count_nonzero(invalid))
+        return frame, ~invalid, rejected
+
+    def validate_file(self, csv_path, quarantine_path=None, chunk_size=BULK_CHUNK_SIZE, progress_callback=None):
+        """
+        Streams a CSV file through `check` without scoring it.
+
+        Args:
+            csv_path (str): File to check.
+            quarantine_path (str, optional): CSV file that receives the
+                invalid rows, as read, with their problems. Only created if
+                some row is invalid.
+            chunk_size (int, optional): Rows per chunk.
+            progress_callback (callable, optional): Called with the running
+                report after each chunk.
+
+        Returns:
+            dict: The report from `new_report`, plus 'quarantine_path'.
+        """
+        header = pd.read_csv(csv_path, nrows=0).columns
+        missing_cols = [col for col in self.columns if col not in header]
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
+
+        report = self.new_report()
+        quarantine = _PredictionWriter(quarantine_path) if quarantine_path else None
+        try:
+            for chunk in pd.read_csv(csv_path, usecols=self.columns, dtype=self.read_dtypes, chunksize=chunk_size,
+                                     low_memory=False):
+                _, _, rejected = self.check(chunk, report)
+                if quarantine and len(rejected):
+                    quarantine.write(rejected)
+                if progress_callback:
+                    progress_callback(report)
+        finally:
+            if quarantine:
+                quarantine.close()
+        report['quarantine_path'] = quarantine_path if report['invalid_rows'] else None
+        return report
+
+    @staticmethod
+    def merge_reports(total, report):
+        """Adds `report`'s counts to `total` (e.g. from several shards)."""
+        total['rows'] += report['rows']
+        total['invalid_rows'] += report['invalid_rows']
+        for column, counts in report['columns'].items():
+            for problem, count in counts.items():
+                total['columns'][column][problem] += count
+        return total
+
+    @staticmethod
+    def format_report(report):
+        """The report as a text table: one line per column with problems."""
+        valid = report['rows'] - report['invalid_rows']
+        lines = [f"{report['rows']:,} rows checked, {valid:,} valid, {report['invalid_rows']:,} invalid"]
+        columns = {column: counts for column, counts in report['columns'].items() if any(counts.values())}
+        if columns:
+            lines.append(f"{'column':<22} {'missing':>9} {'non-numeric':>12} {'out of range':>13}")
+            for column, counts in columns.items():
+                lines.append(f"{column:<22} {counts['missing']:>9,} {counts['non_numeric']:>12,} "
+                             f"{counts['out_of_range']:>13,}")
+        return "\n".join(lines)
+
+def risk_tier_codes(probabilities):
+    """Index into RISK_TIER_LABELS for each calibrated probability."""
+    return np.searchsorted(RISK_TIER_BOUNDS, probabilities, side='right')
+
+def risk_tier(probability):
+    """Risk tier label for one calibrated probability."""
+    return RISK_TIER_LABELS[int(risk_tier_codes(probability))]
+
+class ProbabilityCalibrator:
+    """
+    Maps raw classifier probabilities to calibrated ones.
+
+    'isotonic' fits a monotonic step function, 'sigmoid' fits Platt's
+    logistic curve. Only the fitted thresholds or coefficients are kept,
+    so `transform` is a NumPy call that needs no sklearn at load time.
+    """
+    def __init__(self, method='isotonic'):
+        if method not in ('isotonic', 'sigmoid'):
+            raise ValueError(f"Unknown calibration method: {method}")
+        self.method = method
+        self.x_ = self.y_ = None
+        self.coef_ = self.intercept_ = None
+
+    def fit(self, probabilities, y):
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if self.method == 'isotonic':
+            from sklearn.isotonic import IsotonicRegression
+            isotonic = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip').fit(probabilities, y)
+            self.x_, self.y_ = isotonic.X_thresholds_, isotonic.y_thresholds_
+        else:
+            from sklearn.linear_model import LogisticRegression
+            logistic = LogisticRegression(C=1e6).fit(probabilities[:, np.newaxis], y)
+            self.coef_, self.intercept_ = float(logistic.coef_[0, 0]), float(logistic.intercept_[0])
+        return self
+
+    def transform(self, probabilities):
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if self.method == 'isotonic':
+            return np.interp(probabilities, self.x_, self.y_)
+        return 1.0 / (1.0 + np.exp(-(self.coef_ * probabilities + self.intercept_)))
+
+class FlatForest:
+    """
+    A fitted RandomForestClassifier exported to packed NumPy arrays.
+
+    All trees share one set of node arrays (feature, threshold, left/right
+    child and normalized leaf values) addressed by global node index, and a
+    batch of rows walks every tree at once, one level per step. This skips
+    pandas construction, sklearn input validation and per-tree dispatch, so
+    single rows and small batches score much faster than `model.predict`.
+    Results are identical to the forest scored with one job.
+    """
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.concatenate([[0], np.cumsum([tree.node_count for tree in trees])[:-1]])
+
+        feature, threshold, left, right, values = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            is_leaf = tree.children_left == -1
+            index = np.arange(tree.node_count) + offset
+            # Leaves point back to themselves and always "go left", so extra
+            # traversal steps after reaching a leaf are no-ops
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            left.append(np.where(is_leaf, index, tree.children_left + offset))
+            right.append(np.where(is_leaf, index, tree.children_right + offset))
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :]
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.values = np.concatenate(values)
+        self.roots = offsets.astype(np.intp)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.n_trees = len(trees)
+        self.classes_ = model.classes_
+
+    def apply(self, X):
+        """
+        Returns the global leaf index reached in each tree, shape (rows, trees).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if np.isnan(X).any():
+            raise ValueError("Input contains NaN")
+        rows = np.arange(len(X))[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            # float32 features compared against float64 thresholds, as in sklearn
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaf_values = self.values[self.apply(X)]
+        # cumsum adds the trees strictly in order, matching the forest's
+        # running sum (np.sum would use pairwise summation and can differ in
+        # the last bit)
+        return np.cumsum(leaf_values, axis=1)[:, -1, :] / self.n_trees
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+def _binary_as_int(frame):
+    """`frame` with whole-valued BINARY_COLUMNS as nullable integers, matching the input schema."""
+    columns = {}
+    for column in BINARY_COLUMNS:
+        values = frame[column] if column in frame else None
+        if values is not None and values.dtype.kind == 'f':
+            finite = values.dropna()
+            if (finite == np.round(finite)).all():
+                columns[column] = values.astype('Int64')
+    return frame.assign(**columns) if columns else frame
+
+class _PredictionWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.parquet = output_path.lower().endswith('.parquet')
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, frame):
+        if self.parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Writing Parquet output requires pyarrow: pip install pyarrow")
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output_path, table.schema)
+            elif not table.schema.equals(self._parquet_writer.schema):
+                # e.g. a chunk whose binary columns could not be written as integers
+                table = table.cast(self._parquet_writer.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.output_path, mode='a' if self._wrote_header else 'w',
+                         header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+# Numeric dashboard dimensions: band lower bounds and labels. Values below
+# the first bound fall in the first band, missing values in 'Unknown'.
+DASHBOARD_BANDS = {
+    'age': ([0, 18, 30, 40, 50, 60, 70], ['<18', '18-29', '30-39', '40-49', '50-59', '60-69', '70+']),
+    'bmi': ([0, 18.5, 25, 30, 35, 40], ['<18.5', '18.5-24.9', '25-29.9', '30-34.9', '35-39.9', '40+']),
+    'HbA1c_level': ([0, 5.7, 6.5], ['<5.7', '5.7-6.4', '6.5+']),
+}
+DASHBOARD_CATEGORIES = ('gender', 'smoking_history')
+DASHBOARD_TITLES = {'age': 'Age', 'bmi': 'BMI', 'HbA1c_level': 'HbA1c (%)',
+                    'gender': 'Gender', 'smoking_history': 'Smoking History'}
+
+class CohortDashboard:
+    """
+    Pre-binned aggregates of a scored cohort: row count, diabetic count and
+    a probability histogram for every band of every dashboard dimension.
+
+    `update` has the `streamPrediction` chunk_callback signature, so a
+    dashboard fills as a file is scored and never holds more than one
+    chunk. Each chunk is reduced with one band/category code vector per
+    dimension and `np.bincount`, and dashboards from separate runs can be
+    combined with `merge`. Charts are drawn from the aggregates alone, so
+    their cost does not depend on the number of rows.
+    """
+    def __init__(self, bands=DASHBOARD_BANDS, categories=DASHBOARD_CATEGORIES, probability_bins=20):
+        self.bands = bands
+        self.probability_bins = probability_bins
+        self.probability_edges = np.linspace(0.0, 1.0, probability_bins + 1)
+        self.labels = {column: list(labels) + ['Unknown'] for column, (_, labels) in bands.items()}
+        self.labels.update({column: [] for column in categories})
+        self.rows = 0
+        self.totals = {column: np.zeros(len(labels), np.int64) for column, labels in self.labels.items()}
+        self.diabetic = {column: np.zeros(len(labels), np.int64) for column, labels in self.labels.items()}
+        self.histograms = {column: np.zeros((len(labels), probability_bins), np.int64)
+                           for column, labels in self.labels.items()}
+
+    def update(self, chunk, predictions, probabilities=None):
+        predictions = np.asarray(predictions)
+        if probabilities is None:
+            probabilities = predictions
+        bins = self.probability_bins
+        probability_bin = np.clip((np.asarray(probabilities, dtype=np.float64) * bins).astype(np.intp), 0, bins - 1)
+        is_diabetic = predictions == 1
+
+        for column in self.labels:
+            codes = self._codes(column, chunk[column])
+            size = len(self.labels[column])
+            self._grow(column, size)
+            self.totals[column] += np.bincount(codes, minlength=size)
+            self.diabetic[column] += np.bincount(codes[is_diabetic], minlength=size)
+            self.histograms[column] += np.bincount(codes * bins + probability_bin,
+                                                   minlength=size * bins).reshape(size, bins)
+        self.rows += len(predictions)
+
+    def _codes(self, column, values):
+        labels = self.labels[column]
+        if column in self.bands:
+            lower_bounds = self.bands[column][0]
+            values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+            codes = np.clip(np.searchsorted(lower_bounds, values, side='right') - 1, 0, len(lower_bounds) - 1)
+            codes[np.isnan(values)] = len(labels) - 1
+            return codes
+
+        codes, uniques = pd.factorize(values.fillna('Unknown').astype(str))
+        positions = {label: index for index, label in enumerate(labels)}
+        for value in uniques:
+            if value not in positions:
+                positions[value] = len(labels)
+                labels.append(value)
+        return np.array([positions[value] for value in uniques], dtype=np.intp)[codes]
+
+    def _grow(self, column, size):
+        extra = size - len(self.totals[column])
+        if extra > 0:
+            self.totals[column] = np.pad(self.totals[column], (0, extra))
+            self.diabetic[column] = np.pad(self.diabetic[column], (0, extra))
+            self.histograms[column] = np.pad(self.histograms[column], ((0, extra), (0, 0)))
+
+    def merge(self, other):
+        """Adds another dashboard's aggregates (same bands and bins) to this one."""
+        for column, labels in other.labels.items():
+            for index, label in enumerate(labels):
+                if label not in self.labels[column]:
+                    self.labels[column].append(label)
+                    self._grow(column, len(self.labels[column]))
+                target = self.labels[column].index(label)
+                self.totals[column][target] += other.totals[column][index]
+                self.diabetic[column][target] += other.diabetic[column][index]
+                self.histograms[column][target] += other.histograms[column][index]
+        self.rows += other.rows
+        return self
+
+    def table(self, column):
+        """Rows, diabetic rows and diabetes rate per band, as a DataFrame."""
+        totals = self.totals[column]
+        frame = pd.DataFrame({column: self.labels[column], 'total': totals, 'diabetic': self.diabetic[column],
+                              'rate': np.divide(self.diabetic[column], totals, out=np.zeros(len(totals)),
+                                                where=totals > 0)})
+        # Bands always show, categories and 'Unknown' only when seen
+        keep = totals > 0
+        if column in self.bands:
+            keep[:-1] = True
+        return frame[keep].reset_index(drop=True)
+
+    def probability_histogram(self, column=None):
+        """(counts, bin edges) of the predicted probabilities, per band of `column` if given."""
+        if column is None:
+            column = next(iter(self.histograms))
+            return self.histograms[column].sum(axis=0), self.probability_edges
+        return self.histograms[column], self.probability_edges
+
 """## **🤖Plot Class For Bot**"""
 
 class ploting_charts:
-    def __init__(self):
-        return
+    """
+    Pie and bar charts. By default they open in a pyplot window; pass
+    `fmt` ('png', 'svg', ...) to render headless instead and get the file
+    bytes back. Headless charts are drawn on a standalone Agg figure, so
+    they need no display and leave no figures behind in pyplot.
+    """
+    def __init__(self, dpi=100):
+        self.dpi = dpi
+
+    def _figure(self, figsize, fmt):
+        if fmt is None:
+            return plt.figure(figsize=figsize)
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        figure = Figure(figsize=figsize, dpi=self.dpi)
+        FigureCanvasAgg(figure)
+        return figure
 
-    def pieChart(self, data, labels, title="Pie Chart"):
+    @staticmethod
+    def _render(figure, fmt):
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format=fmt, bbox_inches='tight')
+        return buffer.getvalue()
+
+    def pieChart(self, data, labels, title="Pie Chart", fmt=None):
         """
         Generates a pie chart with labels and percentages in the legend.
 
@@ -109,8 +1398,14 @@ class ploting_charts:
             data (list): A list of numerical values representing the data.
             labels (list): A list of labels for the data slices.
             title (str, optional): The title of the chart. Defaults to "Pie Chart".
+            fmt (str, optional): Image format to render to instead of showing the chart.
+
+        Returns:
+            bytes: The rendered image when `fmt` is given, otherwise None.
         """
-        plt.figure(figsize=(6, 6))
+        data, labels = list(data), list(labels)
+        figure = self._figure((6, 6), fmt)
+        ax = figure.gca()
 
         # Explode the pie chart slices
         #explode = (0.1, 0)  # Removed to avoid issues with label placement
@@ -120,19 +1415,22 @@ class ploting_charts:
         percentages = [(x / total) * 100 for x in data]
 
         # Create the pie chart with percentage labels and start angle
-        wedges, texts, autotexts = plt.pie(data, labels=labels, autopct='%1.1f%%', startangle=90,  shadow=True)
+        wedges, texts, autotexts = ax.pie(data, labels=labels, autopct='%1.1f%%', startangle=90,  shadow=True)
         # Create custom legend labels with percentages
         legend_labels = ['{0} - {1:1.1f} %'.format(i,j) for i,j in zip(labels, percentages)]
 
         # Add the legend
-        plt.legend(wedges, legend_labels, loc="best", bbox_to_anchor=(1, 0, 0.5, 1))
+        ax.legend(wedges, legend_labels, loc="best", bbox_to_anchor=(1, 0, 0.5, 1))
 
 
-        plt.title(title)
-        plt.axis('equal')
-        plt.show()
+        ax.set_title(title)
+        ax.axis('equal')
+        if fmt is None:
+            plt.show()
+            return None
+        return self._render(figure, fmt)
 
-    def barChart(self, data, labels, title="Bar Chart", xlabel="X-axis", ylabel="Y-axis"):
+    def barChart(self, data, labels, title="Bar Chart", xlabel="X-axis", ylabel="Y-axis", fmt=None):
         """
         Generates a bar chart.
 
@@ -142,27 +1440,338 @@ class ploting_charts:
             title (str, optional): The title of the chart. Defaults to "Bar Chart".
             xlabel (str, optional): The label for the x-axis. Defaults to "X-axis".
             ylabel (str, optional): The label for the y-axis. Defaults to "Y-axis".
+            fmt (str, optional): Image format to render to instead of showing the chart.
+
+        Returns:
+            bytes: The rendered image when `fmt` is given, otherwise None.
+        """
+        figure = self._figure((8, 6), fmt)  # Adjust figure size as needed
+        ax = figure.gca()
+        ax.bar(list(labels), list(data))
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        if fmt is None:
+            plt.show()
+            return None
+        return self._render(figure, fmt)
+
+    def dashboard(self, dashboard, fmt=None):
+        """
+        Draws a CohortDashboard: diabetes rate per band of each dimension
+        and the probability histogram, on one figure.
+
+        Args:
+            dashboard (CohortDashboard): Aggregates to draw.
+            fmt (str, optional): Image format to render to instead of showing the chart.
+
+        Returns:
+            bytes: The rendered image when `fmt` is given, otherwise None.
+        """
+        figure = self._figure((15, 8), fmt)
+        self.drawDashboard(figure, dashboard)
+        if fmt is None:
+            plt.show()
+            return None
+        return self._render(figure, fmt)
+
+    @staticmethod
+    def drawDashboard(figure, dashboard, histogram_by='HbA1c_level'):
+        """Clears `figure` and draws the dashboard panels onto it."""
+        figure.clear()
+        columns = list(dashboard.labels)
+        n_cols = 3
+        n_rows = -(-(len(columns) + 1) // n_cols)
+        axes = figure.subplots(n_rows, n_cols, squeeze=False).ravel()
+
+        for ax, column in zip(axes, columns):
+            table = dashboard.table(column)
+            ax.bar(table[column].astype(str), table['rate'] * 100, color='#ff9999', edgecolor='#c0392b')
+            ax.set_title(f"Diabetes rate by {DASHBOARD_TITLES.get(column, column)}")
+            ax.set_ylabel('% predicted diabetic')
+            ax.tick_params(axis='x', labelrotation=30)
+
+        # Probability histogram, stacked by band so the bins show who they hold
+        ax = axes[len(columns)]
+        counts, edges = dashboard.probability_histogram(histogram_by)
+        bottom = np.zeros(len(edges) - 1)
+        for label, band_counts in zip(dashboard.labels[histogram_by], counts):
+            if band_counts.any():
+                ax.bar(edges[:-1], band_counts, width=np.diff(edges), align='edge', bottom=bottom,
+                       label=label, edgecolor='white')
+                bottom += band_counts
+        ax.set_title(f"Predicted probability by {DASHBOARD_TITLES.get(histogram_by, histogram_by)}")
+        ax.set_xlabel('Probability of diabetes')
+        ax.set_ylabel('Rows')
+        if bottom.any():
+            ax.legend(fontsize='small')
+        for ax in axes[len(columns) + 1:]:
+            ax.set_visible(False)
+
+        figure.suptitle(f"Cohort dashboard ({dashboard.rows:,} rows)", fontweight='bold')
+        figure.tight_layout()
+
+    @staticmethod
+    def updatePieChart(wedges, texts, autotexts, data, startangle=0, labeldistance=1.1, pctdistance=0.6):
+        """
+        Moves the wedges and labels of an existing `ax.pie` chart to new
+        data, the way `ax.pie` would have placed them, without creating any
+        new artists. Redraw the canvas afterwards.
         """
-        plt.figure(figsize=(8, 6))  # Adjust figure size as needed
-        plt.bar(labels, data)
-        plt.title(title)
-        plt.xlabel(xlabel)
-        plt.ylabel(ylabel)
-        plt.show()
+        total = float(sum(data))
+        theta = startangle
+        for wedge, text, autotext, value in zip(wedges, texts, autotexts, data):
+            span = 360.0 * value / total
+            wedge.set_theta1(theta)
+            wedge.set_theta2(theta + span)
+            middle = np.deg2rad(theta + span / 2)
+            x, y = np.cos(middle), np.sin(middle)
+            text.set_position((labeldistance * x, labeldistance * y))
+            text.set_horizontalalignment('left' if x > 0 else 'right')
+            autotext.set_position((pctdistance * x, pctdistance * y))
+            autotext.set_text(f'{100.0 * value / total:1.1f}%')
+            theta += span
 ## **🔍 Image & Info Modules**"""
 
-import cv2
-import pytesseract
-from googlesearch import search
+cv2 = LazyModule('cv2')
+pytesseract = LazyModule('pytesseract')
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import sqlite3
+import threading
+import asyncio
+import contextlib
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+OCR_CACHE_PATH = os.path.join(BASE_DIR, "data", "cache", "ocr_cache.db")
+OCR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class OCRCache:
+    """
+    Persistent OCR result cache keyed by a hash of the image bytes and the
+    OCR settings, so a changed image or different settings never return a
+    stale result.
+
+    Entries live in a small SQLite file and are evicted least recently used
+    first once their text exceeds `max_bytes`. Recently used entries are
+    also kept in memory (up to `memory_entries`) so repeat lookups do not
+    touch the disk.
+    """
+    def __init__(self, path=OCR_CACHE_PATH, max_bytes=OCR_CACHE_MAX_BYTES, memory_entries=256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Shared by the UI's worker threads, guarded by _lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS ocr_cache
+                                (key TEXT PRIMARY KEY,
+                                text TEXT NOT NULL,
+                                size INTEGER NOT NULL,
+                                last_access REAL NOT NULL)''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_access ON ocr_cache(last_access)")
+
+    @staticmethod
+    def key(image_bytes, settings):
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            row = self.conn.execute("SELECT text FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE ocr_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key, text):
+        with self._lock:
+            with self.conn:
+                self.conn.execute('''INSERT OR REPLACE INTO ocr_cache (key, text, size, last_access)
+                                    VALUES (?, ?, ?, ?)''', (key, text, len(text.encode()), time.time()))
+                self._evict()
+            self._remember(key, text)
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        evicted = []
+        for key, size in self.conn.execute("SELECT key, size FROM ocr_cache ORDER BY last_access"):
+            evicted.append(key)
+            freed += size
+            if freed >= excess:
+                break
+        self.conn.executemany("DELETE FROM ocr_cache WHERE key = ?", [(key,) for key in evicted])
+        for key in evicted:
+            self._memory.pop(key, None)
+
+    def close(self):
+        self.conn.close()
+
+class ImagePreprocessor:
+    """
+    OpenCV clean-up applied before Tesseract. Each step can be switched off.
+
+    - resize: scale so the page is about `target_dpi` (assuming it is
+      `page_width_inches` wide), never more than `max_upscale`. Large phone
+      photos shrink a lot, which is where most of Tesseract's time goes.
+    - deskew: rotate by the skew angle of the text pixels (up to `max_skew`).
+    - threshold: adaptive Gaussian binarization, robust to uneven lighting.
+    - crop_text: find text blocks with a morphological close, blank
+      everything else and crop to their bounding box so Tesseract only sees
+      text regions.
+    """
+    def __init__(self, resize=True, target_dpi=300, page_width_inches=8.5, max_upscale=2.0,
+                 deskew=True, max_skew=15.0, threshold=True, block_size=31, threshold_c=15,
+                 crop_text=True, min_region_area=500):
+        self.resize = resize
+        self.target_dpi = target_dpi
+        self.page_width_inches = page_width_inches
+        self.max_upscale = max_upscale
+        self.deskew = deskew
+        self.max_skew = max_skew
+        self.threshold = threshold
+        self.block_size = block_size
+        self.threshold_c = threshold_c
+        self.crop_text = crop_text
+        self.min_region_area = min_region_area
+
+    def settings(self):
+        """Constructor arguments; part of the OCR cache key."""
+        return dict(vars(self))
+
+    def process(self, gray):
+        """
+        Args:
+            gray (np.ndarray): Grayscale image.
+
+        Returns:
+            np.ndarray: The image to hand to Tesseract.
+        """
+        if self.resize:
+            gray = self._resize(gray)
+        if self.deskew:
+            gray = self._deskew(gray)
+        if self.threshold:
+            gray = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                         self.block_size, self.threshold_c)
+        if self.crop_text:
+            gray = self._crop_text(gray)
+        return gray
+
+    def _resize(self, gray):
+        scale = self.target_dpi * self.page_width_inches / gray.shape[1]
+        scale = min(scale, self.max_upscale)
+        if abs(scale - 1.0) < 0.05:
+            return gray
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
+    def _text_mask(self, gray):
+        # Dark text on a light page -> white text pixels on black
+        return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1]
+
+    def _deskew(self, gray):
+        coords = cv2.findNonZero(self._text_mask(gray))
+        if coords is None:
+            return gray
+        angle = cv2.minAreaRect(coords)[-1]
+        # minAreaRect reports angles in [0, 90); map to the smallest rotation
+        if angle > 45:
+            angle -= 90
+        if abs(angle) < 0.5 or abs(angle) > self.max_skew:
+            return gray
+        height, width = gray.shape
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        return cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_CUBIC,
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    def _crop_text(self, gray):
+        mask = self._text_mask(gray)
+        # Join characters into line/paragraph blobs
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, gray.shape[1] // 60), 5))
+        blobs = cv2.dilate(cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel), kernel, iterations=1)
+        contours = cv2.findContours(blobs, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+        boxes = [cv2.boundingRect(c) for c in contours]
+        boxes = [b for b in boxes if b[2] * b[3] >= self.min_region_area]
+        if not boxes:
+            return gray
+
+        regions = np.full_like(gray, 255)
+        for x, y, w, h in boxes:
+            regions[y:y + h, x:x + w] = gray[y:y + h, x:x + w]
+        pad = 10
+        left = max(min(b[0] for b in boxes) - pad, 0)
+        top = max(min(b[1] for b in boxes) - pad, 0)
+        right = min(max(b[0] + b[2] for b in boxes) + pad, gray.shape[1])
+        bottom = min(max(b[1] + b[3] for b in boxes) + pad, gray.shape[0])
+        return regions[top:bottom, left:right]
 
 class ImageProcessor:
-    def __init__(self):
-        pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-        # return
+    def __init__(self, tesseract_cmd=TESSERACT_CMD, lang="eng", tesseract_config="",
+                 cache_path=OCR_CACHE_PATH, cache_max_bytes=OCR_CACHE_MAX_BYTES,
+                 preprocessor=None):
+        self.tesseract_cmd = tesseract_cmd
+        self.lang = lang
+        self.tesseract_config = tesseract_config
+        # Pass an ImagePreprocessor to clean images up before Tesseract. Off
+        # by default (plain grayscale) until benchmark_GlucoScholar.py
+        # ocr_preprocessing shows it does not lower character accuracy on
+        # the reference transcripts in data/images; the Image Analysis tab
+        # can switch it on. Assigning a new value takes effect immediately.
+        self.preprocessor = preprocessor
+        # Set cache_path=None to always run Tesseract
+        self.cache = OCRCache(cache_path, cache_max_bytes) if cache_path else None
+        # (path, mtime, size, settings) -> content key, so unchanged files are not re-hashed
+        self._file_keys = {}
     
+    def ocr_settings(self):
+        """Everything besides the image bytes that affects the OCR output."""
+        return {'lang': self.lang, 'config': self.tesseract_config,
+                'preprocessing': self.preprocessor.settings() if self.preprocessor else None}
+
+    def cache_key(self, image_path, image_bytes=None):
+        stat = os.stat(image_path)
+        settings = self.ocr_settings()
+        # The settings are part of the id: switching preprocessing on or off
+        # must not reuse keys computed under the other setting
+        file_id = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size,
+                   json.dumps(settings, sort_keys=True))
+        key = self._file_keys.get(file_id)
+        if key is None:
+            if image_bytes is None:
+                with open(image_path, 'rb') as f:
+                    image_bytes = f.read()
+            key = OCRCache.key(image_bytes, settings)
+            self._file_keys[file_id] = key
+        return key
+
     def extract_text(self, image_path):
         """
-        Extracts text from an image using Tesseract OCR.
+        Extracts text from an image using Tesseract OCR. Results are cached
+        by image content and OCR settings.
 
         Args:
             image_path (str): Path to the image file.
@@ -170,35 +1779,822 @@ class ImageProcessor:
         Returns:
             str: Extracted text from the image.
         """
+        key = self.cache_key(image_path) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        text = self._ocr(image_path)
+        if key:
+            self.cache.put(key, text)
+        return text
+
+    def _ocr(self, image_path):
         image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not read image: {image_path}")
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        text = pytesseract.image_to_string(gray)
+        if self.preprocessor:
+            gray = self.preprocessor.process(gray)
+        pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        text = pytesseract.image_to_string(gray, lang=self.lang, config=self.tesseract_config)
         return text.strip()
 
+    @staticmethod
+    def list_images(directory):
+        """Returns the image files in `directory`, sorted by name."""
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+
+    def extract_text_batch(self, image_paths, workers=None, cancel_event=None):
+        """
+        Runs OCR over many images on a process pool (one Tesseract call per
+        worker at a time) and yields results as they finish, not in input
+        order.
+
+        Args:
+            image_paths (list): Image files to process.
+            workers (int, optional): Pool size. Defaults to the CPU count.
+            cancel_event (threading.Event, optional): Stops handing out new
+                images once set.
+
+        Yields:
+            tuple: (path, text, error); `error` is None on success, otherwise
+            the error message and `text` is empty.
+        """
+        # Cached images are answered here; only misses go to the pool
+        pending = {}
+        for path in image_paths:
+            key = None
+            if self.cache:
+                try:
+                    key = self.cache_key(path)
+                except OSError as e:
+                    yield path, "", str(e)
+                    continue
+                cached = self.cache.get(key)
+                if cached is not None:
+                    yield path, cached, None
+                    continue
+            pending[path] = key
+            if cancel_event is not None and cancel_event.is_set():
+                return
+        if not pending:
+            return
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=_init_ocr_worker,
+                                 initargs=(self._worker_settings(),)) as pool:
+            futures = [pool.submit(_ocr_worker, path) for path in pending]
+            try:
+                for future in as_completed(futures):
+                    path, text, error = future.result()
+                    if error is None and pending[path]:
+                        self.cache.put(pending[path], text)
+                    yield path, text, error
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _worker_settings(self):
+        # Everything a pool process needs to build an equivalent processor;
+        # caching stays in the parent process
+        return {'tesseract_cmd': self.tesseract_cmd, 'lang': self.lang,
+                'tesseract_config': self.tesseract_config, 'cache_path': None,
+                'preprocessor': self.preprocessor}
+
+    def batch_extract(self, image_paths, output_path, workers=None, progress_callback=None, cancel_event=None):
+        """
+        OCRs a folder (or list) of images and writes path -> text records to
+        `output_path` as they complete: JSON lines for `.jsonl`, otherwise CSV
+        with path, text and error columns.
+
+        Args:
+            image_paths (str or list): A directory, or a list of image files.
+            output_path (str): Results file.
+            workers (int, optional): Pool size. Defaults to the CPU count.
+            progress_callback (callable, optional): Called with the running
+                stats dict after each image.
+            cancel_event (threading.Event, optional): Stops early once set.
+
+        Returns:
+            dict: Image and failure counts, elapsed seconds and images/second.
+        """
+        if isinstance(image_paths, str):
+            image_paths = self.list_images(image_paths)
+        stats = {'images': 0, 'failed': 0, 'total': len(image_paths), 'seconds': 0.0,
+                 'images_per_second': 0.0, 'output_path': output_path}
+        jsonl = output_path.lower().endswith('.jsonl')
+        start = time.perf_counter()
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            writer = None if jsonl else csv.writer(f)
+            if writer:
+                writer.writerow(['path', 'text', 'error'])
+            for path, text, error in self.extract_text_batch(image_paths, workers, cancel_event):
+                if jsonl:
+                    f.write(json.dumps({'path': path, 'text': text, 'error': error}) + "\n")
+                else:
+                    writer.writerow([path, text, error or ''])
+                stats['images'] += 1
+                stats['failed'] += error is not None
+                stats['seconds'] = time.perf_counter() - start
+                stats['images_per_second'] = stats['images'] / stats['seconds'] if stats['seconds'] else 0.0
+                if progress_callback:
+                    progress_callback(dict(stats))
+        return stats
+
+# Per-process ImageProcessor used by the batch OCR pool
+_worker_processor = None
+
+def _init_ocr_worker(settings):
+    global _worker_processor
+    _worker_processor = ImageProcessor(**settings)
+
+def _ocr_worker(image_path):
+    try:
+        return image_path, _worker_processor.extract_text(image_path), None
+    except Exception as e:
+        return image_path, "", str(e)
+
+# Numeric ranges accepted by the Prediction tab; parsed values outside them
+# get a lower confidence
+LAB_VALUE_RANGES = {field: (rule['min'], rule['max'])
+                    for field, rule in VALIDATION_RULES.items() if 'min' in rule}
+# Minimum confidence for a parsed value to be used automatically
+LAB_VALUE_MIN_CONFIDENCE = 0.5
+
+_NUMBER = r'(\d{1,3}(?:[.,]\d+)?)'
+_YES_NO = r'(yes|no|present|absent|positive|negative|nil|none|y|n|1|0)'
+
+class LabValueParser:
+    """
+    Pulls the eight randomForest features out of OCR text from lab reports.
+
+    `parse` returns, for each field found, the value converted to the units
+    the model was trained on, the unit as written, a confidence between 0
+    and 1 and the matched text. All patterns are compiled once per class.
+    """
+    AGE = [
+        (re.compile(r'\bage\b\s*(?:\(\w+\))?\s*[:\-=]?\s*(\d{1,3})\s*(years?|yrs?|y)?\b', re.I), 0.9),
+        (re.compile(r'\b(\d{1,3})\s*(years?|yrs?)\s*old\b', re.I), 0.8),
+        (re.compile(r'\b(\d{1,3})\s*(y)\s*/\s*[mf]\b', re.I), 0.7),
+    ]
+    GENDER = [
+        (re.compile(r'\b(?:sex|gender)\b\s*[:\-=]?\s*(male|female|other|m|f)\b', re.I), 0.95),
+        (re.compile(r'\b\d{1,3}\s*y\s*/\s*([mf])\b', re.I), 0.8),
+        (re.compile(r'\b(male|female)\b', re.I), 0.6),
+    ]
+    HYPERTENSION = [
+        (re.compile(r'\b(?:hypertension|htn|high blood pressure)\b\s*[:\-=]?\s*' + _YES_NO + r'?\b', re.I), 0.9),
+    ]
+    BLOOD_PRESSURE = re.compile(r'\b(?:bp|blood pressure)\b\s*[:\-=]?\s*(\d{2,3})\s*/\s*(\d{2,3})', re.I)
+    HEART_DISEASE = [
+        (re.compile(r'\b(?:heart disease|cardiac disease|coronary artery disease|cad|ihd|heart failure|chf)\b'
+                    r'\s*[:\-=]?\s*' + _YES_NO + r'?\b', re.I), 0.9),
+    ]
+    SMOKING = [
+        (re.compile(r'\b(non|ex|never|current|former)[\s\-]?smoker\b', re.I), 0.9),
+        (re.compile(r'\b(?:smok(?:er|ing)(?:\s*(?:history|status))?|tobacco(?:\s*use)?)\b\s*[:\-=]?\s*'
+                    r'(not current|never|current|former|ex|past|ever|non|no|yes|none|nil)\b', re.I), 0.9),
+    ]
+    SMOKING_VALUES = {
+        'non': 'never', 'never': 'never', 'no': 'never', 'none': 'never', 'nil': 'never',
+        'current': 'current', 'yes': 'current',
+        'ex': 'former', 'former': 'former', 'past': 'former',
+        'ever': 'ever', 'not current': 'not current',
+    }
+    BMI = [
+        (re.compile(r'\b(?:bmi|body mass index)\b\s*[:\-=]?\s*' + _NUMBER + r'\s*(kg/m2|kg/m²|kg/m\^2)?', re.I), 0.9),
+    ]
+    HBA1C = [
+        (re.compile(r'\b(?:hb\s*a1c|a1c|glycat?ed ha?emoglobin|glycosylated ha?emoglobin)\b[^\d\n]{0,25}?'
+                    + _NUMBER + r'\s*(%|mmol/mol)?', re.I), 0.9),
+    ]
+    GLUCOSE = [
+        (re.compile(r'\b(?:fasting (?:plasma |blood )?glucose|blood glucose|plasma glucose|blood sugar|glucose|fbs|fpg|rbs)\b'
+                    r'[^\d\n]{0,25}?' + _NUMBER + r'\s*(mg/dl|mmol/l)?', re.I), 0.9),
+    ]
+    YES = {'yes', 'present', 'positive', 'y', '1'}
+
+    @staticmethod
+    def _number(text):
+        return float(text.replace(',', '.'))
+
+    def _first(self, patterns, text):
+        for pattern, confidence in patterns:
+            match = pattern.search(text)
+            if match:
+                return match, confidence
+        return None, 0.0
+
+    def _result(self, field, value, unit, confidence, match):
+        low_high = LAB_VALUE_RANGES.get(field)
+        if low_high and not (low_high[0] <= value <= low_high[1]):
+            confidence -= 0.3
+        return {'value': value, 'unit': unit, 'confidence': round(max(confidence, 0.0), 2),
+                'text': match.group(0).strip()}
+
+    def _flag(self, patterns, text):
+        match, confidence = self._first(patterns, text)
+        if not match:
+            return None
+        answer = (match.group(1) or '').lower()
+        if not answer:
+            # Condition named without a yes/no (e.g. in a history list)
+            return 1, confidence - 0.3, match
+        return (1 if answer in self.YES else 0), confidence, match
+
+    def parse(self, text):
+        """
+        Args:
+            text (str): OCR output.
+
+        Returns:
+            dict: Field name -> {'value', 'unit', 'confidence', 'text'} for
+            every field that was found.
+        """
+        values = {}
+
+        match, confidence = self._first(self.GENDER, text)
+        if match:
+            gender = match.group(1).lower()
+            values['gender'] = {'value': 'Male' if gender.startswith('m') else 'Female' if gender.startswith('f') else 'Other',
+                                'unit': None, 'confidence': confidence, 'text': match.group(0).strip()}
+
+        match, confidence = self._first(self.AGE, text)
+        if match:
+            values['age'] = self._result('age', float(match.group(1)), 'years', confidence, match)
+
+        flag = self._flag(self.HYPERTENSION, text)
+        if flag:
+            values['hypertension'] = {'value': flag[0], 'unit': None, 'confidence': round(flag[1], 2),
+                                      'text': flag[2].group(0).strip()}
+        else:
+            match = self.BLOOD_PRESSURE.search(text)
+            if match:
+                systolic, diastolic = int(match.group(1)), int(match.group(2))
+                values['hypertension'] = {'value': int(systolic >= 140 or diastolic >= 90), 'unit': 'mmHg',
+                                          'confidence': 0.5, 'text': match.group(0).strip()}
+
+        flag = self._flag(self.HEART_DISEASE, text)
+        if flag:
+            values['heart_disease'] = {'value': flag[0], 'unit': None, 'confidence': round(flag[1], 2),
+                                       'text': flag[2].group(0).strip()}
+
+        match, confidence = self._first(self.SMOKING, text)
+        if match:
+            values['smoking_history'] = {'value': self.SMOKING_VALUES[match.group(1).lower()], 'unit': None,
+                                         'confidence': confidence, 'text': match.group(0).strip()}
+
+        match, confidence = self._first(self.BMI, text)
+        if match:
+            values['bmi'] = self._result('bmi', self._number(match.group(1)), 'kg/m2', confidence, match)
+
+        match, confidence = self._first(self.HBA1C, text)
+        if match:
+            value, unit = self._number(match.group(1)), (match.group(2) or '').lower()
+            if not unit:
+                # Values above 20 can only be IFCC units
+                unit = 'mmol/mol' if value > 20 else '%'
+                confidence -= 0.1
+            if unit == 'mmol/mol':
+                value = round(0.09148 * value + 2.152, 1)
+            values['HbA1c_level'] = self._result('HbA1c_level', value, unit, confidence, match)
+
+        match, confidence = self._first(self.GLUCOSE, text)
+        if match:
+            value, unit = self._number(match.group(1)), (match.group(2) or '').lower()
+            if not unit:
+                # Plausible glucose in mg/dL is never below 35
+                unit = 'mmol/l' if value < 35 else 'mg/dl'
+                confidence -= 0.1
+            if unit == 'mmol/l':
+                value = round(value * 18.016, 1)
+            values['blood_glucose_level'] = self._result('blood_glucose_level', value, unit, confidence, match)
+
+        return values
+
+    def to_input_data(self, parsed, defaults=None, min_confidence=LAB_VALUE_MIN_CONFIDENCE):
+        """
+        Builds a Prediction-tab style input dict from `parse` output.
+
+        Args:
+            parsed (dict): Result of `parse`.
+            defaults (dict, optional): Values used for fields not found.
+            min_confidence (float, optional): Parsed values below this are ignored.
+
+        Returns:
+            tuple: (input_data, missing, defaulted) where `missing` lists
+            fields with no value and `defaulted` those taken from `defaults`.
+        """
+        defaults = defaults or {}
+        input_data, missing, defaulted = {}, [], []
+        for field in FEATURE_COLUMNS:
+            found = parsed.get(field)
+            if found and found['confidence'] >= min_confidence:
+                input_data[field] = found['value']
+            elif field in defaults:
+                input_data[field] = defaults[field]
+                defaulted.append(field)
+            else:
+                missing.append(field)
+        return input_data, missing, defaulted
+
+    def score_reports(self, radFor, image_processor, image_paths, output_path=None, defaults=None,
+                      workers=None, progress_callback=None, cancel_event=None):
+        """
+        End-to-end batch mode: OCR every image, parse the lab values and
+        score all complete records with one batched forest call.
+
+        Args:
+            radFor (randomForest): Fitted model.
+            image_processor (ImageProcessor): Used for (cached, parallel) OCR.
+            image_paths (str or list): A directory, or a list of image files.
+            output_path (str, optional): CSV of path, features, missing and
+                defaulted fields, prediction and probability.
+            defaults (dict, optional): See `to_input_data`.
+            workers (int, optional): OCR pool size.
+            progress_callback (callable, optional): Called with (done, total).
+            cancel_event (threading.Event, optional): Stops OCR early.
+
+        Returns:
+            list: One dict per image with 'path', 'values', 'missing',
+            'defaulted', 'error', 'prediction' and 'probability' (None when
+            the record could not be scored).
+        """
+        if isinstance(image_paths, str):
+            image_paths = image_processor.list_images(image_paths)
+        results = []
+        for path, text, error in image_processor.extract_text_batch(image_paths, workers, cancel_event):
+            values, missing, defaulted = self.to_input_data(self.parse(text), defaults) if not error else ({}, list(FEATURE_COLUMNS), [])
+            results.append({'path': path, 'values': values, 'missing': missing, 'defaulted': defaulted,
+                            'error': error, 'prediction': None, 'probability': None})
+            if progress_callback:
+                progress_callback(len(results), len(image_paths))
+
+        complete = [r for r in results if not r['missing']]
+        if complete:
+            frame = pd.DataFrame([r['values'] for r in complete], columns=FEATURE_COLUMNS)
+            predictions, probabilities = radFor.predictMatrix(
+                radFor.encode_features(frame, handle_unknown='default'), return_proba=True)
+            for result, prediction, probability in zip(complete, predictions, probabilities):
+                result['prediction'] = int(prediction)
+                result['probability'] = float(probability)
+
+        if output_path:
+            with open(output_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['path'] + FEATURE_COLUMNS + ['missing', 'defaulted', 'error', 'prediction', 'probability'])
+                for r in results:
+                    writer.writerow([r['path']] + [r['values'].get(c, '') for c in FEATURE_COLUMNS]
+                                    + [';'.join(r['missing']), ';'.join(r['defaulted']), r['error'] or '',
+                                       '' if r['prediction'] is None else r['prediction'],
+                                       '' if r['probability'] is None else round(r['probability'], 4)])
+        return results
+
+# Canonical search term -> spellings, synonyms and abbreviations found in
+# reports. Canonical terms are emitted in this order, so the original six
+# keywords come first. Fields every lab sheet has (BMI, eGFR) are left out.
+MEDICAL_VOCABULARY = {
+    'diabetes': ['diabetes', 'diabetes mellitus', 'diabetic', 'diabetics'],
+    'glucose': ['glucose', 'blood glucose', 'plasma glucose', 'serum glucose', 'bg', 'rbs',
+                'random blood sugar', 'random blood glucose', 'random plasma glucose'],
+    'hba1c': ['hba1c', 'hb a1c', 'hba1', 'a1c', 'hemoglobin a1c', 'haemoglobin a1c',
+              'glycated hemoglobin', 'glycated haemoglobin', 'glycosylated hemoglobin',
+              'glycosylated haemoglobin', 'glycohemoglobin', 'glycohaemoglobin'],
+    'blood sugar': ['blood sugar', 'blood sugar level', 'sugar level'],
+    'insulin': ['insulin', 'basal insulin', 'bolus insulin', 'insulin resistance', 'fasting insulin'],
+    'hyperglycemia': ['hyperglycemia', 'hyperglycaemia', 'high blood sugar', 'high blood glucose'],
+    'hypoglycemia': ['hypoglycemia', 'hypoglycaemia', 'low blood sugar', 'low blood glucose'],
+    'prediabetes': ['prediabetes', 'pre-diabetes', 'prediabetic', 'impaired fasting glucose', 'ifg',
+                    'impaired glucose tolerance', 'igt'],
+    'type 1 diabetes': ['type 1 diabetes', 'type-1 diabetes', 'type i diabetes', 't1d', 't1dm', 'iddm',
+                        'juvenile diabetes'],
+    'type 2 diabetes': ['type 2 diabetes', 'type-2 diabetes', 'type ii diabetes', 't2d', 't2dm', 'niddm'],
+    'gestational diabetes': ['gestational diabetes', 'gdm'],
+    'fasting plasma glucose': ['fasting plasma glucose', 'fasting blood glucose', 'fasting blood sugar',
+                               'fasting glucose', 'fpg', 'fbg', 'fbs'],
+    'oral glucose tolerance test': ['oral glucose tolerance test', 'glucose tolerance test', 'ogtt', 'gtt'],
+    'postprandial glucose': ['postprandial glucose', 'post prandial glucose', 'postprandial blood sugar',
+                             'ppbs', 'ppg', '2hpp', '2-hour plasma glucose'],
+    'estimated average glucose': ['estimated average glucose', 'eag'],
+    'continuous glucose monitoring': ['continuous glucose monitoring', 'continuous glucose monitor', 'cgm'],
+    'fructosamine': ['fructosamine'],
+    'c-peptide': ['c-peptide', 'c peptide'],
+    'ketoacidosis': ['ketoacidosis', 'diabetic ketoacidosis', 'dka', 'ketones', 'ketonuria'],
+    'metformin': ['metformin', 'biguanide', 'glucophage'],
+    'sulfonylurea': ['sulfonylurea', 'sulfonylureas', 'sulphonylurea', 'sulphonylureas', 'glimepiride',
+                     'gliclazide', 'glipizide', 'glibenclamide', 'glyburide'],
+    'dpp-4 inhibitor': ['dpp-4 inhibitor', 'dpp-4 inhibitors', 'dpp4 inhibitor', 'dpp4 inhibitors',
+                        'sitagliptin', 'linagliptin', 'saxagliptin', 'vildagliptin'],
+    'sglt2 inhibitor': ['sglt2 inhibitor', 'sglt2 inhibitors', 'sglt-2 inhibitor', 'empagliflozin',
+                        'dapagliflozin', 'canagliflozin'],
+    'glp-1 agonist': ['glp-1 agonist', 'glp-1 receptor agonist', 'glp1', 'glp-1', 'semaglutide',
+                      'liraglutide', 'dulaglutide', 'exenatide', 'tirzepatide'],
+    'thiazolidinedione': ['thiazolidinedione', 'thiazolidinediones', 'tzd', 'tzds', 'pioglitazone'],
+    'diabetic neuropathy': ['diabetic neuropathy', 'peripheral neuropathy', 'neuropathy'],
+    'diabetic retinopathy': ['diabetic retinopathy', 'retinopathy'],
+    'diabetic nephropathy': ['diabetic nephropathy', 'diabetic kidney disease', 'nephropathy',
+                             'microalbuminuria', 'albuminuria', 'uacr'],
+    'metabolic syndrome': ['metabolic syndrome'],
+    'obesity': ['obesity', 'obese', 'overweight'],
+    'hypertension': ['hypertension', 'high blood pressure', 'htn'],
+}
+
+MAX_QUERY_TERMS = 6
+
+# Hosts (and their subdomains) whose pages are trusted medical resources
+TRUSTED_DOMAINS = (
+    'diabetes.org',
+    'nih.gov',
+    'who.int',
+    'mayoclinic.org',
+    'medlineplus.gov',
+    'webmd.com',
+    'healthline.com',
+    'medicalnewstoday.com',
+    'cdc.gov',
+    'diabetesjournals.org',
+)
+
+# Search engine pages that are never results, by host and path prefix
+BLOCKED_URL_PATHS = {
+    'google.com': ('/search', '/url', '/webhp'),
+}
+
+class MedicalTermMatcher:
+    """
+    Extracts canonical medical terms from free text in a single regex pass.
+    All spellings in `vocabulary` are compiled into one trie-shaped pattern,
+    so matching costs the same however large the vocabulary grows, and the
+    longest spelling wins where several start at the same place
+    ("fasting plasma glucose" rather than "glucose"). Matching ignores case
+    and needs word boundaries, so "bg" never matches inside "bga".
+    """
+    _END = ''
+
+    def __init__(self, vocabulary=MEDICAL_VOCABULARY):
+        self.vocabulary = vocabulary
+        self.rank = {term: rank for rank, term in enumerate(vocabulary)}
+        self.canonical = {}
+        for term, spellings in vocabulary.items():
+            for spelling in [term] + list(spellings):
+                self.canonical.setdefault(" ".join(spelling.lower().split()), term)
+        trie = {}
+        for spelling in self.canonical:
+            node = trie
+            for char in spelling:
+                node = node.setdefault(char, {})
+            node[self._END] = True
+        # Matched against lowercased text; cheaper than re.IGNORECASE
+        self.pattern = re.compile(r"(?<![a-z0-9])(" + self._trie_regex(trie) + r")(?![a-z0-9])")
+
+    @classmethod
+    def _trie_regex(cls, node):
+        branches = []
+        for char in sorted(key for key in node if key != cls._END):
+            # Any run of whitespace matches a space in a multi-word spelling
+            branches.append((r"\s+" if char == " " else re.escape(char)) + cls._trie_regex(node[char]))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if cls._END in node:
+            # Optional and greedy: longer spellings are tried first
+            return "(?:" + body + ")?"
+        return body
+
+    def extract(self, text):
+        """Distinct canonical terms found in `text`, in vocabulary order."""
+        found = {self.canonical[" ".join(spelling.split())] for spelling in self.pattern.findall(text.lower())}
+        return sorted(found, key=self.rank.__getitem__)
+
+    def extract_batch(self, texts):
+        return [self.extract(text) for text in texts]
+
+class DomainMatcher:
+    """
+    Hostname allowlist as a trie over reversed labels (org -> diabetes), so
+    a domain also covers its subdomains. Only the parsed hostname is
+    checked: "notdiabetes.org" and "evil.com/?diabetes.org" are not matches.
+    """
+    _END = ''
+
+    def __init__(self, domains):
+        self.trie = {}
+        for domain in domains:
+            node = self.trie
+            for label in reversed(domain.lower().strip('.').split('.')):
+                node = node.setdefault(label, {})
+            node[self._END] = domain
+
+    @staticmethod
+    def hostname(url):
+        if '://' not in url:
+            url = '//' + url
+        try:
+            return urlparse(url).hostname or ''
+        except ValueError:
+            return ''
+
+    def match_host(self, host):
+        """The listed domain covering `host`, or None."""
+        node = self.trie
+        for label in reversed(host.rstrip('.').split('.')):
+            node = node.get(label)
+            if node is None:
+                return None
+            if self._END in node:
+                return node[self._END]
+        return None
+
+    def match(self, url):
+        return self.match_host(self.hostname(url))
+
+    def match_batch(self, urls):
+        return [self.match(url) for url in urls]
+
+SEARCH_CACHE_PATH = os.path.join(BASE_DIR, "data", "cache", "search_cache.db")
+SEARCH_CACHE_TTL = 7 * 24 * 3600
+KNOWLEDGE_CORPUS_PATH = os.path.join(BASE_DIR, "data", "knowledge", "trusted_pages.json")
+LINK_FETCH_TIMEOUT = 8
+LINK_HOST_CONCURRENCY = 2
+LINK_HOST_INTERVAL = 0.5
+SUMMARY_MAX_CHARS = 300
+
+class SearchCache:
+    """
+    Persistent query -> result URLs cache. Keys are the normalized output of
+    `InformationFetcher.clean_query`, so texts that reduce to the same
+    keywords share an entry. Entries older than `ttl` seconds are treated as
+    missing and purged on the next write.
+    """
+    def __init__(self, path=SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Searches run on the UI's worker threads, guarded by _lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS search_cache
+                                (query TEXT PRIMARY KEY,
+                                results TEXT NOT NULL,
+                                created REAL NOT NULL)''')
+
+    @staticmethod
+    def key(query):
+        return " ".join(query.lower().split())
+
+    def get(self, query):
+        with self._lock:
+            row = self.conn.execute("SELECT results, created FROM search_cache WHERE query = ?",
+                                    (self.key(query),)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put(self, query, results):
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO search_cache (query, results, created) VALUES (?, ?, ?)",
+                                  (self.key(query), json.dumps(results), now))
+                self.conn.execute("DELETE FROM search_cache WHERE created < ?", (now - self.ttl,))
+
+    def close(self):
+        self.conn.close()
+
+class KnowledgeIndex:
+    """
+    In-memory inverted index over the bundled corpus of trusted medical
+    pages (a JSON list of {url, title, text}). Pages are ranked by tf-idf
+    over the query terms, with title terms counted twice.
+    """
+    TOKEN = re.compile(r"[a-z0-9]+")
+    STOPWORDS = frozenset("""a an and are as at be by can for from has have how in is it its
+                             of on or site the to what when with your org gov""".split())
+
+    def __init__(self, corpus_path=KNOWLEDGE_CORPUS_PATH):
+        self.corpus_path = corpus_path
+        self.pages = []
+        # token -> [(page index, term frequency)]
+        self.postings = {}
+        if os.path.exists(corpus_path):
+            with open(corpus_path, encoding='utf-8') as f:
+                self.pages = json.load(f)
+        for doc_id, page in enumerate(self.pages):
+            counts = {}
+            for token in self.tokenize(page['title']) * 2 + self.tokenize(page['text']):
+                counts[token] = counts.get(token, 0) + 1
+            length = sum(counts.values())
+            for token, count in counts.items():
+                self.postings.setdefault(token, []).append((doc_id, count / length))
+        self.idf = {token: np.log(len(self.pages) / len(docs)) + 1.0
+                    for token, docs in self.postings.items()}
+
+    @classmethod
+    def tokenize(cls, text):
+        return [token for token in cls.TOKEN.findall(text.lower()) if token not in cls.STOPWORDS]
+
+    def search(self, query, limit=5):
+        scores = {}
+        for token in set(self.tokenize(query)):
+            for doc_id, tf in self.postings.get(token, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + tf * self.idf[token]
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+        return [self.pages[doc_id] for doc_id in ranked[:limit]]
+
+class _HostRateLimiter:
+    """
+    Per-host politeness for concurrent page downloads: at most `concurrency`
+    requests in flight per host, and request starts spaced `interval`
+    seconds apart. Different hosts never wait on each other.
+    """
+    def __init__(self, concurrency=LINK_HOST_CONCURRENCY, interval=LINK_HOST_INTERVAL):
+        self.concurrency = concurrency
+        self.interval = interval
+        self._slots = {}
+        self._locks = {}
+        self._next_start = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, host):
+        if host not in self._slots:
+            self._slots[host] = asyncio.Semaphore(self.concurrency)
+            self._locks[host] = asyncio.Lock()
+        async with self._slots[host]:
+            async with self._locks[host]:
+                loop = asyncio.get_running_loop()
+                wait = self._next_start.get(host, 0.0) - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next_start[host] = loop.time() + self.interval
+            yield
+
 class InformationFetcher:
-    def __init__(self):
+    """
+    Finds trusted medical pages for a piece of text. Fresh results come from
+    the search cache; on a miss Google is searched, falling back to the
+    offline knowledge index when the search fails or is rate limited. With
+    `offline=True` only the cache and the index are used.
+    """
+    def __init__(self, cache_path=SEARCH_CACHE_PATH, cache_ttl=SEARCH_CACHE_TTL,
+                 corpus_path=KNOWLEDGE_CORPUS_PATH, offline=False, fetch_timeout=LINK_FETCH_TIMEOUT,
+                 host_concurrency=LINK_HOST_CONCURRENCY, host_interval=LINK_HOST_INTERVAL,
+                 vocabulary=MEDICAL_VOCABULARY, trusted_domains=TRUSTED_DOMAINS):
         self.search_delay = 3
         self.last_search_time = 0
+        self.term_matcher = MedicalTermMatcher(vocabulary)
+        self.trusted_domains = DomainMatcher(trusted_domains)
+        self.blocked_urls = DomainMatcher(BLOCKED_URL_PATHS)
+        self.offline = offline
+        self.fetch_timeout = fetch_timeout
+        self.host_concurrency = host_concurrency
+        self.host_interval = host_interval
+        self._session = None
+        # Set cache_path=None to always search
+        self.cache = SearchCache(cache_path, cache_ttl) if cache_path else None
+        self.corpus_path = corpus_path
+        self._index = None
+        # Where the last results came from: 'cache', 'web', 'index' or 'default'
+        self.last_source = None
 
-    def clean_query(self, text):
-        # Enhanced keyword extraction
-        keywords = []
-        medical_terms = ['diabetes', 'glucose', 'hba1c', 'blood sugar', 
-                       'insulin', 'hyperglycemia']
-        
-        text_lower = text.lower()
-        for term in medical_terms:
-            if term in text_lower:
-                keywords.append(term)
-        
+    @property
+    def session(self):
+        # One connection pool reused by every page download
+        if self._session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = 'Mozilla/5.0 (compatible; GlucoScholar)'
+            self._session = session
+        return self._session
+
+    @property
+    def index(self):
+        # Built on first use so creating the fetcher stays cheap
+        if self._index is None:
+            self._index = KnowledgeIndex(self.corpus_path)
+        return self._index
+
+    def search_keywords(self, text):
+        # Keep queries short; the most general terms come first
+        keywords = self.term_matcher.extract(text)[:MAX_QUERY_TERMS]
         if not keywords:
             keywords = text.split()[:5]
-            
-        search_query = " ".join(keywords) + " site:.org OR site:.gov"
-        return search_query.strip()
+        return keywords
 
+    def clean_query(self, text):
+        search_query = " ".join(self.search_keywords(text)) + " site:.org OR site:.gov"
+        return search_query.strip()
 
     def google_search(self, text):
+        query = self.clean_query(text)
+        if self.cache:
+            cached = self.cache.get(query)
+            if cached is not None:
+                self.last_source = 'cache'
+                return cached
+
+        results = [] if self.offline else self._web_search(query)
+        if results:
+            if self.cache:
+                self.cache.put(query, results)
+            self.last_source = 'web'
+            return results
+
+        # Index answers are not cached so the web is retried on the next miss
+        results = self.local_search(text)
+        self.last_source = 'index' if results else 'default'
+        return results or self.get_default_urls()
+
+    def search_with_summaries(self, text, limit=5):
+        """
+        Like google_search, but each result is a dict with the page's url,
+        title and a short summary. Pages are downloaded concurrently; pages
+        from the bundled library fall back to their stored summary when the
+        download fails or the fetcher is offline.
+        """
+        urls = self.google_search(text)[:limit]
+        if self.offline:
+            pages = [{'url': url, 'title': None, 'summary': None, 'error': 'offline'} for url in urls]
+        else:
+            pages = self.fetch_summaries(urls)
+
+        library = {page['url']: page for page in self.index.pages}
+        for page in pages:
+            known = library.get(page['url'])
+            if known and not page['summary']:
+                page['title'] = page['title'] or known['title']
+                page['summary'] = self._shorten(known['text'])
+        return pages
+
+    def fetch_summaries(self, urls):
+        """Downloads all urls at once and returns their title/summary, in order."""
+        if not urls:
+            return []
+        return asyncio.run(self._fetch_all(urls))
+
+    async def _fetch_all(self, urls):
+        limiter = _HostRateLimiter(self.host_concurrency, self.host_interval)
+        return await asyncio.gather(*(self._fetch_page(url, limiter) for url in urls))
+
+    async def _fetch_page(self, url, limiter):
+        page = {'url': url, 'title': None, 'summary': None, 'error': None}
+        try:
+            async with limiter.slot(urlparse(url).netloc):
+                # requests is blocking; the pooled session is shared across threads
+                response = await asyncio.to_thread(self.session.get, url, timeout=self.fetch_timeout)
+            response.raise_for_status()
+            page['title'], page['summary'] = self.summarize_html(response.text)
+        except Exception as e:
+            page['error'] = str(e)
+        return page
+
+    @classmethod
+    def summarize_html(cls, html):
+        """Returns (title, summary) from the page's title and meta description or first paragraph."""
+        soup = bs4.BeautifulSoup(html, 'html.parser')
+        title = None
+        og_title = soup.find('meta', attrs={'property': 'og:title'})
+        if soup.title and soup.title.string:
+            title = soup.title.string.strip()
+        elif og_title and og_title.get('content'):
+            title = og_title['content'].strip()
+
+        summary = None
+        for attrs in ({'name': 'description'}, {'property': 'og:description'}):
+            meta = soup.find('meta', attrs=attrs)
+            if meta and meta.get('content', '').strip():
+                summary = meta['content']
+                break
+        if summary is None:
+            for paragraph in soup.find_all('p'):
+                paragraph_text = paragraph.get_text(" ", strip=True)
+                if len(paragraph_text) >= 40:
+                    summary = paragraph_text
+                    break
+        return title, cls._shorten(summary) if summary else None
+
+    @staticmethod
+    def _shorten(text, max_chars=SUMMARY_MAX_CHARS):
+        text = " ".join(text.split())
+        if len(text) <= max_chars:
+            return text
+        return text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+    def local_search(self, text, limit=5):
+        """Answers from the bundled knowledge index, without the network."""
+        return [page['url'] for page in self.index.search(" ".join(self.search_keywords(text)), limit)]
+
+    def _web_search(self, query):
         try:
             # Ensure minimum delay between searches
             current_time = time.time()
@@ -206,59 +2602,694 @@ class InformationFetcher:
             if time_since_last < self.search_delay:
                 time.sleep(self.search_delay - time_since_last)
 
-            # Clean and prepare search query
-            query = self.clean_query(text)
-            
             # Perform search
             results = []
             try:
-                for url in search(query, num_results=10):
+                for url in googlesearch.search(query, num_results=10):
                     # Filter and clean URLs
                     if self.is_valid_url(url):
                         results.append(url)
                     if len(results) >= 5:
                         break
-                    time.sleep(1)
 
             except Exception as e:
                 print(f"Search failed: {e}")
-                return self.get_default_urls()
+                return []
 
             self.last_search_time = time.time()
-            return results if results else self.get_default_urls()
+            return results
 
         except Exception as e:
             print(f"Search error: {e}")
-            return self.get_default_urls()
+            return []
 
     def is_valid_url(self, url):
-        # Filter out Google search URLs and verify it's a proper medical resource
-        if any(x in url.lower() for x in [
-            'google.com/search', 
-            'google.com/url', 
-            'google.com/webhp'
-        ]):
+        # Filter out search engine pages and verify it's a proper medical resource
+        try:
+            parsed = urlparse(url if '://' in url else '//' + url)
+            host = parsed.hostname or ''
+        except ValueError:
             return False
-            
-        # Check for medical/diabetes related domains
-        valid_domains = [
-            'diabetes.org',
-            'nih.gov',
-            'who.int',
-            'mayoclinic.org',
-            'medlineplus.gov',
-            'webmd.com',
-            'healthline.com',
-            'medicalnewstoday.com',
-            'cdc.gov',
-            'diabetesjournals.org',
-            'pubmed.ncbi.nlm.nih.gov'
-        ]
-        return any(domain in url.lower() for domain in valid_domains)
+        blocked = self.blocked_urls.match_host(host)
+        if blocked and parsed.path.startswith(BLOCKED_URL_PATHS[blocked]):
+            return False
+        return self.trusted_domains.match_host(host) is not None
+
+    def filter_valid_urls(self, urls):
+        return [url for url in urls if self.is_valid_url(url)]
 
     def get_default_urls(self):
         return [
             "https://www.diabetes.org/diabetes",
             "https://www.niddk.nih.gov/health-information/diabetes",
             "https://www.who.int/health-topics/diabetes"
-        ]
\ No newline at end of file
+        ]
+
+"""## **🗄️ Prediction Store**"""
+
+import queue
+import uuid
+import gzip
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Databases created before versioning report version 0 and already contain
+# the original table, which the first migration leaves untouched.
+PREDICTION_MIGRATIONS = [
+    [
+        '''CREATE TABLE IF NOT EXISTS predictions
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            gender TEXT,
+            age REAL,
+            hypertension INTEGER,
+            heart_disease INTEGER,
+            smoking_history TEXT,
+            bmi REAL,
+            HbA1c_level REAL,
+            blood_glucose_level REAL,
+            prediction_result TEXT,
+            timestamp DATETIME)''',
+    ],
+    [
+        # Store every timestamp as 'YYYY-MM-DD HH:MM:SS' so that string order
+        # is time order, then index it for date-range reports
+        '''UPDATE predictions SET timestamp = datetime(timestamp)
+            WHERE datetime(timestamp) IS NOT NULL AND timestamp != datetime(timestamp)''',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions(timestamp)',
+    ],
+    [
+        # Bulk runs: every row scored by one dataset analysis shares a run_id
+        'ALTER TABLE predictions ADD COLUMN run_id TEXT',
+        'CREATE INDEX IF NOT EXISTS idx_predictions_run_id ON predictions(run_id)',
+        '''CREATE TABLE IF NOT EXISTS prediction_runs
+            (run_id TEXT PRIMARY KEY,
+            source TEXT,
+            started_at DATETIME,
+            finished_at DATETIME,
+            row_count INTEGER)''',
+    ],
+    [
+        # Daily rollups per dimension ('all', 'gender', 'smoking_history'),
+        # maintained by triggers so single saves and bulk runs both count
+        '''CREATE TABLE IF NOT EXISTS daily_rollup
+            (dimension TEXT NOT NULL,
+            day TEXT NOT NULL,
+            value TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            diabetic INTEGER NOT NULL,
+            sum_hba1c REAL NOT NULL,
+            sum_glucose REAL NOT NULL,
+            PRIMARY KEY (dimension, day, value)) WITHOUT ROWID''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_predictions_rollup_insert
+            AFTER INSERT ON predictions WHEN NEW.timestamp IS NOT NULL
+            BEGIN
+                INSERT INTO daily_rollup (dimension, day, value, total, diabetic, sum_hba1c, sum_glucose)
+                VALUES ('all', substr(NEW.timestamp, 1, 10), 'all', 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0)),
+                       ('gender', substr(NEW.timestamp, 1, 10), COALESCE(NEW.gender, ''), 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0)),
+                       ('smoking_history', substr(NEW.timestamp, 1, 10), COALESCE(NEW.smoking_history, ''), 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0))
+                ON CONFLICT (dimension, day, value) DO UPDATE SET
+                    total = total + excluded.total,
+                    diabetic = diabetic + excluded.diabetic,
+                    sum_hba1c = sum_hba1c + excluded.sum_hba1c,
+                    sum_glucose = sum_glucose + excluded.sum_glucose;
+            END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_predictions_rollup_delete
+            AFTER DELETE ON predictions WHEN OLD.timestamp IS NOT NULL
+            BEGIN
+                UPDATE daily_rollup SET
+                    total = total - 1,
+                    diabetic = diabetic - (OLD.prediction_result = 'Diabetic'),
+                    sum_hba1c = sum_hba1c - COALESCE(OLD.HbA1c_level, 0),
+                    sum_glucose = sum_glucose - COALESCE(OLD.blood_glucose_level, 0)
+                WHERE day = substr(OLD.timestamp, 1, 10)
+                    AND ((dimension = 'all' AND value = 'all')
+                        OR (dimension = 'gender' AND value = COALESCE(OLD.gender, ''))
+                        OR (dimension = 'smoking_history' AND value = COALESCE(OLD.smoking_history, '')));
+            END''',
+        # Backfill from the rows saved before the rollups existed
+        '''INSERT INTO daily_rollup (dimension, day, value, total, diabetic, sum_hba1c, sum_glucose)
+            SELECT 'all', substr(timestamp, 1, 10), 'all', COUNT(*), SUM(prediction_result = 'Diabetic'),
+                   SUM(COALESCE(HbA1c_level, 0)), SUM(COALESCE(blood_glucose_level, 0))
+            FROM predictions WHERE timestamp IS NOT NULL GROUP BY 2
+            UNION ALL
+            SELECT 'gender', substr(timestamp, 1, 10), COALESCE(gender, ''), COUNT(*), SUM(prediction_result = 'Diabetic'),
+                   SUM(COALESCE(HbA1c_level, 0)), SUM(COALESCE(blood_glucose_level, 0))
+            FROM predictions WHERE timestamp IS NOT NULL GROUP BY 2, 3
+            UNION ALL
+            SELECT 'smoking_history', substr(timestamp, 1, 10), COALESCE(smoking_history, ''), COUNT(*), SUM(prediction_result = 'Diabetic'),
+                   SUM(COALESCE(HbA1c_level, 0)), SUM(COALESCE(blood_glucose_level, 0))
+            FROM predictions WHERE timestamp IS NOT NULL GROUP BY 2, 3''',
+    ],
+    [
+        # Calibrated probability of diabetes, indexed for highest-risk queries.
+        # Rows saved before risk scores existed stay NULL and out of the index.
+        'ALTER TABLE predictions ADD COLUMN risk_score REAL',
+        '''CREATE INDEX IF NOT EXISTS idx_predictions_risk_score
+            ON predictions(risk_score DESC) WHERE risk_score IS NOT NULL''',
+    ],
+    [
+        # Rows of bulk runs (run_id set) are rolled up per chunk by
+        # BulkPredictionWriter; three upserts per row made bulk inserts
+        # several times slower
+        'DROP TRIGGER IF EXISTS trg_predictions_rollup_insert',
+        '''CREATE TRIGGER trg_predictions_rollup_insert
+            AFTER INSERT ON predictions WHEN NEW.timestamp IS NOT NULL AND NEW.run_id IS NULL
+            BEGIN
+                INSERT INTO daily_rollup (dimension, day, value, total, diabetic, sum_hba1c, sum_glucose)
+                VALUES ('all', substr(NEW.timestamp, 1, 10), 'all', 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0)),
+                       ('gender', substr(NEW.timestamp, 1, 10), COALESCE(NEW.gender, ''), 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0)),
+                       ('smoking_history', substr(NEW.timestamp, 1, 10), COALESCE(NEW.smoking_history, ''), 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0))
+                ON CONFLICT (dimension, day, value) DO UPDATE SET
+                    total = total + excluded.total,
+                    diabetic = diabetic + excluded.diabetic,
+                    sum_hba1c = sum_hba1c + excluded.sum_hba1c,
+                    sum_glucose = sum_glucose + excluded.sum_glucose;
+            END''',
+    ],
+    [
+        # Count the non-NULL HbA1c and glucose values so the daily means skip
+        # missing values (as AVG() does) instead of counting them as 0. The
+        # rollups are rebuilt from predictions to fill the new counts.
+        'ALTER TABLE daily_rollup ADD COLUMN n_hba1c INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE daily_rollup ADD COLUMN n_glucose INTEGER NOT NULL DEFAULT 0',
+        'DROP TRIGGER IF EXISTS trg_predictions_rollup_insert',
+        '''CREATE TRIGGER trg_predictions_rollup_insert
+            AFTER INSERT ON predictions WHEN NEW.timestamp IS NOT NULL AND NEW.run_id IS NULL
+            BEGIN
+                INSERT INTO daily_rollup (dimension, day, value, total, diabetic, sum_hba1c, sum_glucose,
+                                          n_hba1c, n_glucose)
+                VALUES ('all', substr(NEW.timestamp, 1, 10), 'all', 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0),
+                        NEW.HbA1c_level IS NOT NULL, NEW.blood_glucose_level IS NOT NULL),
+                       ('gender', substr(NEW.timestamp, 1, 10), COALESCE(NEW.gender, ''), 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0),
+                        NEW.HbA1c_level IS NOT NULL, NEW.blood_glucose_level IS NOT NULL),
+                       ('smoking_history', substr(NEW.timestamp, 1, 10), COALESCE(NEW.smoking_history, ''), 1, NEW.prediction_result = 'Diabetic',
+                        COALESCE(NEW.HbA1c_level, 0), COALESCE(NEW.blood_glucose_level, 0),
+                        NEW.HbA1c_level IS NOT NULL, NEW.blood_glucose_level IS NOT NULL)
+                ON CONFLICT (dimension, day, value) DO UPDATE SET
+                    total = total + excluded.total,
+                    diabetic = diabetic + excluded.diabetic,
+                    sum_hba1c = sum_hba1c + excluded.sum_hba1c,
+                    sum_glucose = sum_glucose + excluded.sum_glucose,
+                    n_hba1c = n_hba1c + excluded.n_hba1c,
+                    n_glucose = n_glucose + excluded.n_glucose;
+            END''',
+        'DROP TRIGGER IF EXISTS trg_predictions_rollup_delete',
+        '''CREATE TRIGGER trg_predictions_rollup_delete
+            AFTER DELETE ON predictions WHEN OLD.timestamp IS NOT NULL
+            BEGIN
+                UPDATE daily_rollup SET
+                    total = total - 1,
+                    diabetic = diabetic - (OLD.prediction_result = 'Diabetic'),
+                    sum_hba1c = sum_hba1c - COALESCE(OLD.HbA1c_level, 0),
+                    sum_glucose = sum_glucose - COALESCE(OLD.blood_glucose_level, 0),
+                    n_hba1c = n_hba1c - (OLD.HbA1c_level IS NOT NULL),
+                    n_glucose = n_glucose - (OLD.blood_glucose_level IS NOT NULL)
+                WHERE day = substr(OLD.timestamp, 1, 10)
+                    AND ((dimension = 'all' AND value = 'all')
+                        OR (dimension = 'gender' AND value = COALESCE(OLD.gender, ''))
+                        OR (dimension = 'smoking_history' AND value = COALESCE(OLD.smoking_history, '')));
+            END''',
+        'DELETE FROM daily_rollup',
+        '''INSERT INTO daily_rollup (dimension, day, value, total, diabetic, sum_hba1c, sum_glucose,
+                                     n_hba1c, n_glucose)
+            SELECT 'all', substr(timestamp, 1, 10), 'all', COUNT(*), SUM(prediction_result = 'Diabetic'),
+                   SUM(COALESCE(HbA1c_level, 0)), SUM(COALESCE(blood_glucose_level, 0)),
+                   COUNT(HbA1c_level), COUNT(blood_glucose_level)
+            FROM predictions WHERE timestamp IS NOT NULL GROUP BY 2
+            UNION ALL
+            SELECT 'gender', substr(timestamp, 1, 10), COALESCE(gender, ''), COUNT(*), SUM(prediction_result = 'Diabetic'),
+                   SUM(COALESCE(HbA1c_level, 0)), SUM(COALESCE(blood_glucose_level, 0)),
+                   COUNT(HbA1c_level), COUNT(blood_glucose_level)
+            FROM predictions WHERE timestamp IS NOT NULL GROUP BY 2, 3
+            UNION ALL
+            SELECT 'smoking_history', substr(timestamp, 1, 10), COALESCE(smoking_history, ''), COUNT(*), SUM(prediction_result = 'Diabetic'),
+                   SUM(COALESCE(HbA1c_level, 0)), SUM(COALESCE(blood_glucose_level, 0)),
+                   COUNT(HbA1c_level), COUNT(blood_glucose_level)
+            FROM predictions WHERE timestamp IS NOT NULL GROUP BY 2, 3''',
+    ],
+]
+
+# Dimensions kept in daily_rollup
+ROLLUP_DIMENSIONS = ['all', 'gender', 'smoking_history']
+SUMMARY_COLUMNS = ['Day', 'Group', 'Total', 'Diabetic', 'Diabetic Rate',
+                   'Mean HbA1c Level', 'Mean Blood Glucose Level']
+
+PREDICTION_COLUMNS = [
+    'gender', 'age', 'hypertension', 'heart_disease', 'smoking_history',
+    'bmi', 'HbA1c_level', 'blood_glucose_level', 'prediction_result', 'risk_score', 'timestamp'
+]
+
+# Header row of exported reports, matching the columns of predictions_between
+REPORT_COLUMNS = ['ID', 'Gender', 'Age', 'Hypertension', 'Heart Disease',
+                  'Smoking History', 'BMI', 'HbA1c Level', 'Blood Glucose Level',
+                  'Prediction Result', 'Risk Score', 'Run ID']
+# Rows fetched from the cursor per step when exporting
+REPORT_BLOCK_SIZE = 10000
+# Rows in a highest-risk report
+TOP_RISK_LIMIT = 1000
+
+# Adds pre-aggregated counts to daily_rollup; see migrations 6 and 7
+ROLLUP_UPSERT = '''
+    INSERT INTO daily_rollup (dimension, day, value, total, diabetic, sum_hba1c, sum_glucose, n_hba1c, n_glucose)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (dimension, day, value) DO UPDATE SET
+        total = total + excluded.total,
+        diabetic = diabetic + excluded.diabetic,
+        sum_hba1c = sum_hba1c + excluded.sum_hba1c,
+        sum_glucose = sum_glucose + excluded.sum_glucose,
+        n_hba1c = n_hba1c + excluded.n_hba1c,
+        n_glucose = n_glucose + excluded.n_glucose'''
+
+_STOP = object()
+
+class PredictionStore:
+    """
+    SQLite storage for predictions, tuned for high write volume.
+
+    The database runs in WAL mode with synchronous=NORMAL, so readers never
+    block the writer and a commit does not wait for a full fsync. `save`
+    only queues the row: a background writer thread drains the queue and
+    commits everything that has accumulated in one transaction, so a burst
+    of predictions costs a handful of commits rather than one each.
+
+    Args:
+        db_path (str): Path of the SQLite database file.
+        batch_size (int, optional): Maximum rows per write transaction.
+        on_error (callable, optional): Called from the writer thread with the
+            sqlite3.Error when a batch cannot be written. Errors are printed
+            when not set.
+    """
+    def __init__(self, db_path, batch_size=1000, on_error=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.on_error = on_error
+        # Connection for reads on the creating thread; the writer has its own
+        self.conn = self._connect()
+        self.migrate()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="prediction-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def migrate(self):
+        """
+        Brings the database schema up to the latest version.
+
+        Each migration and its user_version bump run in one explicit
+        transaction: sqlite3 would otherwise autocommit DDL such as ALTER
+        TABLE, and a failed step would leave a half-applied schema that the
+        next run cannot migrate.
+        """
+        isolation_level = self.conn.isolation_level
+        self.conn.isolation_level = None
+        try:
+            while True:
+                # IMMEDIATE takes the write lock before reading the version, so
+                # two processes opening the database cannot both migrate it
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+                    if version >= len(PREDICTION_MIGRATIONS):
+                        self.conn.execute("COMMIT")
+                        return
+                    for statement in PREDICTION_MIGRATIONS[version]:
+                        self.conn.execute(statement)
+                    self.conn.execute(f"PRAGMA user_version = {version + 1}")
+                    self.conn.execute("COMMIT")
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    raise
+        finally:
+            self.conn.isolation_level = isolation_level
+
+    def save(self, input_data, prediction_result, timestamp=None, risk_score=None):
+        """
+        Queues one prediction for writing.
+
+        Args:
+            input_data (dict): The eight raw feature values.
+            prediction_result (str): "Diabetic" or "Not Diabetic".
+            timestamp (datetime, optional): Defaults to now.
+            risk_score (float, optional): Calibrated probability of diabetes.
+        """
+        timestamp = (timestamp or datetime.now()).strftime(TIMESTAMP_FORMAT)
+        self._queue.put((input_data['gender'],
+                         input_data['age'],
+                         input_data['hypertension'],
+                         input_data['heart_disease'],
+                         input_data['smoking_history'],
+                         input_data['bmi'],
+                         input_data['HbA1c_level'],
+                         input_data['blood_glucose_level'],
+                         prediction_result,
+                         None if risk_score is None else float(risk_score),
+                         timestamp))
+
+    def flush(self):
+        """Blocks until every queued prediction has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Writes any queued predictions and closes the connections."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self.conn.close()
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    self._queue.task_done()
+                    return
+                # Group commit: take whatever else is already waiting
+                batch = [item]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+
+                self._write_batch(conn, batch)
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    self._queue.task_done()
+                    return
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, rows):
+        try:
+            with conn:
+                conn.executemany(f'''INSERT INTO predictions ({", ".join(PREDICTION_COLUMNS)})
+                                    VALUES ({", ".join("?" * len(PREDICTION_COLUMNS))})''', rows)
+        except sqlite3.Error as e:
+            if self.on_error:
+                self.on_error(e)
+            else:
+                print(f"Failed to save predictions: {e}")
+
+    def bulk_writer(self, source=None, run_id=None):
+        """
+        Returns a BulkPredictionWriter for persisting a scored dataset. Use
+        it from a single thread (typically the scoring worker).
+        """
+        return BulkPredictionWriter(self, source, run_id)
+
+    def predictions_between(self, start_date, end_date, conn=None):
+        """
+        Returns a cursor over predictions made on `start_date` through
+        `end_date` (inclusive dates). The half-open timestamp range lets
+        SQLite use idx_predictions_timestamp.
+        """
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = (end_date + timedelta(days=1)).strftime('%Y-%m-%d')
+        return (conn or self.conn).execute('''SELECT 
+                    id, gender, age, hypertension, heart_disease, smoking_history,
+                    bmi, HbA1c_level, blood_glucose_level, prediction_result, risk_score, run_id
+                    FROM predictions 
+                    WHERE timestamp >= ? AND timestamp < ?''',
+                    (start_str, end_str))
+
+    def highest_risk(self, limit=TOP_RISK_LIMIT, start_date=None, end_date=None, conn=None):
+        """
+        The `limit` predictions with the highest risk score, optionally only
+        those made on `start_date` through `end_date`. Without a narrow date
+        range SQLite walks idx_predictions_risk_score from the top and stops
+        after `limit` matches, so this stays fast over millions of stored
+        predictions.
+
+        Returns:
+            list: Tuples in REPORT_COLUMNS order, highest risk first.
+        """
+        where, params = "risk_score IS NOT NULL", []
+        if start_date is not None:
+            where += " AND timestamp >= ?"
+            params.append(start_date.strftime('%Y-%m-%d'))
+        if end_date is not None:
+            where += " AND timestamp < ?"
+            params.append((end_date + timedelta(days=1)).strftime('%Y-%m-%d'))
+        return (conn or self.conn).execute(f'''SELECT
+                    id, gender, age, hypertension, heart_disease, smoking_history,
+                    bmi, HbA1c_level, blood_glucose_level, prediction_result, risk_score, run_id
+                    FROM predictions
+                    WHERE {where}
+                    ORDER BY risk_score DESC
+                    LIMIT ?''', (*params, limit)).fetchall()
+
+
+    def export_range(self, start_date, end_date, output_path, block_size=REPORT_BLOCK_SIZE,
+                     progress_callback=None, cancel_event=None):
+        """
+        Streams the predictions between two dates into a report file, reading
+        the cursor `block_size` rows at a time so memory stays flat however
+        long the range is. Safe to call from a worker thread (it opens its
+        own connection).
+
+        Args:
+            start_date, end_date (date): Inclusive date range.
+            output_path (str): Report file. `.csv.gz` is gzip-compressed CSV,
+                `.parquet` is Parquet (requires pyarrow), anything else CSV.
+            block_size (int, optional): Rows per fetchmany call.
+            progress_callback (callable, optional): Called with the number of
+                rows written so far after each block.
+            cancel_event (threading.Event, optional): Stops after the current
+                block once set.
+
+        Returns:
+            int: Rows written. No file is created when the range is empty.
+        """
+        conn = self._connect()
+        try:
+            cursor = self.predictions_between(start_date, end_date, conn=conn)
+            rows = cursor.fetchmany(block_size)
+            if not rows:
+                return 0
+            with _ReportWriter(output_path) as writer:
+                written = 0
+                while rows:
+                    writer.write(rows)
+                    written += len(rows)
+                    if progress_callback:
+                        progress_callback(written)
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    rows = cursor.fetchmany(block_size)
+            return written
+        finally:
+            conn.close()
+
+    def daily_summary(self, start_date, end_date, dimension='all', conn=None):
+        """
+        Per-day counts, diabetic rate and mean HbA1c/glucose for `dimension`
+        read from the rollup table, so even a year of history is a few
+        hundred rows on the primary key instead of a scan of predictions.
+        Means skip missing values, as AVG() does, and are None for a group
+        with no values.
+
+        Returns:
+            list: Tuples in SUMMARY_COLUMNS order, by day then group.
+        """
+        if dimension not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"Unknown summary dimension: {dimension}")
+        return (conn or self.conn).execute('''SELECT
+                    day, value, total, diabetic,
+                    CAST(diabetic AS REAL) / total,
+                    sum_hba1c / NULLIF(n_hba1c, 0), sum_glucose / NULLIF(n_glucose, 0)
+                    FROM daily_rollup
+                    WHERE dimension = ? AND day BETWEEN ? AND ? AND total > 0
+                    ORDER BY day, value''',
+                    (dimension, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))).fetchall()
+
+    def export_highest_risk(self, start_date, end_date, output_path, limit=TOP_RISK_LIMIT):
+        """
+        Writes `highest_risk` for the date range in the detailed report
+        format. Safe to call from a worker thread.
+
+        Returns:
+            int: Rows written. No file is created when nothing matches.
+        """
+        conn = self._connect()
+        try:
+            rows = self.highest_risk(limit, start_date, end_date, conn=conn)
+        finally:
+            conn.close()
+        if rows:
+            with _ReportWriter(output_path) as writer:
+                writer.write(rows)
+        return len(rows)
+
+    def export_summary(self, start_date, end_date, output_path, dimension='all'):
+        """
+        Writes `daily_summary` to a CSV (`.csv.gz` compressed) or Parquet
+        file. Safe to call from a worker thread.
+
+        Returns:
+            int: Rows written. No file is created when the range is empty.
+        """
+        conn = self._connect()
+        try:
+            rows = self.daily_summary(start_date, end_date, dimension, conn=conn)
+        finally:
+            conn.close()
+        if rows:
+            summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+            if output_path.lower().endswith('.parquet'):
+                summary.to_parquet(output_path, index=False)
+            else:
+                summary.to_csv(output_path, index=False)
+        return len(rows)
+
+class _ReportWriter:
+    """Writes report rows as CSV, gzip-compressed CSV or Parquet."""
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self._file = None
+        self._parquet_writer = None
+        if output_path.lower().endswith('.parquet'):
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Writing Parquet reports requires pyarrow: pip install pyarrow")
+            self._pa = pa
+            self._schema = pa.schema([
+                ('ID', pa.int64()), ('Gender', pa.string()), ('Age', pa.float64()),
+                ('Hypertension', pa.int64()), ('Heart Disease', pa.int64()),
+                ('Smoking History', pa.string()), ('BMI', pa.float64()),
+                ('HbA1c Level', pa.float64()), ('Blood Glucose Level', pa.float64()),
+                ('Prediction Result', pa.string()), ('Risk Score', pa.float64()),
+                ('Run ID', pa.string()),
+            ])
+            self._parquet_writer = pq.ParquetWriter(output_path, self._schema)
+        else:
+            if output_path.lower().endswith('.gz'):
+                self._file = gzip.open(output_path, 'wt', newline='')
+            else:
+                self._file = open(output_path, 'w', newline='')
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(REPORT_COLUMNS)
+
+    def write(self, rows):
+        if self._parquet_writer is not None:
+            columns = list(zip(*rows))
+            self._parquet_writer.write_table(
+                self._pa.Table.from_arrays([self._pa.array(c, type=f.type) for c, f in zip(columns, self._schema)],
+                                           schema=self._schema))
+        else:
+            self._csv.writerows(rows)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class BulkPredictionWriter:
+    """
+    Writes scored chunks straight into the predictions table, one
+    `executemany` transaction per chunk, bypassing the single-row queue.
+    Every row gets the same run_id, and the run is recorded in
+    prediction_runs with its source and final row count. The rollup
+    trigger skips these rows; each chunk is aggregated here and upserted
+    into daily_rollup in the same transaction as its rows instead.
+    """
+    def __init__(self, store, source=None, run_id=None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.source = source
+        self.row_count = 0
+        self.conn = store._connect()
+        with self.conn:
+            self.conn.execute('''INSERT INTO prediction_runs (run_id, source, started_at, row_count)
+                                VALUES (?, ?, ?, 0)''',
+                              (self.run_id, source, datetime.now().strftime(TIMESTAMP_FORMAT)))
+
+    def write(self, frame, predictions, probabilities=None):
+        """
+        Persists one chunk.
+
+        Args:
+            frame (pd.DataFrame): Raw (unencoded) feature columns.
+            predictions (np.ndarray): Predicted labels for the rows of `frame`.
+            probabilities (np.ndarray, optional): Calibrated probabilities,
+                stored as the risk score.
+        """
+        results = np.where(np.asarray(predictions) == 1, "Diabetic", "Not Diabetic")
+        timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+        # tolist() turns NumPy scalars into Python values sqlite3 can bind
+        columns = [frame[column].tolist() for column in FEATURE_COLUMNS]
+        columns.append(results.tolist())
+        columns.append(np.asarray(probabilities, dtype=np.float64).tolist() if probabilities is not None
+                       else [None] * len(results))
+        rows = ((*values, timestamp, self.run_id) for values in zip(*columns))
+        rollups = self._rollup_rows(frame, predictions, timestamp[:10])
+        with self.conn:
+            self.conn.executemany(f'''INSERT INTO predictions ({", ".join(PREDICTION_COLUMNS)}, run_id)
+                                    VALUES ({", ".join("?" * (len(PREDICTION_COLUMNS) + 1))})''', rows)
+            self.conn.executemany(ROLLUP_UPSERT, rollups)
+        self.row_count += len(results)
+
+    @staticmethod
+    def _rollup_rows(frame, predictions, day):
+        """daily_rollup rows for one chunk, with the insert trigger's semantics"""
+        values = pd.DataFrame({
+            'diabetic': (np.asarray(predictions) == 1).astype(np.int64),
+            'hba1c': frame['HbA1c_level'].to_numpy(dtype=np.float64),  # NaN is stored as NULL and summed as 0
+            'glucose': frame['blood_glucose_level'].to_numpy(dtype=np.float64),
+        })
+        rollups = []
+        for dimension in ROLLUP_DIMENSIONS:
+            if dimension == 'all':
+                keys = np.full(len(values), 'all', dtype=object)
+            else:
+                keys = frame[dimension].fillna('').astype(str).to_numpy()
+            grouped = values.groupby(keys, sort=False).agg(
+                total=('diabetic', 'size'), diabetic=('diabetic', 'sum'),
+                hba1c=('hba1c', 'sum'), glucose=('glucose', 'sum'),
+                n_hba1c=('hba1c', 'count'), n_glucose=('glucose', 'count'))  # count skips NaN
+            rollups.extend((dimension, day, str(value), int(total), int(diabetic), float(hba1c), float(glucose),
+                            int(n_hba1c), int(n_glucose))
+                           for value, total, diabetic, hba1c, glucose, n_hba1c, n_glucose in grouped.itertuples())
+        return rollups
+
+    def close(self):
+        with self.conn:
+            self.conn.execute('''UPDATE prediction_runs SET finished_at = ?, row_count = ?
+                                WHERE run_id = ?''',
+                              (datetime.now().strftime(TIMESTAMP_FORMAT), self.row_count, self.run_id))
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
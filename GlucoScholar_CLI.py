@@ -0,0 +1,314 @@
+"""Command-line entry point for batch jobs (no Tk or display needed).
+
+Usage:
+    python GlucoScholar_CLI.py score INPUT.csv [-o OUTPUT] [--workers N] [--dashboard CHART.png]
+                                     [--validate] [--quarantine REJECTED.csv]
+    python GlucoScholar_CLI.py validate INPUT.csv [--quarantine REJECTED.csv]
+    python GlucoScholar_CLI.py train [--retrain] [--search SECONDS] [--cv K]
+    python GlucoScholar_CLI.py report --start YYYY-MM-DD --end YYYY-MM-DD -o OUTPUT
+                                      [--db PATH] [--mode rows|summary|highest-risk] [--dimension all]
+
+`score` splits the input into line-aligned byte ranges and scores them on
+a process pool. Every worker loads the same saved model artifact
+(memory-mapped, so the tree arrays are shared through the page cache) and
+writes its shard to a part file; the parts are then joined in input order.
+With `--validate` rows that break VALIDATION_RULES are skipped (and written
+to `--quarantine` if given); `validate` only checks a file, without a model.
+
+Exit codes:
+    0  success
+    1  unexpected error
+    2  bad arguments or unusable input (missing file, missing columns)
+    3  no trained model artifact (run `train` first)
+    130 interrupted
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from GlucoScholar import (randomForest, PredictionStore, CohortDashboard, DatasetValidator, ploting_charts,
+                          csv_byte_ranges, MODEL_ARTIFACT_PATH, BULK_CHUNK_SIZE, ROLLUP_DIMENSIONS,
+                          RISK_TIER_LABELS, TOP_RISK_LIMIT)
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_NO_MODEL = 3
+EXIT_INTERRUPTED = 130
+
+class CLIError(Exception):
+    """An error to report without a traceback, with its exit code."""
+    def __init__(self, message, exit_code=EXIT_USAGE):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+def _log(message):
+    # Results go to stdout, progress to stderr so stdout can be piped
+    print(message, file=sys.stderr, flush=True)
+
+# Model loaded once per worker process by the pool initializer
+_worker_model = None
+
+def _init_score_worker(artifact_path):
+    global _worker_model
+    _worker_model = randomForest.from_artifact(artifact_path, n_jobs=1)
+
+def _score_shard(input_path, byte_range, part_path, chunk_size, handle_unknown, dashboard, validate,
+                 quarantine_path):
+    dashboard = CohortDashboard() if dashboard else None
+    summary = _worker_model.streamPrediction(
+        input_path, output_path=part_path, chunk_size=chunk_size, handle_unknown=handle_unknown,
+        chunk_callback=dashboard.update if dashboard else None, byte_range=byte_range,
+        validate=validate, quarantine_path=quarantine_path)
+    summary['dashboard'] = dashboard
+    return summary
+
+def _join_parts(part_paths, output_path):
+    """Concatenates the shard outputs, in order, into `output_path`."""
+    part_paths = [path for path in part_paths if os.path.exists(path)]
+    if output_path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for path in part_paths:
+                part = pq.ParquetFile(path)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, part.schema_arrow)
+                for batch in part.iter_batches():
+                    writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(output_path, 'wb') as out:
+            for index, path in enumerate(part_paths):
+                with open(path, 'rb') as part:
+                    if index:
+                        part.readline()  # header, already written by the first part
+                    shutil.copyfileobj(part, out, 1 << 20)
+    for path in part_paths:
+        os.remove(path)
+
+def score(args):
+    if not os.path.isfile(args.input):
+        raise CLIError(f"Input file not found: {args.input}")
+    # Load once here so a missing or outdated artifact is reported with its
+    # exit code, rather than as a broken pool when every worker fails to load
+    try:
+        randomForest.from_artifact(args.artifact, n_jobs=1)
+    except FileNotFoundError:
+        raise CLIError(f"No model artifact of the current version at {args.artifact}; "
+                       f"run the train command first", EXIT_NO_MODEL)
+    workers = args.workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    ranges = csv_byte_ranges(args.input, workers)
+    part_paths = [f"{args.output}.part-{index:05d}{os.path.splitext(args.output)[1]}" if args.output else None
+                  for index in range(len(ranges))]
+    quarantine_parts = [f"{args.quarantine}.part-{index:05d}.csv" if args.quarantine else None
+                        for index in range(len(ranges))]
+    validate = args.validate or bool(args.quarantine)
+    validation = DatasetValidator().new_report() if validate else None
+    totals = {'rows': 0, 'diabetic': 0, 'non_diabetic': 0}
+    tiers = dict.fromkeys(RISK_TIER_LABELS, 0)
+    remapped = {}
+    dashboard = CohortDashboard() if args.dashboard else None
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, max(len(ranges), 1)),
+                                 initializer=_init_score_worker, initargs=(args.artifact,)) as pool:
+            futures = {pool.submit(_score_shard, args.input, byte_range, part_path, args.chunk_size,
+                                   args.handle_unknown, bool(dashboard), validate, quarantine_path): index
+                       for index, (byte_range, part_path, quarantine_path)
+                       in enumerate(zip(ranges, part_paths, quarantine_parts))}
+            for done, future in enumerate(as_completed(futures), 1):
+                summary = future.result()
+                for key in totals:
+                    totals[key] += summary[key]
+                for tier, count in summary['risk_tiers'].items():
+                    tiers[tier] += count
+                for column, counts in summary['remapped'].items():
+                    merged = remapped.setdefault(column, {'normalized': 0, 'unknown': 0, 'unknown_labels': []})
+                    merged['normalized'] += counts['normalized']
+                    merged['unknown'] += counts['unknown']
+                    merged['unknown_labels'].extend(label for label in counts['unknown_labels']
+                                                    if label not in merged['unknown_labels'])
+                if validation:
+                    DatasetValidator.merge_reports(validation, summary['validation'])
+                if dashboard:
+                    dashboard.merge(summary['dashboard'])
+                _log(f"shard {futures[future] + 1}/{len(ranges)} done ({done} finished, "
+                     f"{totals['rows']:,} rows so far)")
+        if args.output:
+            _join_parts(part_paths, args.output)
+        if args.quarantine and validation['invalid_rows']:
+            _join_parts(quarantine_parts, args.quarantine)
+    except FileNotFoundError as e:
+        raise CLIError(str(e), EXIT_NO_MODEL)
+    except ValueError as e:
+        # Missing columns, unknown categories with --handle-unknown error, or
+        # a non-numeric value without --validate
+        raise CLIError(str(e) if validate else f"{e} (use --validate to skip invalid rows)")
+    finally:
+        for path in part_paths + quarantine_parts:
+            if path and os.path.exists(path):
+                os.remove(path)
+    seconds = time.perf_counter() - start
+
+    if dashboard and totals['rows']:
+        with open(args.dashboard, 'wb') as f:
+            f.write(ploting_charts().dashboard(dashboard, fmt=os.path.splitext(args.dashboard)[1].lstrip('.') or 'png'))
+
+    rate = totals['diabetic'] / totals['rows'] * 100 if totals['rows'] else 0.0
+    print(f"Scored {totals['rows']:,} rows in {seconds:.2f} s "
+          f"({totals['rows'] / seconds:,.0f} rows/s, {len(ranges)} shards)")
+    print(f"Diabetic: {totals['diabetic']:,} ({rate:.2f}%)  Non-diabetic: {totals['non_diabetic']:,}")
+    print("Risk tiers: " + "  ".join(f"{tier}: {count:,}" for tier, count in tiers.items()))
+    for column, counts in remapped.items():
+        notes = []
+        if counts['normalized']:
+            notes.append(f"{counts['normalized']:,} values matched ignoring case")
+        if counts['unknown']:
+            notes.append(f"{counts['unknown']:,} unknown {counts['unknown_labels']} scored as the first class")
+        if notes:
+            print(f"{column}: " + ", ".join(notes))
+    if validation:
+        print(DatasetValidator.format_report(validation))
+        if args.quarantine and validation['invalid_rows']:
+            print(f"Invalid rows written to {args.quarantine}")
+    if args.output:
+        print(f"Predictions written to {args.output}")
+    if dashboard and totals['rows']:
+        print(f"Dashboard written to {args.dashboard}")
+    return EXIT_OK
+
+def validate(args):
+    if not os.path.isfile(args.input):
+        raise CLIError(f"Input file not found: {args.input}")
+    start = time.perf_counter()
+    try:
+        report = DatasetValidator().validate_file(args.input, quarantine_path=args.quarantine,
+                                                  chunk_size=args.chunk_size)
+    except ValueError as e:
+        raise CLIError(str(e))
+    seconds = time.perf_counter() - start
+    print(f"Checked {report['rows']:,} rows in {seconds:.2f} s ({report['rows'] / max(seconds, 1e-9):,.0f} rows/s)")
+    print(DatasetValidator.format_report(report))
+    if report['quarantine_path']:
+        print(f"Invalid rows written to {report['quarantine_path']}")
+    return EXIT_OK
+
+def train(args):
+    start = time.perf_counter()
+    radFor = randomForest(artifact_path=args.artifact, retrain=args.retrain)
+    _log(f"Model ready in {time.perf_counter() - start:.1f} s")
+
+    if args.search:
+        results = radFor.hyperparameterSearch(time_budget=args.search, cv=args.cv)
+        print(randomForest.tradeoffTable(results))
+        best = results[0]['params']
+        _log(f"Retraining with {best}")
+        radFor.applyHyperparameters(best)
+
+    evaluation = radFor.evaluation
+    if evaluation is None:
+        # Artifact saved before the evaluation was stored with it
+        X_train, X_test, y_train, y_test = radFor.prepare_split()
+        evaluation = {'accuracy': float((radFor.predict(X_test) == y_test).mean()), 'test_rows': len(y_test)}
+    print(f"Test accuracy: {evaluation['accuracy']:.4f} on {evaluation['test_rows']:,} held-out rows")
+    print(f"Model artifact: {radFor.artifact_path}")
+    return EXIT_OK
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value}")
+
+def report(args):
+    if args.start > args.end:
+        raise CLIError("--start must not be after --end")
+    if not os.path.exists(args.db):
+        raise CLIError(f"Database not found: {args.db}")
+    store = PredictionStore(args.db)
+    try:
+        start = time.perf_counter()
+        if args.mode == 'summary':
+            rows = store.export_summary(args.start, args.end, args.output, dimension=args.dimension)
+        elif args.mode == 'highest-risk':
+            rows = store.export_highest_risk(args.start, args.end, args.output, limit=args.limit)
+        else:
+            rows = store.export_range(args.start, args.end, args.output)
+        seconds = time.perf_counter() - start
+    finally:
+        store.close()
+    if not rows:
+        print(f"No predictions between {args.start} and {args.end}; nothing written")
+        return EXIT_OK
+    print(f"Wrote {rows:,} rows to {args.output} in {seconds:.2f} s ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+    return EXIT_OK
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="GlucoScholar_CLI.py", description="GlucoScholar batch jobs")
+    parser.add_argument('--artifact', default=MODEL_ARTIFACT_PATH, help="model artifact path")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    score_parser = commands.add_parser('score', help="score a CSV of patients")
+    score_parser.add_argument('input', help="CSV with the model's feature columns")
+    score_parser.add_argument('-o', '--output', help="predictions file (.csv or .parquet)")
+    score_parser.add_argument('-w', '--workers', type=int, default=0, help="worker processes (default: all cores)")
+    score_parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE, help="rows per chunk")
+    score_parser.add_argument('--handle-unknown', choices=['error', 'default'], default='error',
+                              help="unseen gender/smoking values: fail, or use the first known class")
+    score_parser.add_argument('--dashboard', help="also render a cohort dashboard (.png or .svg)")
+    score_parser.add_argument('--validate', action='store_true',
+                              help="skip rows with missing, non-numeric or out-of-range values")
+    score_parser.add_argument('--quarantine', help="write skipped rows to this CSV (implies --validate)")
+    score_parser.set_defaults(func=score)
+
+    validate_parser = commands.add_parser('validate', help="check a CSV of patients without scoring it")
+    validate_parser.add_argument('input', help="CSV with the model's feature columns")
+    validate_parser.add_argument('--quarantine', help="write invalid rows and their problems to this CSV")
+    validate_parser.add_argument('--chunk-size', type=int, default=BULK_CHUNK_SIZE, help="rows per chunk")
+    validate_parser.set_defaults(func=validate)
+
+    train_parser = commands.add_parser('train', help="train (or load) the model and report its accuracy")
+    train_parser.add_argument('--retrain', action='store_true', help="ignore the saved artifact")
+    train_parser.add_argument('--search', type=float, metavar='SECONDS',
+                              help="run a hyperparameter search for this long and keep the best")
+    train_parser.add_argument('--cv', type=int, help="cross-validation folds for the search")
+    train_parser.set_defaults(func=train)
+
+    report_parser = commands.add_parser('report', help="export saved predictions for a date range")
+    report_parser.add_argument('--db', default='diabetes_predictions.db', help="predictions database")
+    report_parser.add_argument('--start', type=_parse_date, required=True, help="first day (YYYY-MM-DD)")
+    report_parser.add_argument('--end', type=_parse_date, required=True, help="last day (YYYY-MM-DD)")
+    report_parser.add_argument('-o', '--output', required=True, help="report file (.csv, .csv.gz, .parquet)")
+    report_parser.add_argument('--mode', choices=['rows', 'summary', 'highest-risk'], default='rows',
+                               help="every prediction, daily totals from the rollup table, "
+                                    "or the highest risk scores first")
+    report_parser.add_argument('--dimension', choices=ROLLUP_DIMENSIONS, default='all',
+                               help="grouping for --mode summary")
+    report_parser.add_argument('--limit', type=int, default=TOP_RISK_LIMIT, help="rows for --mode highest-risk")
+    report_parser.set_defaults(func=report)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except CLIError as e:
+        _log(f"error: {e}")
+        return e.exit_code
+    except KeyboardInterrupt:
+        _log("interrupted")
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        _log(f"error: {type(e).__name__}: {e}")
+        return EXIT_ERROR
+
+if __name__ == "__main__":
+    sys.exit(main())
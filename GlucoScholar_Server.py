@@ -0,0 +1,404 @@
+"""Local HTTP prediction service.
+
+Usage:
+    python GlucoScholar_Server.py [--host 127.0.0.1] [--port 8765] [--max-batch 64] [--max-wait-ms 5]
+
+Endpoints:
+    POST /predict   One patient as a JSON object, or several as a JSON array,
+                    with the same fields as the Prediction tab. Values outside
+                    the tab's ranges are scored with a per-record warning.
+    GET  /health    {"status": "ok"} once the model is loaded.
+    GET  /stats     Request, row and batch counters.
+
+The model is loaded once at startup from the saved artifact. Requests that
+arrive together are merged into micro-batches (up to `--max-batch` rows,
+waiting at most `--max-wait-ms` for more to arrive) so the forest is called
+once per batch instead of once per request. Every prediction is logged to
+the same SQLite database as the desktop app.
+"""
+
+import sys
+import math
+import signal
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from GlucoScholar import (randomForest, PredictionStore, FEATURE_COLUMNS, MODEL_ARTIFACT_PATH, risk_tier,
+                          validation_error)
+
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+# Rows per forest call and how long the first request of a batch may wait
+SERVER_MAX_BATCH = 64
+SERVER_MAX_WAIT = 0.005
+SERVER_DB_PATH = 'diabetes_predictions.db'
+# Largest request body accepted, in bytes
+SERVER_MAX_BODY = 1 << 20
+
+NUMERIC_FIELDS = ['age', 'bmi', 'HbA1c_level', 'blood_glucose_level']
+BINARY_FIELDS = ['hypertension', 'heart_disease']
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class RequestError(Exception):
+    """A client error, answered with `status` and the message as JSON."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class MicroBatcher:
+    """
+    Merges concurrent scoring requests into batches.
+
+    `submit` queues an encoded matrix and waits for its rows' results. A
+    single consumer task takes the first waiting request, then keeps
+    collecting until the batch holds `max_batch` rows or `max_wait`
+    seconds have passed, and scores everything with one `score_fn` call on
+    a worker thread so the event loop keeps accepting requests meanwhile. A
+    request larger than `max_batch` is scored on its own and never split.
+    If a merged batch fails, each request is rescored alone so the error
+    only reaches the request that caused it.
+
+    Args:
+        score_fn (callable): Maps an (rows, features) matrix to (labels, probabilities).
+        max_batch (int): Maximum rows per call.
+        max_wait (float): Seconds the oldest request may wait for company.
+    """
+    def __init__(self, score_fn, max_batch=SERVER_MAX_BATCH, max_wait=SERVER_MAX_WAIT):
+        self.score_fn = score_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self._queue = None
+        self._carry = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, X):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((X, future))
+        return await future
+
+    async def _next_batch(self):
+        first = self._carry or await self._queue.get()
+        self._carry = None
+        batch, rows = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            if rows + len(item[0]) > self.max_batch:
+                # Would overflow: it opens the next batch instead
+                self._carry = item
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch, rows
+
+    async def _run(self):
+        while True:
+            batch, rows = await self._next_batch()
+            X = batch[0][0] if len(batch) == 1 else np.concatenate([X for X, _ in batch])
+            try:
+                labels, probabilities = await asyncio.to_thread(self.score_fn, X)
+            except Exception as e:
+                if len(batch) == 1:
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(e)
+                else:
+                    # Rescore each request alone so only the one that caused
+                    # the error fails, not everyone it was merged with
+                    await self._score_each(batch)
+                continue
+            self.batches += 1
+            self.rows += rows
+            self.largest_batch = max(self.largest_batch, rows)
+            start = 0
+            for X, future in batch:
+                end = start + len(X)
+                if not future.done():  # the client may have gone away
+                    future.set_result((labels[start:end], probabilities[start:end]))
+                start = end
+
+    async def _score_each(self, batch):
+        for X, future in batch:
+            try:
+                result = await asyncio.to_thread(self.score_fn, X)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.batches += 1
+                self.rows += len(X)
+                self.largest_batch = max(self.largest_batch, len(X))
+                if not future.done():
+                    future.set_result(result)
+
+class PredictionServer:
+    """
+    Asyncio HTTP/1.1 server (keep-alive, JSON only) in front of one model.
+
+    Args:
+        radFor (randomForest): Loaded model.
+        store (PredictionStore, optional): Where predictions are logged.
+        host (str), port (int): Address to listen on.
+        max_batch (int), max_wait (float): See MicroBatcher.
+    """
+    def __init__(self, radFor, store=None, host=SERVER_HOST, port=SERVER_PORT,
+                 max_batch=SERVER_MAX_BATCH, max_wait=SERVER_MAX_WAIT):
+        self.radFor = radFor
+        self.store = store
+        self.host = host
+        self.port = port
+        self.batcher = MicroBatcher(radFor.scoreBatch, max_batch, max_wait)
+        self.requests = 0
+        self.errors = 0
+        self.started = None
+        self._server = None
+
+    async def start(self):
+        # Score one row first so lazily built structures (FlatForest) are ready
+        await asyncio.to_thread(self.radFor.scoreBatch,
+                                np.zeros((1, len(self.radFor.feature_columns)), dtype=np.float32))
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # resolves port 0
+        self.started = time.perf_counter()
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    def parse_record(self, record):
+        """
+        Validates one patient and encodes it the way the Prediction tab
+        does: categories match ignoring case, and unknown ones fall back to
+        the first known class and are reported as warnings. Only missing
+        fields, values of the wrong type, non-finite numbers and binary
+        fields other than exactly 0 or 1 are rejected; values outside
+        the Prediction tab's ranges (VALIDATION_RULES) are scored and
+        reported as warnings, so one odd record does not fail a batch.
+
+        Returns:
+            (dict, list, list): Clean input values, encoded feature row, warnings.
+        """
+        if not isinstance(record, dict):
+            raise RequestError("Each patient must be a JSON object")
+        missing = [field for field in FEATURE_COLUMNS if field not in record]
+        if missing:
+            raise RequestError(f"Missing fields: {', '.join(missing)}")
+
+        input_data, warnings = {}, []
+        try:
+            for field in NUMERIC_FIELDS:
+                input_data[field] = float(record[field])
+                # json.loads and float() accept NaN and Infinity, which the
+                # trees cannot score
+                if not math.isfinite(input_data[field]):
+                    raise ValueError
+            for field in BINARY_FIELDS:
+                value = float(record[field])
+                if value not in (0.0, 1.0):  # 0.7 must not silently become 0
+                    raise ValueError
+                input_data[field] = int(value)
+        except (TypeError, ValueError):
+            raise RequestError(f"Invalid value for {field}: {record[field]!r}")
+        for field in NUMERIC_FIELDS:
+            error = validation_error(field, input_data[field])
+            if error:
+                warnings.append(f"{error} (got {input_data[field]:g})")
+
+        codes = {}
+        for field, encoder in self.radFor.category_encoders.items():
+            code = encoder.code(str(record[field]))
+            if code is None:
+                code = 0
+                warnings.append(f"Unknown {field.replace('_', ' ')} category {record[field]!r}. "
+                                f"Using default: {encoder.classes_[0]}")
+            input_data[field] = str(encoder.classes_[code])
+            codes[field] = code
+
+        row = [codes[field] if field in codes else input_data[field] for field in self.radFor.feature_columns]
+        return {field: input_data[field] for field in FEATURE_COLUMNS}, row, warnings
+
+    async def predict(self, payload):
+        records = payload if isinstance(payload, list) else [payload]
+        if not records:
+            raise RequestError("No patients given")
+        parsed = [self.parse_record(record) for record in records]
+        X = np.array([row for _, row, _ in parsed], dtype=np.float32)
+        labels, probabilities = await self.batcher.submit(X)
+
+        results = []
+        for (input_data, _, warnings), label, probability in zip(parsed, labels, probabilities):
+            result = "Diabetic" if label == 1 else "Not Diabetic"
+            if self.store is not None:
+                self.store.save(input_data, result, risk_score=probability)
+            entry = {'prediction': result, 'probability': round(float(probability), 4),
+                     'risk_tier': risk_tier(probability)}
+            if warnings:
+                entry['warnings'] = warnings
+            results.append(entry)
+        return {'predictions': results} if isinstance(payload, list) else results[0]
+
+    def stats(self):
+        batcher = self.batcher
+        return {
+            'uptime_seconds': round(time.perf_counter() - self.started, 1) if self.started else 0,
+            'requests': self.requests,
+            'errors': self.errors,
+            'rows': batcher.rows,
+            'batches': batcher.batches,
+            'mean_batch_rows': round(batcher.rows / batcher.batches, 2) if batcher.batches else 0,
+            'largest_batch_rows': batcher.largest_batch,
+            'max_batch': batcher.max_batch,
+            'max_wait_ms': batcher.max_wait * 1000,
+        }
+
+    async def _route(self, method, path, body):
+        path = path.split('?', 1)[0]
+        if path == '/predict':
+            if method != 'POST':
+                raise RequestError("Use POST", 405)
+            try:
+                payload = json.loads(body)
+            except (UnicodeDecodeError, ValueError):
+                raise RequestError("Body must be JSON")
+            return await self.predict(payload)
+        if path in ('/health', '/stats'):
+            if method != 'GET':
+                raise RequestError("Use GET", 405)
+            return {'status': 'ok'} if path == '/health' else self.stats()
+        raise RequestError(f"Unknown path {path}", 404)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, path, version = lines[0].split(' ', 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() == 'HTTP/1.1')
+
+                self.requests += 1
+                try:
+                    length = int(headers.get('content-length', 0))
+                    if length > SERVER_MAX_BODY:
+                        keep_alive = False  # the body is not read, so the stream is out of sync
+                        raise RequestError(f"Body larger than {SERVER_MAX_BODY} bytes", 413)
+                    body = await reader.readexactly(length) if length else b''
+                    status, response = 200, await self._route(method.upper(), path, body)
+                except RequestError as e:
+                    self.errors += 1
+                    status, response = e.status, {'error': str(e)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except Exception as e:
+                    self.errors += 1
+                    status, response = 500, {'error': f"{type(e).__name__}: {e}"}
+
+                data = json.dumps(response).encode()
+                writer.write(f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="GlucoScholar_Server.py", description="GlucoScholar prediction service")
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--max-batch', type=int, default=SERVER_MAX_BATCH, help="rows per forest call")
+    parser.add_argument('--max-wait-ms', type=float, default=SERVER_MAX_WAIT * 1000,
+                        help="longest a request waits for others to batch with")
+    parser.add_argument('--db', default=SERVER_DB_PATH, help="predictions database ('' to disable logging)")
+    parser.add_argument('--artifact', default=MODEL_ARTIFACT_PATH, help="model artifact path")
+    parser.add_argument('--backend', choices=['sklearn', 'flat'], default='flat',
+                        help="forest implementation ('flat' is faster for small batches)")
+    args = parser.parse_args(argv)
+
+    try:
+        radFor = randomForest.from_artifact(args.artifact, n_jobs=1, inference_backend=args.backend)
+    except FileNotFoundError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 3
+    store = PredictionStore(args.db) if args.db else None
+    server = PredictionServer(radFor, store, args.host, args.port,
+                              max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+
+    async def run():
+        await server.start()
+        serving = asyncio.current_task()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signum, serving.cancel)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+        print(f"Serving predictions on http://{server.host}:{server.port} "
+              f"(max batch {args.max_batch} rows, max wait {args.max_wait_ms:g} ms)", flush=True)
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,6 @@
+import time
+_STARTUP_TIME = time.perf_counter()
+
 from tkinter import filedialog
 from tkinter import messagebox as msg  # Temporary fallback
 import customtkinter as ctk
@@ -5,25 +8,194 @@ from customtkinter import CTk, CTkTabview, CTkEntry, CTkButton, CTkLabel, CTkFra
 from CTkMessagebox import CTkMessagebox
 from PIL import Image, ImageTk
 import os
-import pandas as pd
-from GlucoScholar import randomForest, ImageProcessor, InformationFetcher
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import sys
+from GlucoScholar import (randomForest, ImageProcessor, ImagePreprocessor, InformationFetcher, PredictionStore, LabValueParser,
+                          ploting_charts, CohortDashboard, DatasetValidator, LazyModule, IMPORT_TIMES, risk_tier,
+                          validation_error, TOP_RISK_LIMIT)
 import webbrowser
-import time
 from tkinter import scrolledtext
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import sqlite3
-from datetime import datetime
 from tkcalendar import DateEntry 
-import csv
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Charts (matplotlib) and PDF reports (reportlab) import their libraries on
+# first use, so the window can show before they are loaded
+pd = LazyModule('pandas')
+_IMPORTS_DONE = time.perf_counter()
+
+# Report tab output formats and their file extensions
+REPORT_FORMATS = {
+    "CSV": ".csv",
+    "CSV (gzip)": ".csv.gz",
+    "Parquet": ".parquet",
+}
+# Report tab modes: detailed rows, the highest risk scores, or a daily
+# summary read from the rollups
+REPORT_MODES = {
+    "Detailed rows": None,
+    f"Highest risk (top {TOP_RISK_LIMIT:,})": 'highest_risk',
+    "Daily summary": 'all',
+    "Daily summary by gender": 'gender',
+    "Daily summary by smoking history": 'smoking_history',
+}
+# Used by "Score Lab Folder" for fields lab reports usually leave out
+LAB_BATCH_DEFAULTS = {
+    'hypertension': 0,
+    'heart_disease': 0,
+    'smoking_history': 'No Info',
+}
+
+class TaskCancelled(Exception):
+    """Raised inside a background job once its task has been cancelled"""
+
+class BackgroundTask:
+    """Handle for a job running on the TaskExecutor pool"""
+    def __init__(self, name, executor, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        self.name = name
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self._executor = executor
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self):
+        """Call between steps of a long job to stop early once cancelled"""
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+
+    def report(self, message, fraction=None):
+        """Send a progress update to the Tk thread (safe from worker threads)"""
+        self._executor._events.put(('progress', self, (message, fraction)))
+
+class TaskExecutor:
+    """
+    Runs slow jobs (scoring, OCR, web search, PDF building) on a thread pool
+    so the Tk mainloop never blocks. Workers never touch widgets: results,
+    errors and progress are queued and handed to the callbacks on the Tk
+    thread by polling with root.after.
+    """
+    def __init__(self, root, max_workers=4, poll_interval=100):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="glucoscholar")
+        self.tasks = {}
+        self._events = queue.Queue()
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, name, func, *args, on_done=None, on_error=None, on_progress=None, on_cancel=None, **kwargs):
+        """
+        Starts `func(task, *args, **kwargs)` on the pool. Only one task per
+        name is live: submitting again cancels the previous one and its
+        results are discarded.
+
+        Returns:
+            BackgroundTask: Handle that can be used to cancel the job.
+        """
+        if name in self.tasks:
+            self.tasks[name].cancel()
+        task = BackgroundTask(name, self, on_done, on_error, on_progress, on_cancel)
+        self.tasks[name] = task
+        task.future = self.pool.submit(self._run, task, func, args, kwargs)
+        return task
+
+    def call_soon(self, func, *args):
+        """Schedule `func(*args)` on the Tk thread (safe from any thread)"""
+        self._events.put(('call', func, args))
+
+    def is_running(self, name):
+        return name in self.tasks
+
+    def cancel(self, name):
+        if name in self.tasks:
+            self.tasks[name].cancel()
+
+    def shutdown(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, task, func, args, kwargs):
+        try:
+            result = func(task, *args, **kwargs)
+        except TaskCancelled:
+            self._events.put(('cancelled', task, None))
+        except Exception as e:
+            self._events.put(('error', task, e))
+        else:
+            self._events.put(('cancelled' if task.cancelled else 'done', task, result))
+
+    def _poll(self):
+        try:
+            while True:
+                kind, task, payload = self._events.get_nowait()
+                try:
+                    if kind == 'call':
+                        task(*payload)
+                    else:
+                        self._dispatch(kind, task, payload)
+                except Exception as e:
+                    print(f"Error in task callback: {str(e)}")
+        except queue.Empty:
+            pass
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _dispatch(self, kind, task, payload):
+        # Drop anything from a task that has been superseded by a newer one
+        if self.tasks.get(task.name) is not task:
+            return
+        if kind == 'progress':
+            if task.on_progress:
+                task.on_progress(*payload)
+            return
+
+        del self.tasks[task.name]
+        if kind == 'done' and task.on_done:
+            task.on_done(payload)
+        elif kind == 'error' and task.on_error:
+            task.on_error(payload)
+        elif kind == 'cancelled' and task.on_cancel:
+            task.on_cancel()
+
+class ChartManager:
+    """
+    One embedded pie chart that is reused for every dataset: the Figure and
+    its Tk canvas are created once, and new data only moves the existing
+    wedges and labels before a redraw. The figure is not created through
+    pyplot, so nothing accumulates in pyplot's figure registry.
+    """
+    def __init__(self, master, labels, colors, title, figsize=(5, 4)):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        self.figure = Figure(figsize=figsize)
+        ax = self.figure.add_subplot()
+        self.wedges, self.texts, self.autotexts = ax.pie([1] * len(labels), labels=labels, colors=colors,
+                                                         autopct='%1.1f%%')
+        ax.axis('equal')
+        ax.set_title(title, fontsize=14, fontweight='bold')
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.widget = self.canvas.get_tk_widget()
+
+    def update(self, sizes):
+        ploting_charts.updatePieChart(self.wedges, self.texts, self.autotexts, sizes)
+        self.canvas.draw_idle()
 
 class DiabetesPredictorApp:
-    def __init__(self, root):
+    def __init__(self, root, startup_report=False):
         self.root = root
         self.root.title("GlucoScholar Diabetes Predictor")
         self.root.geometry("800x600")
@@ -32,9 +204,22 @@ class DiabetesPredictorApp:
         ctk.set_default_color_theme("dark-blue")  # Other options: green, dark-blue
         
         # Initialize components
-        self.radFor = randomForest()
+        # The model loads on a worker thread; actions that need it wait for it
+        self.radFor = None
+        self.startup_report = startup_report
+        self.startup_times = {'imports': _IMPORTS_DONE - _STARTUP_TIME}
         self.image_processor = ImageProcessor()
         self.info_fetcher = InformationFetcher()
+        self.lab_parser = LabValueParser()
+        self.executor = TaskExecutor(self.root)
+        # Dataset tab pie chart, created on the first load
+        self.chart = None
+        self.dashboard_window = None
+        
+        # Shown until the model is ready
+        self.model_status = ctk.CTkLabel(self.root, text="Loading prediction model...", text_color="#120f40",
+                                         font=("Arial", 14, "bold"))
+        self.model_status.pack(side='bottom', fill='x', pady=2)
         
         # Create notebook for tabs
         self.notebook = ctk.CTkTabview(self.root)
@@ -51,36 +236,83 @@ class DiabetesPredictorApp:
         self.create_report_tab() 
         
         # Database initialization
-        self.conn = sqlite3.connect('diabetes_predictions.db')
-        self.create_prediction_table()
+        self.store = PredictionStore(
+            'diabetes_predictions.db',
+            on_error=lambda e: self.executor.call_soon(self._show_store_error, e)
+        )
+        self.conn = self.store.conn
         
         # Add this to handle database closure on exit
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-    
-    def create_prediction_table(self):
-        cursor = self.conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS predictions
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        gender TEXT,
-                        age REAL,
-                        hypertension INTEGER,
-                        heart_disease INTEGER,
-                        smoking_history TEXT,
-                        bmi REAL,
-                        HbA1c_level REAL,
-                        blood_glucose_level REAL,
-                        prediction_result TEXT,
-                        timestamp DATETIME)''')
-        self.conn.commit()
+        
+        self.startup_times['window'] = time.perf_counter() - _STARTUP_TIME
+        self.root.bind("<Map>", self._on_first_frame, add="+")
+        self.executor.submit(
+            "model",
+            self._load_model,
+            on_done=self._on_model_loaded,
+            on_error=self._on_model_error
+        )
+
+    def _load_model(self, task):
+        """Background job: load (or train) the model and build its fast path"""
+        # Single-patient predictions use the flat-array backend for low latency
+        radFor = randomForest(inference_backend='flat')
+        radFor.flat_forest
+        return radFor
+
+    def _on_first_frame(self, event):
+        if event.widget is self.root and 'first_frame' not in self.startup_times:
+            self.startup_times['first_frame'] = time.perf_counter() - _STARTUP_TIME
+
+    def _on_model_loaded(self, radFor):
+        self.radFor = radFor
+        self.startup_times['model'] = time.perf_counter() - _STARTUP_TIME
+        self.model_status.pack_forget()
+        if self.startup_report:
+            print(self.format_startup_report())
+
+    def _on_model_error(self, error):
+        self.model_status.configure(text=f"Prediction model failed to load: {error}", text_color="red")
+
+    def _model_ready(self):
+        """True once the model is loaded; otherwise tells the user to wait."""
+        if self.radFor is not None:
+            return True
+        CTkMessagebox(
+            title="Please wait",
+            message="The prediction model is still loading. Try again in a moment.",
+            icon="info"
+        )
+        return False
+
+    def format_startup_report(self):
+        """Seconds from process start to each startup milestone, plus lazy imports so far."""
+        names = {'imports': "module imports", 'window': "window built", 'first_frame': "first frame",
+                 'model': "model ready"}
+        lines = ["Startup report (seconds since start):"]
+        for key, label in names.items():
+            if key in self.startup_times:
+                lines.append(f"  {label:<16} {self.startup_times[key]:7.3f}")
+        if IMPORT_TIMES:
+            lines.append("Deferred imports loaded so far:")
+            for name, seconds in IMPORT_TIMES.items():
+                lines.append(f"  {name:<16} {seconds:7.3f}")
+        lines.append("Run with python -X importtime for a per-module breakdown.")
+        return "\n".join(lines)
 
     def on_closing(self):
         """Handle database connection closure when app exits"""
         # self.conn.close()
         # self.root.destroy()
         try:
-            # Close database connection
-            if hasattr(self, 'conn'):
-                self.conn.close()
+            # Stop background jobs
+            if hasattr(self, 'executor'):
+                self.executor.shutdown()
+            
+            # Write queued predictions and close database connections
+            if hasattr(self, 'store'):
+                self.store.close()
             
             # Clear any pending tasks
             self.root.after_cancel("all")
@@ -93,31 +325,17 @@ class DiabetesPredictorApp:
             print(f"Error during cleanup: {str(e)}")
             self.root.destroy()
         
-    def save_prediction(self, input_data, prediction_result):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('''INSERT INTO predictions 
-                            (gender, age, hypertension, heart_disease, smoking_history,
-                            bmi, HbA1c_level, blood_glucose_level, prediction_result, timestamp)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                        (input_data['gender'],
-                            input_data['age'],
-                            input_data['hypertension'],
-                            input_data['heart_disease'],
-                            input_data['smoking_history'],
-                            input_data['bmi'],
-                            input_data['HbA1c_level'],
-                            input_data['blood_glucose_level'],
-                            prediction_result,
-                            datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            CTkMessagebox(
-                title="Database Error",
-                message=f"Failed to save prediction: {str(e)}",
-                icon="cancel",
-                parent=self.root  # Ensure parent is set to CTk window
-            )
+    def save_prediction(self, input_data, prediction_result, risk_score=None):
+        # Queued and committed in batches by the store's writer thread
+        self.store.save(input_data, prediction_result, risk_score=risk_score)
+
+    def _show_store_error(self, error):
+        CTkMessagebox(
+            title="Database Error",
+            message=f"Failed to save prediction: {str(error)}",
+            icon="cancel",
+            parent=self.root  # Ensure parent is set to CTk window
+        )
      
     def _create_frames(self):
         # Create notebook tabs using CTkTabview
@@ -162,6 +380,24 @@ class DiabetesPredictorApp:
                                     border_color="#E0E0E0",
                                     corner_radius=6)
         self.results_text.grid(row=1, column=0, columnspan=3, padx=10, pady=5, sticky="nsew")
+        
+        # Progress of the background scoring job
+        self.dataset_status = ctk.CTkLabel(self.dataset_frame, text="", text_color="#120f40", font=("Arial", 14, "bold"))
+        self.dataset_status.grid(row=3, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+        ctk.CTkButton(self.dataset_frame, text="Cancel", command=lambda: self.executor.cancel("dataset"), width=150, height=32, font=("Arial", 16, "bold"), fg_color="#005f87", hover_color="#2980b9").grid(row=3, column=2, padx=10, pady=5)
+        
+        # Optionally keep every scored row in the predictions database
+        self.persist_dataset = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.dataset_frame, text="Save results to database", variable=self.persist_dataset, text_color="white", font=("Arial", 14, "bold")).grid(row=4, column=0, columnspan=3, padx=10, pady=5, sticky="w")
+        
+        # Dashboard mode: rates by band and probability histograms in a separate window
+        self.dashboard_mode = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.dataset_frame, text="Dashboard mode", variable=self.dashboard_mode, text_color="white", font=("Arial", 14, "bold")).grid(row=5, column=0, columnspan=3, padx=10, pady=5, sticky="w")
+        
+        # Optionally skip rows with missing, non-numeric or out-of-range values,
+        # saving them to the Desktop with a data quality report
+        self.validate_dataset = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.dataset_frame, text="Skip invalid rows (saved to Desktop)", variable=self.validate_dataset, text_color="white", font=("Arial", 14, "bold")).grid(row=6, column=0, columnspan=3, padx=10, pady=5, sticky="w")
     
         # Configure grid weights for better resizing
         self.dataset_frame.grid_columnconfigure(1, weight=1)
@@ -197,23 +433,47 @@ class DiabetesPredictorApp:
                                   borderwidth=5)
         self.end_date.grid(row=1, column=1, padx=(100, 450), ipadx=10, pady=30, ipady=10)
         
+        # Output format
+        ctk.CTkLabel(self.report_frame, text="Format:", text_color="white", font=("Arial", 20, "bold")).grid(row=2, column=0, padx=(100,50), pady=10)
+        self.report_format = ctk.StringVar(value="CSV")
+        ctk.CTkOptionMenu(self.report_frame,
+                variable=self.report_format,
+                values=list(REPORT_FORMATS),
+                width=200,
+                fg_color="#005f87",
+                button_color="#005f87",
+                button_hover_color="#3498db",
+                font=("Arial", 16, "bold")).grid(row=2, column=1, padx=(100, 450), pady=10)
+        
+        # Report mode
+        ctk.CTkLabel(self.report_frame, text="Report:", text_color="white", font=("Arial", 20, "bold")).grid(row=3, column=0, padx=(100,50), pady=10)
+        self.report_mode = ctk.StringVar(value="Detailed rows")
+        ctk.CTkOptionMenu(self.report_frame,
+                variable=self.report_mode,
+                values=list(REPORT_MODES),
+                width=300,
+                fg_color="#005f87",
+                button_color="#005f87",
+                button_hover_color="#3498db",
+                font=("Arial", 16, "bold")).grid(row=3, column=1, padx=(100, 350), pady=10)
+        
         # Generate report button
         ctk.CTkButton(self.report_frame, 
-                text="Generate CSV Report", 
+                text="Generate Report", 
                 command=self.generate_csv_report,
                 width=300,
                 height=50,
                 fg_color="#005f87",
                 hover_color="#3498db",
-                font=("Arial", 16, "bold")).grid(row=2, column=0, columnspan=2, pady=20)
+                font=("Arial", 16, "bold")).grid(row=4, column=0, columnspan=2, pady=20)
         
         # Status label
         self.report_status = ctk.CTkLabel(self.report_frame, text="", text_color='#120f40', font=("Arial", 16, "bold"))
-        self.report_status.grid(row=3, column=0, columnspan=2, pady=10)
+        self.report_status.grid(row=5, column=0, columnspan=2, pady=10)
 
         # Configure grid weights for better layout
         self.report_frame.grid_columnconfigure(1, weight=1)
-        for i in range(4):
+        for i in range(6):
             self.report_frame.grid_rowconfigure(i, weight=1)
             
             
@@ -242,6 +502,18 @@ class DiabetesPredictorApp:
                         font=("Arial", 14, "bold"),
                         fg_color="#005f87",
                         hover_color="#2980b9").grid(row=1, column=1, pady=10, padx=5)
+        ctk.CTkButton(self.image_frame, text="Batch OCR Folder", command=self.batch_ocr,
+                        width=150,
+                        height=32,
+                        font=("Arial", 14, "bold"),
+                        fg_color="#005f87",
+                        hover_color="#2980b9").grid(row=1, column=2, pady=10, padx=5)
+        ctk.CTkButton(self.image_frame, text="Score Lab Folder", command=self.score_lab_folder,
+                        width=150,
+                        height=32,
+                        font=("Arial", 14, "bold"),
+                        fg_color="#005f87",
+                        hover_color="#2980b9").grid(row=1, column=3, pady=10, padx=5)
         
         # Configure scrolled text
         self.image_text = ctk.CTkTextbox(
@@ -255,7 +527,7 @@ class DiabetesPredictorApp:
                 border_color="#E0E0E0",
                 corner_radius=6
             )
-        self.image_text.grid(row=2, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+        self.image_text.grid(row=2, column=0, columnspan=4, padx=10, pady=10, sticky="nsew")
         
         # Configure grid weights for better resizing
         self.image_frame.grid_columnconfigure(1, weight=1)
@@ -263,7 +535,17 @@ class DiabetesPredictorApp:
         
         # Create a separate frame for links
         self.links_frame = ctk.CTkFrame(self.image_frame, fg_color="transparent")
-        self.links_frame.grid(row=3, column=0, columnspan=3, sticky="nsew", padx=10, pady=5)
+        self.links_frame.grid(row=3, column=0, columnspan=4, sticky="nsew", padx=10, pady=5)
+
+        # Opt-in OpenCV clean-up before OCR (resize, deskew, binarize, crop);
+        # applies to Extract Text, Batch OCR Folder and Score Lab Folder
+        self.preprocess_images = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.image_frame, text="Clean up images before OCR", variable=self.preprocess_images,
+                        command=self._toggle_preprocessing, text_color="white",
+                        font=("Arial", 14, "bold")).grid(row=4, column=0, columnspan=4, padx=10, pady=5, sticky="w")
+
+    def _toggle_preprocessing(self):
+        self.image_processor.preprocessor = ImagePreprocessor() if self.preprocess_images.get() else None
     
     def _open_url(self, event):
         """Handle URL clicks in CTkTextbox"""
@@ -389,35 +671,26 @@ class DiabetesPredictorApp:
                     text_color="red"  # CTk specific color setting
                 )
         
-        elif field == 'hypertension':
-            if value not in ['0', '1']:
+        elif field in ('hypertension', 'heart_disease'):
+            error = validation_error(field, value)
+            if error:
                 self.error_labels[field].configure(
-                    text="Enter: 0 or 1",
-                    text_color="red"
-                )
-        
-        elif field == 'heart_disease':
-            if value not in ['0', '1']:
-                self.error_labels[field].configure(
-                    text="Enter: 0 or 1",
+                    text=error,
                     text_color="red"
                 )
                 
-        elif field == 'smoking_history':
-            valid_values = self.radFor.smoking_history_encoder.classes_
-            input_value = value.strip().title()  # Convert input to title case
-
-            matches = [v for v in valid_values if v.lower() == input_value.lower()]
-            # Special handling for "No Info" and case-sensitivity
-            if not matches:
-                allowed = "/".join(valid_values)
+        elif field == 'smoking_history' and self.radFor is not None:
+            encoder = self.radFor.smoking_history_encoder
+            # Same case-insensitive match as scoring uses
+            correct_case = encoder.match(value)
+            if correct_case is None:
+                allowed = "/".join(encoder.classes_)
                 self.error_labels[field].configure(
                     text=f"Enter: {allowed}",
                     text_color="red"
                 )
             else:
                 # Convert to correct case if valid
-                correct_case = matches[0]
                 self.entries[field].delete(0, "end")  # CTk syntax
                 self.entries[field].insert(0, correct_case)
                 # Clear error message when valid
@@ -437,34 +710,11 @@ class DiabetesPredictorApp:
         if not value:
             return
         
-        try:
-            num = float(value)
-            
-            # Field-specific validation with CustomTkinter styling
-            if field == 'age' and not (0 < num <= 120):
-                self.error_labels[field].configure(
-                    text="Age 0-120",
-                    text_color="red"
-                )
-            elif field == 'bmi' and not (10 <= num <= 50):
-                self.error_labels[field].configure(
-                    text="BMI 10-50",
-                    text_color="red"
-                )
-            elif field == 'HbA1c_level' and not (3 <= num <= 20):
-                self.error_labels[field].configure(
-                    text="HbA1c 3-20%",
-                    text_color="red"
-                )
-            elif field == 'blood_glucose_level' and not (70 <= num <= 300):
-                self.error_labels[field].configure(
-                    text="Glucose 70-300",
-                    text_color="red"
-                )
-                
-        except ValueError:
+        # Same ranges as the prediction service and dataset validation
+        error = validation_error(field, value)
+        if error:
             self.error_labels[field].configure(
-                text="Numbers only",
+                text=error,
                 text_color="red"
             )
     
@@ -500,99 +750,169 @@ class DiabetesPredictorApp:
     
 
     def load_dataset(self):
+        if not self._model_ready():
+            return
         file_path = filedialog.askopenfilename(
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
         if file_path:
             self.dataset_path.set(file_path)
-            try:
-                # Read the dataset
-                df = pd.read_csv(file_path)
-                
-                # Ensure all required columns are present
-                required_columns = [
-                    'gender', 'age', 'hypertension', 'heart_disease',
-                    'smoking_history', 'bmi', 'HbA1c_level', 'blood_glucose_level'
-                ]
-                
-                # Check if all required columns exist
-                missing_cols = [col for col in required_columns if col not in df.columns]
-                if missing_cols:
-                    raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
-                
-                # Handle unknown categories for gender
-                known_genders = self.radFor.gender_encoder.classes_
-                df['gender'] = df['gender'].apply(
-                    lambda x: x if x in known_genders else known_genders[0]
-                )
-                
-                # Handle unknown categories for smoking_history
-                known_smoking = self.radFor.smoking_history_encoder.classes_
-                df['smoking_history'] = df['smoking_history'].apply(
-                    lambda x: x if x in known_smoking else known_smoking[0]
-                )
-                
-                # Encode categorical variables
-                df['gender'] = self.radFor.gender_encoder.transform(df['gender'])
-                df['smoking_history'] = self.radFor.smoking_history_encoder.transform(df['smoking_history'])
-                
-                # Reorder columns to match training data order
-                df = df[required_columns]
-                
-                # Make predictions
-                predictions = self.radFor.model.predict(df)
-                diabetic = sum(predictions)
-                non_diabetic = len(predictions) - diabetic
-                
-                # Display results using CTkTextbox
-                self.results_text.delete("0.0", "end")  # CTk syntax
-                self.results_text.insert("0.0", f"Dataset: {os.path.basename(file_path)}\n")
-                self.results_text.insert("end", f"Total Cases: {len(predictions)}\n")
-                self.results_text.insert("end", f"Diabetic Cases: {diabetic}\n")
-                self.results_text.insert("end", f"Non-Diabetic Cases: {non_diabetic}\n")
-                self.results_text.insert("end", f"Diabetic Percentage: {(diabetic/len(predictions))*100:.2f}%\n\n")
-                
-                # Create pie chart
-                fig, ax = plt.subplots(figsize=(5, 4))
-                labels = ['Diabetic', 'Non-Diabetic']
-                sizes = [diabetic, non_diabetic]
-                colors = ['#ff9999', '#66b3ff']
-                
-                ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%')  # Removed shadow
-                ax.axis('equal')
-                plt.title('Diabetes Prediction Distribution', fontsize=14, fontweight='bold')
-                
-                # Embed the plot
-                if hasattr(self, 'canvas'):
-                    self.canvas.get_tk_widget().destroy()
-                self.canvas = FigureCanvasTkAgg(fig, master=self.dataset_frame)
-                self.canvas.draw()
-                self.canvas.get_tk_widget().grid(
-                    row=2, 
-                    column=0, 
-                    columnspan=3, 
-                    padx=10, 
-                    pady=10,
-                    sticky="nsew"
-                )
-                
-                # Add warning if unknown categories were found
-                if df['gender'].isin([known_genders[0]]).any() or df['smoking_history'].isin([known_smoking[0]]).any():
-                    warning_msg = "Note: Some records contained unknown categories and were mapped to default values."
-                    self.results_text.insert("end", warning_msg)
-                    
-            except ValueError as ve:
-                CTkMessagebox(
-                    title="Error",
-                    message=str(ve),
-                    icon="cancel"
-                )
-            except Exception as e:
-                CTkMessagebox(
-                    title="Error",
-                    message=f"Error processing dataset: {str(e)}",
-                    icon="cancel"
-                )
+            self.dataset_status.configure(text=f"Analyzing {os.path.basename(file_path)}...")
+            quarantine_path = None
+            if self.validate_dataset.get():
+                name = os.path.splitext(os.path.basename(file_path))[0]
+                timestamp = time.strftime("%Y%m%d-%H%M%S")
+                quarantine_path = os.path.join(os.path.expanduser('~'), 'Desktop',
+                                               f"{name}_invalid_rows_{timestamp}.csv")
+            self.executor.submit(
+                "dataset",
+                self._score_dataset,
+                file_path,
+                self.persist_dataset.get(),
+                self.dashboard_mode.get(),
+                quarantine_path,
+                on_progress=lambda message, fraction: self.dataset_status.configure(text=message),
+                on_done=lambda summary: self._show_dataset_results(file_path, summary),
+                on_error=self._show_dataset_error,
+                on_cancel=lambda: self.dataset_status.configure(text="Analysis cancelled")
+            )
+
+    def _score_dataset(self, task, file_path, persist=False, dashboard=False, quarantine_path=None):
+        """Background job: score the file chunk by chunk"""
+        writer = self.store.bulk_writer(source=file_path) if persist else None
+        dashboard = CohortDashboard() if dashboard else None
+        callbacks = [callback for callback in (writer and writer.write, dashboard and dashboard.update) if callback]
+
+        def chunk_callback(chunk, predictions, probabilities):
+            for callback in callbacks:
+                callback(chunk, predictions, probabilities)
+
+        try:
+            # Unknown categories are mapped to the first known class of each
+            # encoder; with a quarantine path invalid rows are skipped and saved
+            summary = self.radFor.streamPrediction(
+                file_path,
+                handle_unknown='default',
+                quarantine_path=quarantine_path,
+                progress_callback=lambda summary: task.report(f"Scored {summary['rows']:,} rows..."),
+                cancel_event=task.cancel_event,
+                chunk_callback=chunk_callback if callbacks else None
+            )
+        finally:
+            if writer:
+                writer.close()
+        if writer:
+            summary['run_id'] = writer.run_id
+        if dashboard:
+            summary['dashboard'] = dashboard
+        return summary
+
+    def _show_dataset_error(self, error):
+        self.dataset_status.configure(text="")
+        if isinstance(error, ValueError):
+            message = str(error)
+        else:
+            message = f"Error processing dataset: {str(error)}"
+        CTkMessagebox(
+            title="Error",
+            message=message,
+            icon="cancel"
+        )
+
+    def _show_dataset_results(self, file_path, summary):
+        total = summary['rows']
+        if total == 0:
+            message = "The dataset contains no valid rows" if summary['validation'] and summary['validation']['rows'] \
+                else "The dataset contains no rows"
+            self._show_dataset_error(ValueError(message))
+            return
+        diabetic = summary['diabetic']
+        non_diabetic = summary['non_diabetic']
+        self.dataset_status.configure(text=f"Scored {total:,} rows")
+        
+        # Display results using CTkTextbox
+        self.results_text.delete("0.0", "end")  # CTk syntax
+        self.results_text.insert("0.0", f"Dataset: {os.path.basename(file_path)}\n")
+        self.results_text.insert("end", f"Total Cases: {total}\n")
+        self.results_text.insert("end", f"Diabetic Cases: {diabetic}\n")
+        self.results_text.insert("end", f"Non-Diabetic Cases: {non_diabetic}\n")
+        self.results_text.insert("end", f"Diabetic Percentage: {(diabetic/total)*100:.2f}%\n\n")
+        self.results_text.insert("end", "Risk Tiers:\n")
+        for tier, count in summary['risk_tiers'].items():
+            self.results_text.insert("end", f"  {tier}: {count:,} ({count / total * 100:.1f}%)\n")
+        self.results_text.insert("end", "\n")
+        self._show_validation_report(summary)
+        self._show_remapped_categories(summary['remapped'])
+        if 'run_id' in summary:
+            self.results_text.insert("end", f"Saved to database as run {summary['run_id']}\n")
+        
+        # Create the pie chart on the first dataset, then update it in place
+        if self.chart is None:
+            self.chart = ChartManager(self.dataset_frame, ['Diabetic', 'Non-Diabetic'], ['#ff9999', '#66b3ff'],
+                                      'Diabetes Prediction Distribution')
+            self.chart.widget.grid(
+                row=2, 
+                column=0, 
+                columnspan=3, 
+                padx=10, 
+                pady=10,
+                sticky="nsew"
+            )
+        self.chart.update([diabetic, non_diabetic])
+        if 'dashboard' in summary:
+            self._show_dashboard(summary['dashboard'])
+
+    def _show_validation_report(self, summary):
+        """Lists the rows skipped by validation and where they were saved"""
+        report = summary['validation']
+        if not report or not report['invalid_rows']:
+            return
+        self.results_text.insert("end", "Data Quality:\n" + DatasetValidator.format_report(report) + "\n")
+        if summary['quarantine_path']:
+            self.results_text.insert("end", f"Skipped rows saved to {summary['quarantine_path']}\n")
+        self.results_text.insert("end", "\n")
+
+    def _show_remapped_categories(self, remapped):
+        """Lists category values that were case-corrected or defaulted, and warns about unknown ones"""
+        unknown = []
+        for column, counts in remapped.items():
+            name = column.replace('_', ' ')
+            encoder = self.radFor.category_encoders[column]
+            if counts['normalized']:
+                self.results_text.insert("end", f"{name.capitalize()}: {counts['normalized']:,} values matched "
+                                                f"ignoring case/spaces\n")
+            if counts['unknown']:
+                labels = ", ".join("(missing)" if label is None else repr(label)
+                                   for label in counts['unknown_labels'][:5])
+                self.results_text.insert("end", f"{name.capitalize()}: {counts['unknown']:,} unknown values "
+                                                f"({labels}) scored as {encoder.classes_[0]}\n")
+                unknown.append(f"{counts['unknown']:,} {name}")
+        if unknown:
+            CTkMessagebox(
+                title="Warning",
+                message=f"Unknown categories ({', '.join(unknown)}) were scored using the default category.",
+                icon="warning"
+            )
+
+    def _show_dashboard(self, dashboard):
+        for column in dashboard.labels:
+            table = dashboard.table(column)
+            self.results_text.insert("end", f"\nDiabetes rate by {column}:\n")
+            for label, total, diabetic, rate in table.itertuples(index=False):
+                self.results_text.insert("end", f"  {label}: {diabetic:,} of {total:,} ({rate * 100:.1f}%)\n")
+
+        # One dashboard window and figure, redrawn for each dataset
+        if self.dashboard_window is None or not self.dashboard_window.winfo_exists():
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.dashboard_window = ctk.CTkToplevel(self.root)
+            self.dashboard_window.title("Cohort Dashboard")
+            self.dashboard_figure = Figure(figsize=(15, 8))
+            self.dashboard_canvas = FigureCanvasTkAgg(self.dashboard_figure, master=self.dashboard_window)
+            self.dashboard_canvas.get_tk_widget().pack(fill="both", expand=True)
+        ploting_charts.drawDashboard(self.dashboard_figure, dashboard)
+        self.dashboard_canvas.draw_idle()
+        self.dashboard_window.lift()
                 
     def load_image(self):
         """Handle image file selection"""
@@ -608,80 +928,200 @@ class DiabetesPredictorApp:
     def process_image(self):
         """Process the selected image and extract text"""
         if self.image_path.get():
-            try:
-                extracted_text = self.image_processor.extract_text(self.image_path.get())
-                
-                # CustomTkinter text widget operations
-                self.image_text.delete("0.0", "end")  # CTk syntax
-                self.image_text.insert("0.0", "Extracted Text:\n" + extracted_text)
-                
-                # Debug print
-                # print("Extracted Text: ", self.image_text.get("0.0", "end-1c"))
-                
-            except Exception as e:
-                CTkMessagebox(
-                    title="Error",
-                    message=f"Error processing image: {str(e)}",
-                    icon="cancel"
-                )
+            self.image_text.delete("0.0", "end")  # CTk syntax
+            self.image_text.insert("0.0", "Extracting text...")
+            self.executor.submit(
+                "ocr",
+                lambda task, path: self.image_processor.extract_text(path),
+                self.image_path.get(),
+                on_done=self._show_extracted_text,
+                on_error=self._show_image_error
+            )
+
+    def _show_extracted_text(self, extracted_text):
+        # CustomTkinter text widget operations
+        self.image_text.delete("0.0", "end")  # CTk syntax
+        self.image_text.insert("0.0", "Extracted Text:\n" + extracted_text)
+        self._fill_lab_values(self.lab_parser.parse(extracted_text))
+
+    def _fill_lab_values(self, parsed):
+        """Copy confidently parsed lab values into the Prediction tab"""
+        input_data, missing, _ = self.lab_parser.to_input_data(parsed)
+        if not input_data:
+            return
+        for field, value in input_data.items():
+            self.entries[field].delete(0, "end")
+            self.entries[field].insert(0, f"{value:g}" if isinstance(value, float) else str(value))
+            if field in ['age', 'bmi', 'HbA1c_level', 'blood_glucose_level']:
+                self.validate_numeric_field(field)
+            else:
+                self.validate_categorical_input(field)
+
+        self.image_text.insert("end", "\n\nDetected lab values (copied to Diabetes Prediction):\n")
+        for field in input_data:
+            found = parsed[field]
+            unit = f" {found['unit']}" if found['unit'] else ""
+            self.image_text.insert("end", f"• {field}: {input_data[field]} (read as \"{found['text']}\"{unit}, "
+                                          f"confidence {found['confidence']:.0%})\n")
+        if missing:
+            self.image_text.insert("end", f"Not found: {', '.join(missing)}\n")
+
+    def _show_image_error(self, error):
+        self.image_text.delete("0.0", "end")
+        CTkMessagebox(
+            title="Error",
+            message=f"Error processing image: {str(error)}",
+            icon="cancel"
+        )
+    
+    def batch_ocr(self):
+        """OCR every image in a folder on a process pool"""
+        directory = filedialog.askdirectory()
+        if not directory:
+            return
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        output_path = os.path.join(os.path.expanduser('~'), 'Desktop', f"ocr_results_{timestamp}.jsonl")
+        self.image_text.delete("0.0", "end")
+        self.image_text.insert("0.0", f"Batch OCR: {directory}\n")
+        self.executor.submit(
+            "batch_ocr",
+            lambda task: self.image_processor.batch_extract(
+                directory, output_path,
+                progress_callback=lambda stats: task.report(
+                    f"Processed {stats['images']}/{stats['total']} images "
+                    f"({stats['images_per_second']:.1f} images/s)"),
+                cancel_event=task.cancel_event
+            ),
+            on_progress=self._show_batch_ocr_progress,
+            on_done=self._show_batch_ocr_results,
+            on_error=self._show_image_error
+        )
+
+    def _show_batch_ocr_progress(self, message, fraction):
+        self.image_text.delete("2.0", "end")
+        self.image_text.insert("end", message)
+
+    def _show_batch_ocr_results(self, stats):
+        self.image_text.delete("2.0", "end")
+        self.image_text.insert("end", f"Processed {stats['images']} images "
+                                      f"({stats['failed']} failed) in {stats['seconds']:.1f} s, "
+                                      f"{stats['images_per_second']:.1f} images/s\n")
+        self.image_text.insert("end", f"Results saved to: {stats['output_path']}\n")
     
+    def score_lab_folder(self):
+        """OCR a folder of lab reports, parse their values and score them"""
+        if not self._model_ready():
+            return
+        directory = filedialog.askdirectory()
+        if not directory:
+            return
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        output_path = os.path.join(os.path.expanduser('~'), 'Desktop', f"lab_predictions_{timestamp}.csv")
+        self.image_text.delete("0.0", "end")
+        self.image_text.insert("0.0", f"Scoring lab reports: {directory}\n")
+        self.executor.submit(
+            "lab_folder",
+            lambda task: self.lab_parser.score_reports(
+                self.radFor, self.image_processor, directory,
+                output_path=output_path,
+                defaults=LAB_BATCH_DEFAULTS,
+                progress_callback=lambda done, total: task.report(f"Read {done}/{total} reports"),
+                cancel_event=task.cancel_event
+            ),
+            on_progress=self._show_batch_ocr_progress,
+            on_done=lambda results: self._show_lab_scores(results, output_path),
+            on_error=self._show_image_error
+        )
+
+    def _show_lab_scores(self, results, output_path):
+        self.image_text.delete("2.0", "end")
+        scored = [r for r in results if r['prediction'] is not None]
+        for r in scored:
+            result = "Diabetic" if r['prediction'] == 1 else "Not Diabetic"
+            self.save_prediction(r['values'], result, r['probability'])
+            self.image_text.insert("end", f"{os.path.basename(r['path'])}: {result} "
+                                          f"(risk {r['probability'] * 100:.1f}%, {risk_tier(r['probability'])})\n")
+        for r in results:
+            if r['prediction'] is None:
+                reason = r['error'] or f"missing {', '.join(r['missing'])}"
+                self.image_text.insert("end", f"{os.path.basename(r['path'])}: not scored ({reason})\n")
+        self.image_text.insert("end", f"\nScored {len(scored)} of {len(results)} reports. "
+                                      f"Results saved to: {output_path}\n")
+
     def search_online(self):
         """Handle online search with CustomTkinter widgets"""
         query = self.image_text.get("0.0", "end-1c")  # CTk syntax
-        # print("🔖 Text for search: ", query)
         
         if query:
-            try:
-                # Show searching status
-                self.image_text.insert("end", "\n\nSearching...\n")
-                self.root.update()
+            # Show searching status; cache misses wait on the fetcher's
+            # rate-limit delays on the worker thread instead of the window
+            self.image_text.insert("end", "\n\nSearching...\n")
+            self.executor.submit(
+                "search",
+                lambda task, text: self.info_fetcher.search_with_summaries(text),
+                query,
+                on_done=self._show_search_results,
+                on_error=self._show_search_error
+            )
 
-                # Add initial delay
-                time.sleep(2)
+    def _clear_search_status(self):
+        # Remove the "Searching..." line added by search_online
+        self.image_text.delete("end-2c linestart", "end-1c lineend")
 
-                results = self.info_fetcher.google_search(query)
-                
-                # Clear searching status using CTk syntax
-                self.image_text.delete("end-2c linestart", "end-1c lineend")
+    def _show_search_results(self, results):
+        self._clear_search_status()
+        
+        # Clear previous links
+        for widget in self.links_frame.winfo_children():
+            widget.destroy()
+        
+        if results:
+            source = {'cache': " (cached)", 'index': " (offline library)"}.get(self.info_fetcher.last_source, "")
+            self.image_text.insert("end", f"\nSearch Results{source}:\n")
+            for i, page in enumerate(results[:5], 1):
+                # Enhanced URL validation and completion
+                url = page['url']
+                if not url.startswith(('http://', 'https://')):
+                    url = f"https://{url}"
+                if 'google.com' in url:
+                    continue
                 
-                 # Clear previous links
-                for widget in self.links_frame.winfo_children():
-                    widget.destroy()
+                # Create clickable link button, titled when the page could be fetched
+                link_btn = ctk.CTkButton(
+                    self.links_frame,
+                    text=f"{i}. {page['title'] or url}",
+                    command=lambda u=url: webbrowser.open_new_tab(u),
+                    fg_color="transparent",
+                    text_color="#120f40",
+                    hover_color="#E0E0E0",
+                    anchor="w",
+                    height=25
+                )
+                link_btn.pack(fill="x", pady=2)
+                if page['summary']:
+                    ctk.CTkLabel(
+                        self.links_frame,
+                        text=page['summary'],
+                        text_color="#555555",
+                        font=("Arial", 12),
+                        anchor="w",
+                        justify="left",
+                        wraplength=700
+                    ).pack(fill="x", padx=(28, 5), pady=(0, 4))
                 
-                if results:
-                    self.image_text.insert("end", "\nSearch Results:\n")
-                    for i, url in enumerate(results[:5], 1):
-                        # Enhanced URL validation and completion
-                        if not url.startswith(('http://', 'https://')):
-                            url = f"https://{url}"
-                        if 'google.com' in url:
-                            continue
-                        
-                        # Create clickable link button
-                        link_btn = ctk.CTkButton(
-                            self.links_frame,
-                            text=f"{i}. {url}",
-                            command=lambda u=url: webbrowser.open_new_tab(u),
-                            fg_color="transparent",
-                            text_color="#120f40",
-                            hover_color="#E0E0E0",
-                            anchor="w",
-                            height=25
-                        )
-                        link_btn.pack(fill="x", pady=2)
-                        
-                else:
-                    self._show_default_resources()
+        else:
+            self._show_default_resources()
 
-            except Exception as e:
-                if "429" in str(e):
-                    self._show_default_resources()
-                else:
-                    CTkMessagebox(
-                        title="Error",
-                        message=f"Search failed: {str(e)}",
-                        icon="cancel"
-                    )
+    def _show_search_error(self, error):
+        self._clear_search_status()
+        if "429" in str(error):
+            self._show_default_resources()
+        else:
+            CTkMessagebox(
+                title="Error",
+                message=f"Search failed: {str(error)}",
+                icon="cancel"
+            )
 
     def _show_default_resources(self):
         """Helper method to display default resources"""
@@ -710,124 +1150,61 @@ class DiabetesPredictorApp:
             link_btn.pack(fill="x", pady=2)
                 
     def predict_diabetes(self):
+        if not self._model_ready():
+            return
         # Clear previous errors
         for field in self.error_labels:
             self.error_labels[field].configure(text="")  # Changed from config to configure
 
         try:
-            input_data = {
-                'gender': self.entries['gender'].get().strip(),
-                'age': float(self.entries['age'].get().strip()),
-                'hypertension': int(self.entries['hypertension'].get().strip()),
-                'heart_disease': int(self.entries['heart_disease'].get().strip()),
-                'smoking_history': self.entries['smoking_history'].get().strip(),
-                'bmi': float(self.entries['bmi'].get().strip()),
-                'HbA1c_level': float(self.entries['HbA1c_level'].get().strip()),
-                'blood_glucose_level': float(self.entries['blood_glucose_level'].get().strip())
-            }
+            values = {field: self.entries[field].get().strip() for field in self.entries}
             
             # --- Validation Checks ---
             errors = False 
-            
-            try:
-                age = float(input_data['age'])
-                if not (0 < age <= 120):
-                    self.error_labels['age'].configure(
-                        text="Age must be 0-120 years",
+            for field, value in values.items():
+                error = validation_error(field, value)
+                if error:
+                    self.error_labels[field].configure(
+                        text=error,
                         text_color="red"
                     )
                     errors = True
-            except ValueError:
-                self.error_labels['age'].configure(
-                    text="Invalid age",
-                    text_color="red"
-                )
-                errors = True
-                        
-            try:
-                bmi = float(input_data['bmi'])
-                if not (10 <= bmi <= 50):
-                    self.error_labels['bmi'].configure(
-                        text="BMI must be 10-50",
-                        text_color="red"
-                    )
-                    errors = True
-            except ValueError:
-                self.error_labels['bmi'].configure(
-                    text="Invalid BMI",
-                    text_color="red"
-                )
-                errors = True
-            
-            try:
-                hba1c = float(input_data['HbA1c_level'])
-                if not (3 <= hba1c <= 20):
-                    self.error_labels['HbA1c_level'].configure(
-                        text="HbA1c must be 3-20%",
-                        text_color="red"
-                    )
-                    errors = True
-            except ValueError:
-                self.error_labels['HbA1c_level'].configure(
-                    text="Numbers only",
-                    text_color="red"
-                )
-                errors = True
-            
-            try:
-                glucose = float(input_data['blood_glucose_level'])
-                if not (70 <= glucose <= 300):
-                    self.error_labels['blood_glucose_level'].configure(
-                        text="Glucose must be 70-300 mg/dL",
-                        text_color="red"
-                    )
-                    errors = True
-            except ValueError:
-                self.error_labels['blood_glucose_level'].configure(
-                    text="Numbers only",
-                    text_color="red"
-                )
-                errors = True
-                
             if errors:
                 return
+            input_data = {
+                field: int(float(value)) if field in ('hypertension', 'heart_disease')
+                else value if field in ('gender', 'smoking_history') else float(value)
+                for field, value in values.items()
+            }
 
-            # Handle unknown categories with CTkMessagebox
-            if input_data['gender'] not in self.radFor.gender_encoder.classes_:
-                input_data['gender'] = self.radFor.gender_encoder.classes_[0]
-                CTkMessagebox(
-                    title="Warning",
-                    message=f"Unknown gender category. Using default: {input_data['gender']}",
-                    icon="warning"
-                )
-                
-            if input_data['smoking_history'] not in self.radFor.smoking_history_encoder.classes_:
-                input_data['smoking_history'] = self.radFor.smoking_history_encoder.classes_[0]
-                CTkMessagebox(
-                    title="Warning",
-                    message=f"Unknown smoking history category. Using default: {input_data['smoking_history']}",
-                    icon="warning"
-                )
-            
-            # Convert to DataFrame for prediction
-            df = pd.DataFrame([input_data])
+            # Categories match ignoring case; unknown ones fall back to the
+            # first known class with a CTkMessagebox warning
+            for field, encoder in self.radFor.category_encoders.items():
+                known = encoder.match(input_data[field])
+                if known is None:
+                    known = encoder.classes_[0]
+                    CTkMessagebox(
+                        title="Warning",
+                        message=f"Unknown {field.replace('_', ' ')} category. Using default: {known}",
+                        icon="warning"
+                    )
+                input_data[field] = str(known)
             
-            # Encode categorical variables
-            df['gender'] = self.radFor.gender_encoder.transform(df['gender'])
-            df['smoking_history'] = self.radFor.smoking_history_encoder.transform(df['smoking_history'])
+            # Encode with the model's shared encoders
+            X = self.radFor.encode_features(pd.DataFrame([input_data]))
             
-            # Make prediction
-            prediction = self.radFor.model.predict(df)
+            # Make prediction, with the calibrated probability as the risk score
+            prediction, risk = self.radFor.scoreBatch(X)
             result = "Diabetic" if prediction[0] == 1 else "Not Diabetic"
             
             # Update result label with CTk styling
             self.result_label.configure(
-                text=f"Prediction Result: {result}",
+                text=f"Prediction Result: {result}\nRisk: {risk[0] * 100:.1f}% ({risk_tier(risk[0])})",
                 text_color="red" if prediction[0] else "green"
             )
             
             # Save to database
-            self.save_prediction(input_data, result)
+            self.save_prediction(input_data, result, risk[0])
             
             # Update medical recommendations
             self.advice_text.delete("0.0", "end")  # CTk syntax
@@ -935,8 +1312,10 @@ class DiabetesPredictorApp:
         try:
             # Collect patient data
             patient_data = {field: self.entries[field].get() for field in self.entries}
-            result_text = self.result_label.cget("text")
-            prediction = result_text.split(": ")[-1]
+            # "Prediction Result: ..." then "Risk: ..." on the second line
+            result_lines = self.result_label.cget("text").splitlines()
+            prediction = result_lines[0].split(": ")[-1]
+            risk = result_lines[1].split(": ", 1)[-1] if len(result_lines) > 1 else None
             
             # Get medical recommendations
             recommendations = self.get_medical_recommendations(
@@ -950,73 +1329,101 @@ class DiabetesPredictorApp:
             filename = f"Diabetes_Report_{timestamp}.pdf"
             desktop_path = os.path.join(os.path.expanduser('~'), 'Desktop', filename)
             
-            # Create PDF
-            doc = SimpleDocTemplate(desktop_path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            elements = []
-            
-            # Title
-            title_style = ParagraphStyle(
-                'Title',
-                parent=styles['Heading1'],
-                alignment=1,
-                spaceAfter=14
-            )
-            elements.append(Paragraph("Diabetes Risk Assessment Report", title_style))
-            
-            # Patient Information Table
-            patient_table = [
-                ["Patient Information", "Value"],
-                ["Age", patient_data['age']],
-                ["Gender", patient_data['gender']],
-                ["BMI", patient_data['bmi']],
-                ["HbA1c Level", patient_data['HbA1c_level']],
-                ["Blood Glucose", patient_data['blood_glucose_level']],
-                ["Prediction Result", prediction]
-            ]
-            
-            table = Table(patient_table)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-                ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0,0), (-1,0), 12),
-                ('BACKGROUND', (0,1), (-1,-1), colors.beige),
-                ('GRID', (0,0), (-1,-1), 1, colors.black)
-            ]))
-            elements.append(table)
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Medical Recommendations
-            elements.append(Paragraph("Medical Recommendations:", styles['Heading2']))
-            for rec in recommendations:
-                elements.append(Paragraph(f"• {rec}", styles['BodyText']))
-                elements.append(Spacer(1, 0.1*inch))
-            
-            # Disclaimer
-            disclaimer = """<font color=red><i>Note: This automated report is not a substitute for professional medical advice. 
-                        Always consult a qualified healthcare provider for diagnosis and treatment.</i></font>"""
-            elements.append(Paragraph(disclaimer, styles['Italic']))
-            
-            doc.build(elements)
-            
-            # Open PDF in default browser
-            webbrowser.open_new_tab(f"file://{desktop_path}")
-            
-            # Show success message with CTkMessagebox
-            CTkMessagebox(
-                title="Success",
-                message=f"PDF report saved and opened:\n{desktop_path}",
-                icon="info"
+            # Build the document on a worker thread
+            self.executor.submit(
+                "pdf",
+                self._build_pdf_report,
+                desktop_path,
+                patient_data,
+                prediction,
+                recommendations,
+                risk,
+                on_done=self._show_pdf_report,
+                on_error=self._show_pdf_error
             )
                 
         except Exception as e:
-            CTkMessagebox(
-                title="Error",
-                message=f"Failed to generate PDF: {str(e)}",
-                icon="cancel"
-            )
+            self._show_pdf_error(e)
+
+    def _build_pdf_report(self, task, desktop_path, patient_data, prediction, recommendations, risk=None):
+        """Background job: write the PDF report and return its path"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib import colors
+        from reportlab.lib.units import inch
+
+        # Create PDF
+        doc = SimpleDocTemplate(desktop_path, pagesize=letter)
+        styles = getSampleStyleSheet()
+        elements = []
+        
+        # Title
+        title_style = ParagraphStyle(
+            'Title',
+            parent=styles['Heading1'],
+            alignment=1,
+            spaceAfter=14
+        )
+        elements.append(Paragraph("Diabetes Risk Assessment Report", title_style))
+        
+        # Patient Information Table
+        patient_table = [
+            ["Patient Information", "Value"],
+            ["Age", patient_data['age']],
+            ["Gender", patient_data['gender']],
+            ["BMI", patient_data['bmi']],
+            ["HbA1c Level", patient_data['HbA1c_level']],
+            ["Blood Glucose", patient_data['blood_glucose_level']],
+            ["Prediction Result", prediction]
+        ]
+        if risk:
+            patient_table.append(["Risk Score", risk])
+        
+        table = Table(patient_table)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.black),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0,0), (-1,0), 12),
+            ('BACKGROUND', (0,1), (-1,-1), colors.beige),
+            ('GRID', (0,0), (-1,-1), 1, colors.black)
+        ]))
+        elements.append(table)
+        elements.append(Spacer(1, 0.3*inch))
+        
+        # Medical Recommendations
+        elements.append(Paragraph("Medical Recommendations:", styles['Heading2']))
+        for rec in recommendations:
+            elements.append(Paragraph(f"• {rec}", styles['BodyText']))
+            elements.append(Spacer(1, 0.1*inch))
+        
+        # Disclaimer
+        disclaimer = """<font color=red><i>Note: This automated report is not a substitute for professional medical advice. 
+                    Always consult a qualified healthcare provider for diagnosis and treatment.</i></font>"""
+        elements.append(Paragraph(disclaimer, styles['Italic']))
+        
+        doc.build(elements)
+        return desktop_path
+
+    def _show_pdf_report(self, desktop_path):
+        # Open PDF in default browser
+        webbrowser.open_new_tab(f"file://{desktop_path}")
+        
+        # Show success message with CTkMessagebox
+        CTkMessagebox(
+            title="Success",
+            message=f"PDF report saved and opened:\n{desktop_path}",
+            icon="info"
+        )
+
+    def _show_pdf_error(self, error):
+        CTkMessagebox(
+            title="Error",
+            message=f"Failed to generate PDF: {str(error)}",
+            icon="cancel"
+        )
             
     def generate_csv_report(self):
         try:
@@ -1037,64 +1444,81 @@ class DiabetesPredictorApp:
             start_str = start.strftime('%Y-%m-%d')
             end_str = end.strftime('%Y-%m-%d')
             
-            # Query database
-            cursor = self.conn.cursor()
-            cursor.execute('''SELECT 
-                        id, gender, age, hypertension, heart_disease, smoking_history,
-                        bmi, HbA1c_level, blood_glucose_level, prediction_result
-                        FROM predictions 
-                        WHERE date(timestamp) BETWEEN ? AND ?''', 
-                        (start_str, end_str))
-            data = cursor.fetchall()
-            
-            if not data:
-                self.report_status.configure(
-                    text="No records found in selected period",
-                    text_color="red"
-                )
-                return
-                
-            # CSV headers
-            columns = ['ID', 'Gender', 'Age', 'Hypertension', 'Heart Disease',
-                    'Smoking History', 'BMI', 'HbA1c Level', 'Blood Glucose Level',
-                    'Prediction Result']
-            
             # Generate filename with dates
-            filename = f"diabetes_report_{start_str}_to_{end_str}.csv"
+            extension = REPORT_FORMATS[self.report_format.get()]
+            dimension = REPORT_MODES[self.report_mode.get()]
+            prefix = {None: "diabetes_report", 'highest_risk': "diabetes_highest_risk"}.get(
+                dimension, f"diabetes_summary_{dimension}")
+            filename = f"{prefix}_{start_str}_to_{end_str}{extension}"
             file_path = os.path.join(os.path.expanduser('~'), 'Desktop', filename)
             
-            # Write to CSV
-            with open(file_path, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(columns)
-                writer.writerows(data)
-            
-            # Show success messages
-            self.report_status.configure(
-                text=f"Report saved to: {file_path}",
-                text_color="#120f40"
-            )
-            webbrowser.open(file_path)
-            
-            CTkMessagebox(
-                title="Success",
-                message=f"CSV report generated successfully:\n{file_path}",
-                icon="info"
+            self.report_status.configure(text="Exporting...", text_color="#120f40")
+            self.executor.submit(
+                "report",
+                self._export_report,
+                start, end, file_path, dimension,
+                on_progress=lambda message, fraction: self.report_status.configure(text=message, text_color="#120f40"),
+                on_done=lambda rows: self._show_report_result(file_path, rows),
+                on_error=self._show_report_error
             )
             
         except Exception as e:
-            CTkMessagebox(
-                title="Error",
-                message=f"Failed to generate report: {str(e)}",
-                icon="cancel"
+            self._show_report_error(e)
+
+    def _export_report(self, task, start, end, file_path, dimension):
+        """Background job: write the report for the selected mode"""
+        # Include predictions still in the write queue; after a large
+        # scoring run draining it can take a while
+        task.report("Saving pending predictions...")
+        self.store.flush()
+        task.report("Exporting...")
+        if dimension is None:
+            return self.store.export_range(
+                start, end, file_path,
+                progress_callback=lambda rows: task.report(f"Exported {rows:,} rows..."),
+                cancel_event=task.cancel_event
+            )
+        if dimension == 'highest_risk':
+            return self.store.export_highest_risk(start, end, file_path)
+        return self.store.export_summary(start, end, file_path, dimension)
+
+    def _show_report_result(self, file_path, rows):
+        if rows == 0:
+            self.report_status.configure(
+                text="No records found in selected period",
+                text_color="red"
             )
+            return
+        
+        # Show success messages
+        self.report_status.configure(
+            text=f"{rows:,} rows saved to: {file_path}",
+            text_color="#120f40"
+        )
+        if file_path.endswith('.csv'):
+            webbrowser.open(file_path)
+        
+        CTkMessagebox(
+            title="Success",
+            message=f"Report generated successfully ({rows:,} rows):\n{file_path}",
+            icon="info"
+        )
+
+    def _show_report_error(self, error):
+        self.report_status.configure(text="")
+        CTkMessagebox(
+            title="Error",
+            message=f"Failed to generate report: {str(error)}",
+            icon="cancel"
+        )
 
 if __name__ == "__main__":
     try:
         ctk.set_appearance_mode("System")
         ctk.set_default_color_theme("blue")
         root = ctk.CTk()
-        app = DiabetesPredictorApp(root)
+        # --startup-report prints time-to-first-frame and deferred import times
+        app = DiabetesPredictorApp(root, startup_report='--startup-report' in sys.argv)
         root.mainloop()
     except Exception as e:
         print(f"Application error: {str(e)}")
@@ -0,0 +1,278 @@
+"""Benchmarks for the GlucoScholar scoring paths.
+
+Usage:
+    python benchmark_GlucoScholar.py [benchmark ...]
+
+Run with no arguments to execute every benchmark.
+"""
+
+import os
+import sys
+import time
+import difflib
+import threading
+import subprocess
+import numpy as np
+import pandas as pd
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from GlucoScholar import (randomForest, LOCAL_DATASET_PATH, ImageProcessor, ImagePreprocessor, InformationFetcher,
+                          BASE_DIR, CohortDashboard, ploting_charts)
+
+def _time_call(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def benchmark_bulk_prediction(rows=2000):
+    """Compares the vectorized bulkPrediction against the old per-row loop."""
+    radFor = randomForest()
+
+    def per_row_loop(csv_link, limit):
+        # The original implementation: one predict call per patient
+        df = pd.read_csv(csv_link, nrows=limit)
+        df['gender'] = radFor.gender_encoder.transform(df['gender'])
+        df['smoking_history'] = radFor.smoking_history_encoder.transform(df['smoking_history'])
+        df = df[radFor.feature_columns]
+        predictions = []
+        for index in df.index:
+            row_data = df.loc[[index]].values.tolist()
+            predictions.extend(radFor.predict(row_data))
+        return predictions
+
+    loop_result, loop_time = _time_call(per_row_loop, LOCAL_DATASET_PATH, rows)
+    bulk_result, bulk_time = _time_call(radFor.bulkPrediction, LOCAL_DATASET_PATH, rows)
+    (_, _), proba_time = _time_call(radFor.bulkPrediction, LOCAL_DATASET_PATH, rows, return_proba=True)
+    full_result, full_time = _time_call(radFor.bulkPrediction, LOCAL_DATASET_PATH)
+
+    assert np.array_equal(np.asarray(loop_result), bulk_result), "Vectorized results differ from per-row loop"
+
+    print(f"bulkPrediction ({rows} rows)")
+    print(f"  per-row loop:      {loop_time:8.3f} s  ({rows / loop_time:10.0f} rows/s)")
+    print(f"  vectorized:        {bulk_time:8.3f} s  ({rows / bulk_time:10.0f} rows/s)  x{loop_time / bulk_time:.0f}")
+    print(f"  vectorized+proba:  {proba_time:8.3f} s  ({rows / proba_time:10.0f} rows/s)")
+    print(f"  full dataset:      {full_time:8.3f} s  ({len(full_result) / full_time:10.0f} rows/s, {len(full_result)} rows)")
+
+def _latency_percentiles(func, batches):
+    timings = []
+    for batch in batches:
+        start = time.perf_counter()
+        func(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+def benchmark_flat_forest(repeats=500, batch_sizes=(1, 8, 64)):
+    """p50/p99 latency of the FlatForest backend against model.predict."""
+    radFor = randomForest()
+    radFor.model.set_params(n_jobs=1)
+    X = radFor.encode_features(pd.read_csv(LOCAL_DATASET_PATH, nrows=10000))
+    flat = radFor.flat_forest
+
+    assert np.array_equal(flat.predict_proba(X), radFor.model.predict_proba(X)), "FlatForest results differ"
+
+    rng = np.random.default_rng(42)
+    print(f"FlatForest vs model.predict ({flat.n_trees} trees, depth {flat.max_depth}, {repeats} calls)")
+    print(f"  {'rows':>5} {'sklearn p50':>12} {'sklearn p99':>12} {'flat p50':>10} {'flat p99':>10}")
+    for size in batch_sizes:
+        batches = [X[rng.integers(0, len(X), size)] for _ in range(repeats)]
+        sk50, sk99 = _latency_percentiles(radFor.model.predict, batches)
+        fl50, fl99 = _latency_percentiles(flat.predict, batches)
+        print(f"  {size:>5} {sk50:>10.3f}ms {sk99:>10.3f}ms {fl50:>8.3f}ms {fl99:>8.3f}ms")
+
+def _char_accuracy(text, reference):
+    # Whitespace layout differs between runs, so only the characters are compared
+    text, reference = ' '.join(text.split()), ' '.join(reference.split())
+    return difflib.SequenceMatcher(None, text, reference, autojunk=False).ratio()
+
+def benchmark_ocr_preprocessing(image_dir=os.path.join(BASE_DIR, 'data', 'images')):
+    """Time per image and character accuracy of OCR with and without preprocessing.
+
+    Accuracy is measured against a reference transcript next to each image
+    (``Image-1.jpg`` -> ``Image-1.txt``, printed text only, one table row per
+    line); images without one report n/a. The mean accuracies decide whether
+    ImageProcessor should preprocess by default.
+    """
+    raw = ImageProcessor(cache_path=None)
+    processed = ImageProcessor(cache_path=None, preprocessor=ImagePreprocessor())
+    images = raw.list_images(image_dir)
+
+    print(f"OCR preprocessing ({len(images)} images in {image_dir})")
+    print(f"  {'image':<20} {'raw s':>8} {'prep s':>8} {'raw acc':>8} {'prep acc':>9}")
+    totals = [0.0, 0.0]
+    scored = []
+    for path in images:
+        raw_text, raw_time = _time_call(raw.extract_text, path)
+        prep_text, prep_time = _time_call(processed.extract_text, path)
+        totals[0] += raw_time
+        totals[1] += prep_time
+
+        reference = None
+        truth_path = os.path.splitext(path)[0] + '.txt'
+        if os.path.exists(truth_path):
+            with open(truth_path, encoding='utf-8') as f:
+                reference = f.read()
+        accuracy = [_char_accuracy(text, reference) if reference is not None else None
+                    for text in (raw_text, prep_text)]
+        if reference is not None:
+            scored.append(accuracy)
+        raw_acc, prep_acc = (f"{a:.3f}" if a is not None else "n/a" for a in accuracy)
+        print(f"  {os.path.basename(path):<20} {raw_time:>8.3f} {prep_time:>8.3f} {raw_acc:>8} {prep_acc:>9}")
+
+    if images:
+        print(f"  mean time per image: raw {totals[0] / len(images):.3f} s, "
+              f"preprocessed {totals[1] / len(images):.3f} s")
+    if scored:
+        raw_mean, prep_mean = np.mean(scored, axis=0)
+        print(f"  mean accuracy over {len(scored)} transcribed images: raw {raw_mean:.3f}, "
+              f"preprocessed {prep_mean:.3f}")
+
+class _StandInPageHandler(BaseHTTPRequestHandler):
+    # Serves /page?n=<i>&delay=<seconds> as a small medical article
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        n = params.get('n', ['0'])[0]
+        time.sleep(float(params.get('delay', ['0'])[0]))
+        body = (f"<html><head><title>Stand-in page {n}</title>"
+                f"<meta name='description' content='Summary of stand-in page {n} about blood glucose.'>"
+                f"</head><body><p>{'Glucose text. ' * 200}</p></body></html>").encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def benchmark_link_fetching(delays=(0.2, 0.4, 0.6, 0.8, 1.0)):
+    """Sequential page downloads against the concurrent fetch_summaries.
+
+    Pages come from a local stand-in server reached through a different
+    loopback address each, so they count as separate hosts for the per-host
+    rate limits.
+    """
+    server = ThreadingHTTPServer(('', 0), _StandInPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    urls = [f"http://127.0.0.{i + 1}:{port}/page?n={i}&delay={delay}" for i, delay in enumerate(delays)]
+
+    fetcher = InformationFetcher(cache_path=None)
+    try:
+        def sequential():
+            return [fetcher.summarize_html(fetcher.session.get(url, timeout=10).text) for url in urls]
+
+        seq_result, seq_time = _time_call(sequential)
+        pages, async_time = _time_call(fetcher.fetch_summaries, urls)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [(p['title'], p['summary']) for p in pages] == seq_result, "Concurrent summaries differ"
+    assert not any(p['error'] for p in pages), [p['error'] for p in pages]
+
+    print(f"Link fetching ({len(urls)} pages, delays {', '.join(map(str, delays))} s)")
+    print(f"  sum of delays:   {sum(delays):6.2f} s")
+    print(f"  slowest page:    {max(delays):6.2f} s")
+    print(f"  sequential:      {seq_time:6.2f} s")
+    print(f"  fetch_summaries: {async_time:6.2f} s  x{seq_time / async_time:.1f}")
+
+def benchmark_term_matching(texts=5000, urls=20000):
+    """Batch throughput of MedicalTermMatcher and the trusted-domain check."""
+    rng = np.random.default_rng(42)
+    fetcher = InformationFetcher(cache_path=None)
+    lines = ["Patient name: J. Doe   Age: 54   Gender: Female",
+             "Fasting Plasma Glucose (FPG): 131 mg/dL", "HbA1c: 7.2 %", "OGTT 2 hour: 212 mg/dL",
+             "Blood pressure 142/91 mmHg", "Current medication: Metformin 500mg, sitagliptin",
+             "Lipid panel within normal limits", "Creatinine 0.9 mg/dL  eGFR 88",
+             "Impression: findings consistent with type 2 diabetes", "Follow-up in three months"]
+    documents = ["\n".join(rng.choice(lines, 12)) for _ in range(texts)]
+    hosts = ["www.diabetes.org", "pubmed.ncbi.nlm.nih.gov", "www.example.com", "notdiabetes.org",
+             "www.google.com", "medlineplus.gov", "blog.example.net", "www.cdc.gov"]
+    links = [f"https://{rng.choice(hosts)}/page/{i}?ref=search" for i in range(urls)]
+
+    def substring_terms(text):
+        # The original keyword scan
+        text_lower = text.lower()
+        return [term for term in ['diabetes', 'glucose', 'hba1c', 'blood sugar', 'insulin', 'hyperglycemia']
+                if term in text_lower]
+
+    _, scan_time = _time_call(lambda: [substring_terms(text) for text in documents])
+    _, extract_time = _time_call(fetcher.term_matcher.extract_batch, documents)
+    _, url_time = _time_call(fetcher.filter_valid_urls, links)
+
+    print(f"Term matching ({texts} texts, {len(fetcher.term_matcher.canonical)} spellings; {urls} URLs)")
+    print(f"  substring scan (6 terms):  {texts / scan_time:10.0f} texts/s")
+    print(f"  MedicalTermMatcher:        {texts / extract_time:10.0f} texts/s")
+    print(f"  is_valid_url:              {urls / url_time:10.0f} urls/s")
+
+def benchmark_dashboard(sizes=(100, 100000, 1000000), chunk_size=50000):
+    """Aggregation and rendering time of CohortDashboard by cohort size.
+
+    Cohorts are resampled from the bundled dataset; predictions come from
+    the model on the dataset once and are resampled along with the rows.
+    """
+    radFor = randomForest()
+    source = pd.read_csv(LOCAL_DATASET_PATH)
+    predictions, probabilities = radFor.predictMatrix(radFor.encode_features(source), return_proba=True)
+    rng = np.random.default_rng(42)
+    charts = ploting_charts()
+
+    print(f"Cohort dashboard (chunks of {chunk_size} rows)")
+    print(f"  {'rows':>9} {'aggregate s':>12} {'rows/s':>12} {'render png s':>13}")
+    for size in sizes:
+        index = rng.integers(0, len(source), size)
+        cohort = source.iloc[index].reset_index(drop=True)
+        cohort_predictions, cohort_probabilities = predictions[index], probabilities[index]
+
+        def aggregate():
+            dashboard = CohortDashboard()
+            for start in range(0, size, chunk_size):
+                stop = start + chunk_size
+                dashboard.update(cohort.iloc[start:stop], cohort_predictions[start:stop],
+                                 cohort_probabilities[start:stop])
+            return dashboard
+
+        dashboard, aggregate_time = _time_call(aggregate)
+        _, render_time = _time_call(charts.dashboard, dashboard, fmt='png')
+        print(f"  {size:>9} {aggregate_time:>12.3f} {size / aggregate_time:>12.0f} {render_time:>13.3f}")
+
+def benchmark_startup(modules=('GlucoScholar', 'GlucoScholar_UI'), top=8):
+    """Import cost of the app modules in a fresh interpreter (-X importtime).
+
+    Time to first frame itself needs a display; run the app with
+    --startup-report to print it.
+    """
+    for module in modules:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=BASE_DIR, capture_output=True, text=True, check=True)
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            depth = (len(name) - len(name.lstrip())) // 2
+            timings.append((int(cumulative) / 1e6, depth, name.strip()))
+        total = next(seconds for seconds, _, name in reversed(timings) if name == module)
+        print(f"import {module}: {total:.3f} s")
+        # Largest imports directly below the module itself
+        direct = sorted((t for t in timings if t[1] == 1 and t[2] != module), reverse=True)[:top]
+        for seconds, _, name in direct:
+            print(f"  {name:<30} {seconds:7.3f} s")
+
+BENCHMARKS = {
+    'bulk_prediction': benchmark_bulk_prediction,
+    'flat_forest': benchmark_flat_forest,
+    'ocr_preprocessing': benchmark_ocr_preprocessing,
+    'link_fetching': benchmark_link_fetching,
+    'term_matching': benchmark_term_matching,
+    'dashboard': benchmark_dashboard,
+    'startup': benchmark_startup,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(2)
+        BENCHMARKS[name]()
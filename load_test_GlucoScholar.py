@@ -0,0 +1,134 @@
+"""Load test for the GlucoScholar prediction service.
+
+Usage:
+    python load_test_GlucoScholar.py [--url http://127.0.0.1:8765] [--clients 32] [--requests 5000]
+                                     [--records 1] [--spawn] [--max-batch 64] [--max-wait-ms 5]
+
+Opens `--clients` keep-alive connections that each send POST /predict
+requests back to back with patients sampled from the bundled dataset,
+then reports throughput and latency percentiles together with the
+server's micro-batch counters. With `--spawn` a server is started on a
+free local port (logging to a temporary database) and stopped afterwards,
+so batching settings can be compared directly, e.g. `--max-batch 1`
+against the default.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from urllib.parse import urlparse
+from GlucoScholar import LOCAL_DATASET_PATH, FEATURE_COLUMNS, BASE_DIR
+
+def load_patients(count=1000):
+    df = pd.read_csv(LOCAL_DATASET_PATH, nrows=count)[FEATURE_COLUMNS]
+    return json.loads(df.to_json(orient='records'))
+
+async def _request(reader, writer, host, method, path, body=b''):
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length = next(int(line.split(':', 1)[1]) for line in lines[1:] if line.lower().startswith('content-length:'))
+    return status, json.loads(await reader.readexactly(length))
+
+async def _client(host, port, bodies, latencies, failures, remaining):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        index = 0
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            body = bodies[index % len(bodies)]
+            index += 1
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, host, 'POST', '/predict', body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures.append(status)
+    finally:
+        writer.close()
+
+async def run_load(host, port, clients, requests, records):
+    patients = load_patients()
+    rng = np.random.default_rng(0)
+    bodies = []
+    for _ in range(256):
+        picks = [patients[i] for i in rng.integers(0, len(patients), records)]
+        bodies.append(json.dumps(picks if records > 1 else picks[0]).encode())
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, before = await _request(reader, writer, host, 'GET', '/stats')
+
+    latencies, failures, remaining = [], [], [requests]
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, bodies, latencies, failures, remaining) for _ in range(clients)))
+    seconds = time.perf_counter() - start
+
+    _, after = await _request(reader, writer, host, 'GET', '/stats')
+    writer.close()
+
+    latencies_ms = np.array(latencies) * 1000
+    batches = after['batches'] - before['batches']
+    rows = after['rows'] - before['rows']
+    print(f"{len(latencies)} requests ({len(latencies) * records} patients) from {clients} clients "
+          f"in {seconds:.2f} s, {len(failures)} failed")
+    print(f"Throughput: {len(latencies) / seconds:,.0f} requests/s, {len(latencies) * records / seconds:,.0f} patients/s")
+    print("Latency ms: " + "  ".join(f"p{p}={np.percentile(latencies_ms, p):.2f}" for p in (50, 90, 99))
+          + f"  max={latencies_ms.max():.2f}")
+    print(f"Server: {batches} batches, {rows / batches if batches else 0:.1f} rows per batch on average "
+          f"(max batch {after['max_batch']}, max wait {after['max_wait_ms']:g} ms)")
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def spawn_server(port, max_batch, max_wait_ms, db_path, backend):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BASE_DIR, 'GlucoScholar_Server.py'), '--port', str(port),
+         '--max-batch', str(max_batch), '--max-wait-ms', str(max_wait_ms), '--db', db_path,
+         '--backend', backend],
+        stdout=subprocess.PIPE, text=True)
+    line = server.stdout.readline()  # printed once the server is listening
+    if not line.startswith('Serving'):
+        server.kill()
+        raise RuntimeError("Prediction server failed to start")
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the GlucoScholar prediction service")
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help="server to test (ignored with --spawn)")
+    parser.add_argument('--clients', type=int, default=32, help="concurrent connections")
+    parser.add_argument('--requests', type=int, default=5000, help="total requests")
+    parser.add_argument('--records', type=int, default=1, help="patients per request")
+    parser.add_argument('--spawn', action='store_true', help="start a local server for the test")
+    parser.add_argument('--max-batch', type=int, default=64, help="batch size of the spawned server")
+    parser.add_argument('--max-wait-ms', type=float, default=5, help="batch wait of the spawned server")
+    parser.add_argument('--backend', choices=['sklearn', 'flat'], default='flat', help="spawned server backend")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        port = _free_port()
+        db_dir = tempfile.mkdtemp()
+        server = spawn_server(port, args.max_batch, args.max_wait_ms, os.path.join(db_dir, 'load_test.db'),
+                              args.backend)
+        host = '127.0.0.1'
+    else:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    try:
+        asyncio.run(run_load(host, port, args.clients, args.requests, args.records))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
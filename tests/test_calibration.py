@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from GlucoScholar import (ProbabilityCalibrator, randomForest, risk_tier, risk_tier_codes,
+                          DIABETIC_THRESHOLD, RISK_TIER_BOUNDS, RISK_TIER_LABELS)
+
+@pytest.fixture(scope='module')
+def scores():
+    # Raw scores that overstate the risk: the true rate is p ** 2
+    rng = np.random.default_rng(0)
+    probabilities = rng.uniform(size=20000)
+    return probabilities, (rng.uniform(size=len(probabilities)) < probabilities ** 2).astype(int)
+
+@pytest.mark.parametrize('method', ['isotonic', 'sigmoid'])
+def test_calibrated_probabilities_are_monotonic_and_bounded(scores, method):
+    calibrator = ProbabilityCalibrator(method).fit(*scores)
+    calibrated = calibrator.transform(np.linspace(-0.5, 1.5, 201))
+    assert np.all(np.diff(calibrated) >= 0)
+    assert calibrated.min() >= 0 and calibrated.max() <= 1
+
+@pytest.mark.parametrize('method', ['isotonic', 'sigmoid'])
+def test_calibration_lowers_the_error(scores, method):
+    probabilities, y = scores
+    calibrated = ProbabilityCalibrator(method).fit(probabilities, y).transform(probabilities)
+    assert np.mean((calibrated - y) ** 2) < np.mean((probabilities - y) ** 2)
+
+def test_isotonic_matches_observed_rate(scores):
+    calibrator = ProbabilityCalibrator('isotonic').fit(*scores)
+    assert calibrator.transform(0.5) == pytest.approx(0.25, abs=0.05)
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        ProbabilityCalibrator('beta')
+
+def test_risk_tier_boundaries():
+    # Each bound opens the next tier
+    probabilities = [0.0, 0.0499, 0.05, 0.1999, 0.2, 0.4999, 0.5, 1.0]
+    np.testing.assert_array_equal(risk_tier_codes(probabilities), [0, 0, 1, 1, 2, 2, 3, 3])
+    assert [risk_tier(p) for p in (0.01, 0.1, 0.3, 0.9)] == RISK_TIER_LABELS
+
+def test_diabetic_label_matches_very_high_tier():
+    radFor = SimpleNamespace(model=SimpleNamespace(classes_=np.array([0, 1])))
+    probabilities = np.linspace(0, 1, 1001)
+    labels = randomForest.label(radFor, probabilities)
+    assert RISK_TIER_BOUNDS[-1] == DIABETIC_THRESHOLD
+    np.testing.assert_array_equal(labels == 1, risk_tier_codes(probabilities) == len(RISK_TIER_LABELS) - 1)
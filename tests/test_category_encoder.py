@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from GlucoScholar import CategoryEncoder
+
+CLASSES = ['Female', 'Male', 'Other']
+
+def test_exact_and_case_insensitive_codes():
+    encoder = CategoryEncoder(CLASSES)
+    assert encoder.code('Male') == 1
+    assert encoder.code(' male ') == 1
+    assert encoder.match('FEMALE') == 'Female'
+    assert encoder.code('unknown') is None
+
+def test_encode_reports_normalized_values():
+    codes, report = CategoryEncoder(CLASSES).encode(pd.Series(['Male', 'female', 'Female', 'OTHER']))
+    np.testing.assert_array_equal(codes, [1, 0, 0, 2])
+    assert report == {'normalized': 2, 'unknown': 0, 'unknown_labels': []}
+
+def test_unknown_labels_raise_by_default():
+    with pytest.raises(ValueError, match="unseen"):
+        CategoryEncoder(CLASSES).encode(['Male', 'robot'])
+
+def test_unknown_and_missing_map_to_first_class():
+    values = pd.Series(['robot', 'Male', None, 'robot'])
+    codes, report = CategoryEncoder(CLASSES).encode(values, handle_unknown='default')
+    np.testing.assert_array_equal(codes, [0, 1, 0, 0])
+    assert report['unknown'] == 3
+    assert report['unknown_labels'] == ['robot', None]
+
+def test_matches_label_encoder_on_known_labels():
+    from sklearn.preprocessing import LabelEncoder
+    values = np.array(['never', 'current', 'No Info', 'former', 'never'])
+    expected = LabelEncoder().fit_transform(values)
+    np.testing.assert_array_equal(CategoryEncoder().fit_transform(values), expected)
+
+def test_setting_classes_rebuilds_lookup():
+    encoder = CategoryEncoder(CLASSES)
+    encoder.classes_ = np.array(['a', 'b'])
+    assert encoder.code('B') == 1
+    assert encoder.code('Male') is None
+
+def test_rejects_unknown_option():
+    with pytest.raises(ValueError):
+        CategoryEncoder(CLASSES).encode(['Male'], handle_unknown='ignore')
+
+def test_vectorized_encode_matches_per_value_code():
+    encoder = CategoryEncoder(['No Info', 'current', 'former', 'never'])
+    rng = np.random.default_rng(0)
+    pool = np.array(['never', 'NEVER', ' former', 'Current ', 'No Info', 'no info', 'pipe', ''], dtype=object)
+    values = pd.Series(pool[rng.integers(len(pool), size=5000)])
+    codes, report = encoder.encode(values, handle_unknown='default')
+    expected = [encoder.code(value) for value in values]
+    np.testing.assert_array_equal(codes, [0 if code is None else code for code in expected])
+    assert report['unknown'] == sum(code is None for code in expected)
+    assert sorted(report['unknown_labels']) == ['', 'pipe']
+
+def test_encode_features_accumulates_remap_counts():
+    from types import SimpleNamespace
+    from GlucoScholar import randomForest, FEATURE_COLUMNS
+    radFor = SimpleNamespace(category_encoders={'gender': CategoryEncoder(CLASSES),
+                                                'smoking_history': CategoryEncoder(['current', 'never'])},
+                             feature_columns=FEATURE_COLUMNS)
+    frame = pd.DataFrame({'gender': ['male', 'Female'], 'age': [40, 50], 'hypertension': [0, 1],
+                          'heart_disease': [0, 0], 'smoking_history': ['never', 'pipe'], 'bmi': [25, 30],
+                          'HbA1c_level': [6.0, 5.5], 'blood_glucose_level': [120, 90]})
+    counts = randomForest.new_remap_counts(radFor)
+    for _ in range(2):
+        X = randomForest.encode_features(radFor, frame, 'default', counts)
+    assert X.dtype == np.float32 and X.flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(X[:, 0], [1, 0])
+    np.testing.assert_array_equal(X[:, 4], [1, 0])
+    assert counts['gender'] == {'normalized': 2, 'unknown': 0, 'unknown_labels': []}
+    assert counts['smoking_history'] == {'normalized': 0, 'unknown': 2, 'unknown_labels': ['pipe']}
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from GlucoScholar import DatasetValidator, validation_error
+
+VALID_ROW = {'gender': 'Female', 'age': 54.0, 'hypertension': 0, 'heart_disease': 0,
+             'smoking_history': 'never', 'bmi': 27.3, 'HbA1c_level': 6.6, 'blood_glucose_level': 140}
+
+def _frame(*changes):
+    return pd.DataFrame([{**VALID_ROW, **change} for change in changes])
+
+def test_valid_rows_pass():
+    frame, valid, rejected = DatasetValidator().check(_frame({}, {'age': 120, 'bmi': 10}))
+    assert valid.all()
+    assert rejected.empty and 'problems' in rejected.columns
+    assert frame['age'].dtype == np.float64
+
+def test_masks_and_counts_per_problem():
+    validator = DatasetValidator()
+    report = validator.new_report()
+    frame = _frame({},
+                   {'age': 'abc'},
+                   {'bmi': 51},
+                   {'hypertension': 2},
+                   {'gender': '  '},
+                   {'age': 0, 'blood_glucose_level': None})
+    frame['age'] = frame['age'].astype(object)
+    _, valid, rejected = validator.check(frame, report)
+
+    np.testing.assert_array_equal(valid, [True, False, False, False, False, False])
+    assert report['rows'] == 6 and report['invalid_rows'] == 5
+    columns = report['columns']
+    assert columns['age'] == {'missing': 0, 'non_numeric': 1, 'out_of_range': 1}
+    assert columns['bmi']['out_of_range'] == 1
+    assert columns['hypertension']['out_of_range'] == 1
+    assert columns['gender']['missing'] == 1
+    assert columns['blood_glucose_level']['missing'] == 1
+    assert list(rejected['problems']) == [
+        'age non numeric',
+        'bmi out of range',
+        'hypertension out of range',
+        'gender missing',
+        'age out of range; blood_glucose_level missing',
+    ]
+    # Rejected rows keep the values as read
+    assert rejected['age'].iloc[0] == 'abc'
+
+def test_validate_file_writes_quarantine(tmp_path):
+    source = tmp_path / 'patients.csv'
+    _frame({}, {'bmi': 80}, {}).to_csv(source, index=False)
+    quarantine = tmp_path / 'rejected.csv'
+    report = DatasetValidator().validate_file(str(source), str(quarantine), chunk_size=2)
+
+    assert report['rows'] == 3 and report['invalid_rows'] == 1
+    assert report['quarantine_path'] == str(quarantine)
+    rejected = pd.read_csv(quarantine)
+    assert len(rejected) == 1 and rejected['problems'][0] == 'bmi out of range'
+
+def test_validate_file_without_problems_creates_no_quarantine(tmp_path):
+    source = tmp_path / 'patients.csv'
+    _frame({}, {}).to_csv(source, index=False)
+    quarantine = tmp_path / 'rejected.csv'
+    report = DatasetValidator().validate_file(str(source), str(quarantine))
+    assert report['quarantine_path'] is None
+    assert not quarantine.exists()
+
+def test_merge_reports():
+    validator = DatasetValidator()
+    total = validator.new_report()
+    for frame in (_frame({'bmi': 5}), _frame({}, {'bmi': 60})):
+        report = validator.new_report()
+        validator.check(frame, report)
+        DatasetValidator.merge_reports(total, report)
+    assert total['rows'] == 3 and total['invalid_rows'] == 2
+    assert total['columns']['bmi']['out_of_range'] == 2
+
+def test_validation_error_messages():
+    assert validation_error('bmi', 27) is None
+    assert validation_error('bmi', 60) == "BMI must be 10-50"
+    assert validation_error('age', 0) == "Age must be 0-120 years"
+    assert validation_error('age', 'x') == "Numbers only"
+    assert validation_error('hypertension', '1.0') is None
+    assert validation_error('hypertension', 2) == "Enter: 0 or 1"
+    assert validation_error('gender', ' ') == "Gender is required"
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from GlucoScholar import FlatForest
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 8)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=25, max_depth=12, random_state=0, n_jobs=1).fit(X, y)
+    return model, rng.normal(size=(500, 8)).astype(np.float32)
+
+def test_probabilities_match_sklearn(forest):
+    model, X = forest
+    np.testing.assert_array_equal(FlatForest(model).predict_proba(X), model.predict_proba(X))
+
+def test_predictions_match_sklearn(forest):
+    model, X = forest
+    np.testing.assert_array_equal(FlatForest(model).predict(X), model.predict(X))
+
+def test_single_row(forest):
+    model, X = forest
+    np.testing.assert_array_equal(FlatForest(model).predict_proba(X[0]), model.predict_proba(X[:1]))
+
+def test_leaf_indices_match_apply(forest):
+    model, X = forest
+    flat = FlatForest(model)
+    np.testing.assert_array_equal(flat.apply(X) - flat.roots, model.apply(X))
+
+def test_rejects_nan(forest):
+    model, X = forest
+    X = X.copy()
+    X[0, 0] = np.nan
+    with pytest.raises(ValueError):
+        FlatForest(model).predict(X)
+
+def test_rows_on_split_thresholds_match_sklearn(forest):
+    model, X = forest
+    # Rows whose features sit exactly on (float32-rounded) split thresholds
+    thresholds = np.concatenate([estimator.tree_.threshold[estimator.tree_.feature >= 0]
+                                 for estimator in model.estimators_]).astype(np.float32)
+    X = np.resize(thresholds, (len(thresholds) // 8, 8))
+    np.testing.assert_array_equal(FlatForest(model).predict_proba(X), model.predict_proba(X))
+
+def test_unpruned_multiclass_forest_with_string_labels():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(1500, 5)).astype(np.float32)
+    y = np.take(['High', 'Low', 'Medium'], np.digitize(X[:, 0] + rng.normal(scale=0.3, size=len(X)), [-0.5, 0.5]))
+    # No max_depth: trees of very different depths share one set of arrays
+    model = RandomForestClassifier(n_estimators=10, min_samples_leaf=1, random_state=1, n_jobs=1).fit(X, y)
+    flat = FlatForest(model)
+    X_new = rng.normal(size=(300, 5)).astype(np.float32)
+    np.testing.assert_array_equal(flat.predict_proba(X_new), model.predict_proba(X_new))
+    np.testing.assert_array_equal(flat.predict(X_new), model.predict(X_new))
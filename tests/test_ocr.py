@@ -0,0 +1,16 @@
+from GlucoScholar import ImageProcessor, ImagePreprocessor
+
+def test_cache_key_follows_preprocessing_switch(tmp_path):
+    image = tmp_path / 'report.png'
+    image.write_bytes(b'not really a png')
+    processor = ImageProcessor(cache_path=None)
+    plain = processor.cache_key(str(image))
+
+    processor.preprocessor = ImagePreprocessor()
+    cleaned = processor.cache_key(str(image))
+    assert cleaned != plain
+    processor.preprocessor = ImagePreprocessor(deskew=False)
+    assert processor.cache_key(str(image)) not in (plain, cleaned)
+
+    processor.preprocessor = None
+    assert processor.cache_key(str(image)) == plain
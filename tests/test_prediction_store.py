@@ -0,0 +1,203 @@
+import sqlite3
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+import GlucoScholar
+from GlucoScholar import PredictionStore, PREDICTION_MIGRATIONS
+
+PATIENTS = pd.DataFrame({
+    'gender': ['Female', 'Male', 'Female', None],
+    'age': [54.0, 61.0, 33.0, 47.0],
+    'hypertension': [0, 1, 0, 0],
+    'heart_disease': [0, 0, 1, 0],
+    'smoking_history': ['never', 'current', 'never', 'former'],
+    'bmi': [27.3, 31.0, 22.1, 25.0],
+    'HbA1c_level': [6.6, 7.1, 5.0, np.nan],
+    'blood_glucose_level': [140, 200, 90, 120],
+})
+PREDICTIONS = np.array([1, 1, 0, 0])
+
+def _version(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _columns(path):
+    with sqlite3.connect(path) as conn:
+        return [row[1] for row in conn.execute("PRAGMA table_info(predictions)")]
+
+def _rollup(store):
+    return store.conn.execute('''SELECT dimension, day, value, total, diabetic,
+                                        round(sum_hba1c, 6), round(sum_glucose, 6)
+                                 FROM daily_rollup ORDER BY 1, 2, 3''').fetchall()
+
+def test_new_database_is_fully_migrated(tmp_path):
+    path = str(tmp_path / 'new.db')
+    PredictionStore(path).close()
+    assert _version(path) == len(PREDICTION_MIGRATIONS)
+    assert {'run_id', 'risk_score'} <= set(_columns(path))
+
+def test_legacy_database_keeps_rows_and_backfills_rollups(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    with sqlite3.connect(path) as conn:
+        for statement in PREDICTION_MIGRATIONS[0]:
+            conn.execute(statement)
+        conn.execute('''INSERT INTO predictions (gender, age, hypertension, heart_disease, smoking_history, bmi,
+                            HbA1c_level, blood_glucose_level, prediction_result, timestamp)
+                        VALUES ('Male', 40, 0, 0, 'never', 25, 6.0, 130, 'Diabetic', '2025-03-21T10:00:00')''')
+    store = PredictionStore(path)
+    try:
+        assert store.conn.execute("SELECT timestamp FROM predictions").fetchone()[0] == '2025-03-21 10:00:00'
+        assert ('all', '2025-03-21', 'all', 1, 1, 6.0, 130.0) in _rollup(store)
+    finally:
+        store.close()
+
+def test_failed_migration_is_rolled_back(tmp_path, monkeypatch):
+    path = str(tmp_path / 'failed.db')
+    broken = list(PREDICTION_MIGRATIONS)
+    # Migration 3 starts with ALTER TABLE, which sqlite3 would otherwise autocommit
+    broken[2] = broken[2] + ['SELECT * FROM no_such_table']
+    monkeypatch.setattr(GlucoScholar, 'PREDICTION_MIGRATIONS', broken)
+    with pytest.raises(sqlite3.OperationalError):
+        PredictionStore(path)
+    assert _version(path) == 2
+    assert 'run_id' not in _columns(path)
+
+    monkeypatch.setattr(GlucoScholar, 'PREDICTION_MIGRATIONS', PREDICTION_MIGRATIONS)
+    PredictionStore(path).close()
+    assert _version(path) == len(PREDICTION_MIGRATIONS)
+
+def test_bulk_rollups_match_single_saves(tmp_path):
+    results = np.where(PREDICTIONS == 1, 'Diabetic', 'Not Diabetic')
+    single = PredictionStore(str(tmp_path / 'single.db'))
+    bulk = PredictionStore(str(tmp_path / 'bulk.db'))
+    try:
+        for row, result in zip(PATIENTS.to_dict('records'), results):
+            single.save(row, result)
+        single.flush()
+        with bulk.bulk_writer(source='patients.csv') as writer:
+            writer.write(PATIENTS.iloc[:2], PREDICTIONS[:2])
+            writer.write(PATIENTS.iloc[2:], PREDICTIONS[2:])
+        assert _rollup(bulk) == _rollup(single)
+        assert bulk.conn.execute("SELECT COUNT(*) FROM predictions WHERE run_id IS NOT NULL").fetchone()[0] == 4
+    finally:
+        single.close()
+        bulk.close()
+
+def test_delete_updates_rollups(tmp_path):
+    store = PredictionStore(str(tmp_path / 'delete.db'))
+    try:
+        with store.bulk_writer() as writer:
+            writer.write(PATIENTS, PREDICTIONS)
+        with store.conn:
+            store.conn.execute("DELETE FROM predictions")
+        assert all(row[3] == 0 and row[4] == 0 for row in _rollup(store))
+    finally:
+        store.close()
+
+def _averages(store):
+    # Reference means straight from predictions; AVG() skips NULLs
+    return store.conn.execute('''SELECT substr(timestamp, 1, 10), COALESCE(gender, ''), COUNT(*),
+                                        SUM(prediction_result = 'Diabetic'),
+                                        AVG(HbA1c_level), AVG(blood_glucose_level)
+                                 FROM predictions GROUP BY 1, 2 ORDER BY 1, 2''').fetchall()
+
+def _summary(store, day):
+    summary = store.daily_summary(day, day, dimension='gender')
+    return [(d, value, total, diabetic, hba1c, glucose) for d, value, total, diabetic, _, hba1c, glucose in summary]
+
+def _today(store):
+    return date.fromisoformat(store.conn.execute("SELECT substr(MAX(timestamp), 1, 10) FROM predictions").fetchone()[0])
+
+def _assert_summary_matches(store):
+    expected = _averages(store)
+    actual = _summary(store, date.fromisoformat(expected[0][0]))
+    assert [row[:4] for row in actual] == [row[:4] for row in expected]
+    for got, want in zip(actual, expected):
+        for a, b in zip(got[4:], want[4:]):
+            assert (a is None and b is None) or a == pytest.approx(b)
+
+def test_summary_means_skip_missing_values(tmp_path):
+    patients = PATIENTS.copy()
+    # The only 'Male' row has no HbA1c: its mean must be None, not 0
+    patients.loc[1, 'HbA1c_level'] = np.nan
+    results = np.where(PREDICTIONS == 1, 'Diabetic', 'Not Diabetic')
+    single = PredictionStore(str(tmp_path / 'single.db'))
+    bulk = PredictionStore(str(tmp_path / 'bulk.db'))
+    try:
+        for row, result in zip(patients.to_dict('records'), results):
+            single.save(row, result)
+        single.flush()
+        with bulk.bulk_writer() as writer:
+            writer.write(patients, PREDICTIONS)
+        for store in (single, bulk):
+            _assert_summary_matches(store)
+            male = [row for row in _summary(store, _today(store)) if row[1] == 'Male']
+            assert male[0][4] is None
+    finally:
+        single.close()
+        bulk.close()
+
+def test_rollup_counts_are_rebuilt_by_migration(tmp_path, monkeypatch):
+    path = str(tmp_path / 'v6.db')
+    # A database at version 6, before the non-NULL counts existed
+    monkeypatch.setattr(GlucoScholar, 'PREDICTION_MIGRATIONS', PREDICTION_MIGRATIONS[:6])
+    store = PredictionStore(path)
+    for row, result in zip(PATIENTS.to_dict('records'), np.where(PREDICTIONS == 1, 'Diabetic', 'Not Diabetic')):
+        store.save(row, result)
+    store.close()
+    assert _version(path) == 6
+
+    monkeypatch.setattr(GlucoScholar, 'PREDICTION_MIGRATIONS', PREDICTION_MIGRATIONS)
+    store = PredictionStore(path)
+    try:
+        assert _version(path) == len(PREDICTION_MIGRATIONS)
+        _assert_summary_matches(store)
+        # The row without a gender is the only one in its group and has no HbA1c
+        hba1c = {value: mean for _, value, _, _, mean, _ in _summary(store, _today(store))}
+        assert hba1c[''] is None
+        with store.conn:
+            store.conn.execute("DELETE FROM predictions WHERE gender = 'Male'")
+        _assert_summary_matches(store)
+    finally:
+        store.close()
+
+def test_wal_and_write_behind_queue(tmp_path):
+    store = PredictionStore(str(tmp_path / 'wal.db'), batch_size=50)
+    try:
+        assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        row = PATIENTS.iloc[0].to_dict()
+        for i in range(500):
+            store.save(row, 'Diabetic' if i % 2 else 'Not Diabetic', risk_score=0.25)
+        store.flush()
+        assert store.conn.execute("SELECT COUNT(*), SUM(risk_score) FROM predictions").fetchone() == (500, 125.0)
+    finally:
+        store.close()
+
+def test_predictions_between_uses_timestamp_index(tmp_path):
+    from datetime import datetime
+    store = PredictionStore(str(tmp_path / 'range.db'))
+    try:
+        row = PATIENTS.iloc[0].to_dict()
+        for day in (19, 20, 21, 22):
+            store.save(row, 'Diabetic', timestamp=datetime(2025, 3, day, 23, 59, 59))
+        store.flush()
+        rows = store.predictions_between(date(2025, 3, 20), date(2025, 3, 21)).fetchall()
+        assert len(rows) == 2
+        plan = store.conn.execute('''EXPLAIN QUERY PLAN SELECT id FROM predictions
+                                     WHERE timestamp >= ? AND timestamp < ?''', ('a', 'b')).fetchall()
+        assert any('idx_predictions_timestamp' in step[-1] for step in plan)
+    finally:
+        store.close()
+
+def test_write_errors_reach_on_error(tmp_path):
+    errors = []
+    store = PredictionStore(str(tmp_path / 'error.db'), on_error=errors.append)
+    try:
+        with store.conn:
+            store.conn.execute("DROP TABLE predictions")
+        store.save(PATIENTS.iloc[0].to_dict(), 'Diabetic')
+        store.flush()
+        assert len(errors) == 1 and isinstance(errors[0], sqlite3.Error)
+    finally:
+        store.close()
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from GlucoScholar import CategoryEncoder, FEATURE_COLUMNS
+from GlucoScholar_Server import MicroBatcher, PredictionServer, RequestError
+
+PATIENT = {'gender': 'Female', 'age': 54, 'hypertension': 0, 'heart_disease': 1,
+           'smoking_history': 'never', 'bmi': 27.3, 'HbA1c_level': 6.6, 'blood_glucose_level': 140}
+
+@pytest.fixture
+def server():
+    # parse_record only needs the encoders and the feature order
+    radFor = SimpleNamespace(
+        category_encoders={'gender': CategoryEncoder(['Female', 'Male', 'Other']),
+                           'smoking_history': CategoryEncoder(['No Info', 'current', 'former', 'never'])},
+        feature_columns=FEATURE_COLUMNS,
+        scoreBatch=None)
+    return PredictionServer(radFor)
+
+def test_parse_record_encodes_categories(server):
+    input_data, row, warnings = server.parse_record({**PATIENT, 'gender': 'male', 'hypertension': '1'})
+    assert input_data['gender'] == 'Male' and input_data['hypertension'] == 1
+    assert row == [1, 54.0, 1, 1, 3, 27.3, 6.6, 140.0]
+    assert warnings == []
+
+def test_parse_record_warns_instead_of_rejecting(server):
+    input_data, _, warnings = server.parse_record({**PATIENT, 'bmi': 60, 'smoking_history': 'pipe'})
+    assert input_data['smoking_history'] == 'No Info'
+    assert warnings[0] == "BMI must be 10-50 (got 60)"
+    assert "Unknown smoking history category 'pipe'" in warnings[1]
+
+@pytest.mark.parametrize('field, value', [
+    ('age', float('nan')), ('bmi', 'Infinity'), ('HbA1c_level', '-inf'),
+    ('blood_glucose_level', 'abc'), ('hypertension', 0.7), ('heart_disease', 2), ('hypertension', None),
+])
+def test_parse_record_rejects_bad_values(server, field, value):
+    with pytest.raises(RequestError, match=f"Invalid value for {field}") as info:
+        server.parse_record({**PATIENT, field: value})
+    assert info.value.status == 400
+
+def test_parse_record_accepts_whole_float_binaries(server):
+    input_data, _, _ = server.parse_record({**PATIENT, 'hypertension': 1.0, 'heart_disease': 0.0})
+    assert (input_data['hypertension'], input_data['heart_disease']) == (1, 0)
+
+def test_parse_record_rejects_missing_fields(server):
+    record = dict(PATIENT)
+    del record['bmi']
+    with pytest.raises(RequestError, match="Missing fields: bmi"):
+        server.parse_record(record)
+
+def _score(X):
+    if np.isnan(X).any():
+        raise ValueError("Input contains NaN")
+    return np.where(X[:, 0] > 0, 'Diabetic', 'Not Diabetic'), X[:, 0]
+
+async def _submit_together(*matrices, score_fn=_score):
+    batcher = MicroBatcher(score_fn, max_batch=100, max_wait=0.05)
+    batcher.start()
+    try:
+        return batcher, await asyncio.gather(*(batcher.submit(X) for X in matrices), return_exceptions=True)
+    finally:
+        await batcher.stop()
+
+def test_requests_are_merged_into_one_batch():
+    calls = []
+    def score_fn(X):
+        calls.append(len(X))
+        return _score(X)
+    good = np.ones((2, 3), dtype=np.float32)
+    _, results = asyncio.run(_submit_together(good, -good[:1], score_fn=score_fn))
+    assert calls == [3]
+    np.testing.assert_array_equal(results[0][0], ['Diabetic', 'Diabetic'])
+    np.testing.assert_array_equal(results[1][0], ['Not Diabetic'])
+
+def test_failing_request_does_not_fail_its_batch():
+    good = np.ones((2, 3), dtype=np.float32)
+    bad = np.full((1, 3), np.nan, dtype=np.float32)
+    batcher, results = asyncio.run(_submit_together(good, bad, good))
+    assert isinstance(results[1], ValueError)
+    for labels, probabilities in (results[0], results[2]):
+        np.testing.assert_array_equal(labels, ['Diabetic', 'Diabetic'])
+        np.testing.assert_array_equal(probabilities, [1, 1])
+    assert batcher.rows == 4